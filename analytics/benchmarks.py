@@ -0,0 +1,148 @@
+import time
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from core.models import Assignment, StudentProfile, Submission, TeacherProfile
+from .near_duplicates import check_submission
+from .plagiarism import check_assignment
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class QueryCounter:
+    """connection.execute_wrapper that only counts."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, repeat, setup=None):
+    """
+    Run `func` `repeat` times for latency and query counts, then once more under
+    tracemalloc for the peak Python allocation (tracing slows everything down).
+    `setup`, if given, runs untimed before every run (e.g. to empty the cache).
+    """
+    latencies = []
+    queries = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            func()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {'runs': repeat}
+    result.update({f'p{p}_ms': round(float(v), 3) for p, v in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))})
+    result.update({
+        'mean_ms': round(float(np.mean(latencies)), 3),
+        'min_ms': round(min(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries_min': min(queries),
+        'queries_max': max(queries),
+        'peak_kib': round(peak / 1024, 1),
+    })
+    return result
+
+
+def _view(client, name):
+    url = reverse(name)
+
+    def get():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{name} returned HTTP {response.status_code}')
+    return get
+
+
+def _cached_view(client, name):
+    """
+    A view served from core/dashboard_cache.py as two scenarios: cold (cache emptied before
+    every run, so the aggregates are timed) and cached (primed before every run).
+    """
+    get = _view(client, name)
+    return [
+        (f'{name} (cold)', 'view', get, cache.clear),
+        (f'{name} (cached)', 'view', get, get),
+    ]
+
+
+def scenarios():
+    """
+    [(name, kind, callable, setup)] over the data currently in the database; kind is 'view'
+    or 'command' and setup (or None) runs before each timed call (see `measure`). Needs a
+    seeded database with at least one teacher, student and submission.
+    """
+    teacher = TeacherProfile.objects.select_related('user').order_by('user_id').first()
+    student = StudentProfile.objects.select_related('user').order_by('user_id').first()
+    teacher_client = Client()
+    teacher_client.force_login(teacher.user)
+    student_client = Client()
+    student_client.force_login(student.user)
+
+    # Plagiarism cost grows with the submissions per assignment, so use the biggest one
+    busiest = Submission.objects.values('assignment_id').annotate(n=Count('id')).order_by('-n', 'assignment_id')[0]
+    assignment = Assignment.objects.get(pk=busiest['assignment_id'])
+    submission = Submission.objects.filter(assignment=assignment).order_by('-pk').first()
+
+    def train():
+        call_command('train_risk_model', stdout=StringIO())
+
+    def score():
+        call_command('train_risk_model', '--score-only', stdout=StringIO())
+
+    return [
+        ('train_risk_model', 'command', train, None),
+        ('train_risk_model --score-only', 'command', score, None),
+        ('student_dashboard', 'view', _view(student_client, 'student_dashboard'), None),
+        *_cached_view(teacher_client, 'teacher_dashboard'),
+        ('teacher_results', 'view', _view(teacher_client, 'teacher_results'), None),
+        *_cached_view(teacher_client, 'live_dashboard'),
+        ('at_risk_students', 'view', _view(teacher_client, 'at_risk_students'), None),
+        ('check_assignment', 'command', lambda: check_assignment(assignment), None),
+        ('check_submission', 'command', lambda: check_submission(submission), None),
+    ]
+
+
+def compare(baseline, current, tolerance):
+    """
+    Regressions of `current` against `baseline` (two benchmark result dicts): p50 slower by
+    more than `tolerance` (a fraction) or more queries. Only scales and scenarios in both count.
+    """
+    regressions = []
+    for scale, old_scale in baseline.get('scales', {}).items():
+        new_scale = current.get('scales', {}).get(scale)
+        if new_scale is None:
+            continue
+        for name, old in old_scale['results'].items():
+            new = new_scale['results'].get(name)
+            if new is None:
+                continue
+            if new['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{scale} students, {name}: p50 {old['p50_ms']}ms -> {new['p50_ms']}ms")
+            if new['queries_max'] > old['queries_max']:
+                regressions.append(f"{scale} students, {name}: queries {old['queries_max']} -> {new['queries_max']}")
+    return regressions
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Sum
+from django.utils import timezone
+from core.models import StudentSubjectStats
+from .models import DashboardEvent
+
+
+logger = logging.getLogger(__name__)
+
+# Queued to a stream that fell too far behind: the client refetches instead of replaying
+RESYNC = object()
+
+FETCH_LIMIT = 500
+PRUNE_EVERY = 60  # polls
+
+
+def subject_topic(subject_id):
+    return f'subject:{subject_id}'
+
+
+def publish_stats_deltas(pairs):
+    """
+    Store the fresh totals of every subject in `pairs` as DashboardEvents (one per subject,
+    however many students a save touched). Runs after the write commits, when core/stats.py
+    has already refreshed the stats.
+    """
+    events = []
+    subject_ids = {subject_id for _, subject_id in pairs}
+    totals = {
+        row['subject_id']: row
+        for row in StudentSubjectStats.objects.filter(subject_id__in=subject_ids)
+        .values('subject_id').annotate(
+            total=Sum('total_classes'), present=Sum('present_classes'),
+            marks=Sum('marks_total'), grades=Sum('grade_count'),
+        ).order_by()
+    }
+    for subject_id in sorted(subject_ids):
+        row = totals.get(subject_id, {'total': 0, 'present': 0, 'marks': 0, 'grades': 0})
+        events.append(DashboardEvent(topic=subject_topic(subject_id), payload={
+            'type': 'subject',
+            'subject_id': subject_id,
+            'present': row['present'],
+            'absent': row['total'] - row['present'],
+            'average': round(float(row['marks'] / row['grades']), 2) if row['grades'] else None,
+            'grades': row['grades'],
+        }))
+
+    DashboardEvent.objects.bulk_create(events, batch_size=500)
+
+
+async def events_after(event_id, topics=None):
+    events = DashboardEvent.objects.filter(id__gt=event_id).order_by('id')
+    if topics is not None:
+        events = events.filter(topic__in=topics)
+    return [event async for event in events[:FETCH_LIMIT]]
+
+
+class EventBroker:
+    """
+    Fans DashboardEvents out to the streams open in this process. A single poller task
+    reads new rows for all of them, so the database sees one small query per interval
+    however many dashboards are connected, and writes from any worker reach every worker.
+    """
+
+    def __init__(self):
+        self._reset(None)
+
+    def _reset(self, loop):
+        self._loop = loop
+        self._subscribers = {}  # topic -> set of queues
+        self._poller = None
+        self._last_id = None
+
+    def subscribe(self, topics):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Queues and tasks belong to one event loop; anything from an older loop is dead
+            self._reset(loop)
+
+        queue = asyncio.Queue(maxsize=settings.DASHBOARD_EVENTS_QUEUE_SIZE)
+        for topic in topics:
+            self._subscribers.setdefault(topic, set()).add(queue)
+        if self._poller is None:
+            self._poller = loop.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue, topics):
+        for topic in topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def dispatch(self, events):
+        for event in events:
+            for queue in self._subscribers.get(event.topic, ()):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(RESYNC)
+
+    async def _poll(self):
+        try:
+            if self._last_id is None:
+                # Streams only get what happens after they connect (plus their own Last-Event-ID replay)
+                self._last_id = (await DashboardEvent.objects.aaggregate(last=Max('id')))['last'] or 0
+
+            polls = 0
+            while self._subscribers:
+                try:
+                    events = await events_after(self._last_id)
+                    if events:
+                        self._last_id = events[-1].pk
+                        self.dispatch(events)
+                    polls += 1
+                    if polls % PRUNE_EVERY == 0:
+                        cutoff = timezone.now() - timedelta(minutes=settings.DASHBOARD_EVENTS_RETENTION_MINUTES)
+                        await DashboardEvent.objects.filter(created_at__lt=cutoff).adelete()
+                except Exception:
+                    logger.exception('Polling dashboard events failed')
+                    events = []
+                if len(events) < FETCH_LIMIT:
+                    await asyncio.sleep(settings.DASHBOARD_EVENTS_POLL_SECONDS)
+        finally:
+            self._poller = None
+
+
+broker = EventBroker()
+
+
+def _format(event):
+    return f"id: {event.pk}\nevent: {event.payload['type']}\ndata: {json.dumps(event.payload)}\n\n"
+
+
+async def event_stream(topics, last_event_id=None):
+    """Server-sent events for the topics, replaying anything after `last_event_id` first."""
+    queue = broker.subscribe(topics)
+    try:
+        yield f'retry: {settings.DASHBOARD_EVENTS_RETRY_MS}\n\n'
+
+        last_sent = 0
+        if last_event_id and last_event_id.isdigit():
+            for event in await events_after(int(last_event_id), topics):
+                last_sent = event.pk
+                yield _format(event)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.DASHBOARD_EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comments keep proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                continue
+
+            if event is RESYNC:
+                yield 'event: resync\ndata: {}\n\n'
+            elif event.pk > last_sent:
+                last_sent = event.pk
+                yield _format(event)
+    finally:
+        broker.unsubscribe(queue, topics)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from .frames import student_frame
+
+
+# Column order of every feature row (and of the model's input matrix)
+FEATURE_NAMES = [
+    'attendance_pct',
+    'avg_marks',
+    'failing_subjects',
+    'total_subjects',
+    'fail_ratio',
+    'absence_count',
+    'recent_absences',
+    'absence_streak',
+]
+
+
+def build_student_features(passing_marks, students=None, snapshot=None):
+    """
+    Build one feature row per student from `frames.student_frame`, with column-wise
+    arithmetic over the whole frame instead of a Python loop per student.
+    `students` optionally narrows this to a StudentProfile queryset; with a loaded
+    `snapshot.Snapshot` the rows come from it instead of the database.
+    Returns a DataFrame indexed by student id, in id order, with FEATURE_NAMES columns.
+    """
+    if snapshot is not None:
+        students = snapshot.student_frame(passing_marks)
+    else:
+        students = student_frame(passing_marks, students)
+    has_classes = students['total'] > 0
+    graded = students['graded']
+
+    return pd.DataFrame({
+        'attendance_pct': np.where(has_classes, students['present'] / students['total'].where(has_classes, 1) * 100, 100.0),
+        'avg_marks': students['avg_marks'].fillna(0.0),
+        'failing_subjects': students['failing'],
+        'total_subjects': graded,
+        'fail_ratio': np.where(graded > 0, students['failing'] / graded.where(graded > 0, 1), 0.0),
+        'absence_count': students['absent'].where(has_classes, 0),
+        'recent_absences': students['recent_absences'],
+        'absence_streak': students['absence_streak'],
+    }, index=students.index)[FEATURE_NAMES]
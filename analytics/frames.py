@@ -0,0 +1,172 @@
+import itertools
+
+import pandas as pd
+from django.conf import settings
+from core.models import Grade, StudentProfile, StudentStats, StudentSubjectStats
+
+
+# Rows fetched (and turned into one DataFrame) at a time
+CHUNK_SIZE = 50000
+
+PAIR_COLUMNS = {
+    'student_id': 'int64',
+    'subject_id': 'int64',
+    'total': 'int32',
+    'present': 'int32',
+    'absent': 'int32',
+    'grades': 'int32',
+    'marks': 'float64',
+    'failing': 'bool',
+    'recent_absences': 'int32',
+    'absence_streak': 'int32',
+}
+PAIR_LOOKUPS = {
+    'total': 'total_classes',
+    'present': 'present_classes',
+    'absent': 'absent_classes',
+    'grades': 'grade_count',
+    'marks': 'marks_total',
+    'failing': 'is_failing',
+}
+
+STUDENT_COLUMNS = {
+    'student_id': 'int64',
+    'total': 'int32',
+    'present': 'int32',
+    'absent': 'int32',
+    'avg_marks': 'float64',
+    'graded': 'int32',
+    'failing': 'int32',
+    'recent_absences': 'int32',
+    'absence_streak': 'int32',
+}
+STUDENT_LOOKUPS = {
+    'student_id': 'user_id',
+    'total': 'studentstats__total_classes',
+    'present': 'studentstats__present_classes',
+    'absent': 'studentstats__absent_classes',
+    'avg_marks': 'studentstats__avg_marks',
+    'graded': 'studentstats__graded_subjects',
+    'failing': 'studentstats__failing_subjects',
+    'recent_absences': 'studentstats__recent_absences',
+    'absence_streak': 'studentstats__absence_streak',
+}
+# Students without a StudentStats row yet (no attendance or grades)
+STUDENT_DEFAULTS = {
+    'total': 0, 'present': 0, 'absent': 0, 'graded': 0, 'failing': 0, 'recent_absences': 0, 'absence_streak': 0,
+}
+
+
+def iter_frames(queryset, columns, lookups=None, defaults=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield `queryset.values_list(...)` as DataFrames of at most `chunk_size` rows.
+    `columns` maps column name to dtype, `lookups` renames columns to ORM lookups and
+    `defaults` fills NULLs (e.g. from a LEFT JOIN) before the dtypes are applied.
+    """
+    lookups = lookups or {}
+    names = list(columns)
+    rows = queryset.values_list(*(lookups.get(name, name) for name in names)).iterator(chunk_size=chunk_size)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        frame = pd.DataFrame.from_records(chunk, columns=names)
+        if defaults:
+            frame = frame.fillna(defaults)
+        yield frame.astype(columns)
+
+
+def read_frame(queryset, columns, lookups=None, defaults=None, chunk_size=CHUNK_SIZE):
+    """The whole of `iter_frames` in one DataFrame (empty, with the right dtypes, for no rows)."""
+    frames = list(iter_frames(queryset, columns, lookups, defaults, chunk_size))
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in columns.items()})
+    return pd.concat(frames, ignore_index=True)
+
+
+def pair_frame(students=None, subject_ids=None, passing_marks=None):
+    """
+    One row per (student, subject) read from StudentSubjectStats: total / present / absent
+    classes, grade count, marks total, whether it is failing, absences among the latest
+    settings.RECENT_CLASSES classes and the current absence streak. For a passing mark other
+    than settings.PASSING_MARKS, `failing` is recomputed from the Grade rows below it.
+    `students` optionally narrows this to a StudentProfile queryset.
+    """
+    pairs = StudentSubjectStats.objects.all()
+    grades = Grade.objects.all()
+    if students is not None:
+        pairs = pairs.filter(student__in=students.values('user_id'))
+        grades = grades.filter(student__in=students.values('user_id'))
+    if subject_ids is not None:
+        pairs = pairs.filter(subject_id__in=subject_ids)
+        grades = grades.filter(subject_id__in=subject_ids)
+
+    frame = read_frame(pairs.order_by(), PAIR_COLUMNS, PAIR_LOOKUPS)
+    if passing_marks is None or passing_marks == settings.PASSING_MARKS:
+        return frame
+
+    keys = ['student_id', 'subject_id']
+    failing = read_frame(
+        grades.filter(marks__lt=passing_marks).order_by(), {'student_id': 'int64', 'subject_id': 'int64'}
+    ).drop_duplicates()
+    failing['failing'] = True
+    frame = frame.drop(columns='failing').merge(failing, on=keys, how='left')
+    frame['failing'] = frame['failing'].notna()
+    return frame
+
+
+def student_frame(passing_marks=None, students=None):
+    """
+    One row per student, indexed by student id in id order: total / present / absent classes,
+    average marks (NaN when ungraded), graded subjects, failing subjects, recent absences
+    (summed over subjects) and the longest current absence streak. With the default
+    passing mark this is one LEFT JOIN onto StudentStats; otherwise the per-subject rows are
+    rolled up with a groupby.
+    """
+    if students is None:
+        students = StudentProfile.objects.all()
+    students = students.order_by('user_id')
+
+    if passing_marks is None or passing_marks == settings.PASSING_MARKS:
+        return read_frame(students, STUDENT_COLUMNS, STUDENT_LOOKUPS, STUDENT_DEFAULTS).set_index('student_id')
+
+    student_ids = read_frame(students, {'student_id': 'int64'}, STUDENT_LOOKUPS)['student_id']
+    pairs = pair_frame(students, passing_marks=passing_marks)
+    pairs['graded'] = pairs['grades'] > 0
+    totals = pairs.groupby('student_id').agg(
+        total=('total', 'sum'),
+        present=('present', 'sum'),
+        absent=('absent', 'sum'),
+        marks=('marks', 'sum'),
+        grades=('grades', 'sum'),
+        graded=('graded', 'sum'),
+        failing=('failing', 'sum'),
+        recent_absences=('recent_absences', 'sum'),
+        absence_streak=('absence_streak', 'max'),
+    ).reindex(student_ids, fill_value=0)
+
+    totals['avg_marks'] = (totals['marks'] / totals['grades'].where(totals['grades'] > 0)).round(2)
+    return totals[list(STUDENT_COLUMNS)[1:]].astype({
+        name: dtype for name, dtype in STUDENT_COLUMNS.items() if name != 'student_id'
+    })
+
+
+def subject_frame(subject_ids):
+    """
+    Class totals per subject, indexed like `subject_ids`: present / absent classes,
+    grade count and average marks (0 when ungraded).
+    """
+    totals = pair_frame(subject_ids=subject_ids).groupby('subject_id')[
+        ['present', 'absent', 'grades', 'marks']
+    ].sum().reindex(subject_ids, fill_value=0)
+    totals['average'] = (totals['marks'] / totals['grades'].where(totals['grades'] > 0)).fillna(0).round(2)
+    return totals
+
+
+def performance_frame():
+    """Attendance % and average marks of every student with both, in student id order."""
+    stats = StudentStats.objects.filter(total_classes__gt=0, avg_marks__isnull=False).order_by('student_id')
+    frame = read_frame(
+        stats,
+        {'present': 'int32', 'total': 'int32', 'avg_marks': 'float64', 'username': 'str'},
+        {'present': 'present_classes', 'total': 'total_classes', 'username': 'student__user__username'},
+    )
+    frame['attendance_pct'] = frame['present'] / frame['total'] * 100
+    return frame
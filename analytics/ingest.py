@@ -0,0 +1,62 @@
+import datetime
+
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+from .models import IngestJob
+from .near_duplicates import check_submission
+
+
+MAX_ATTEMPTS = 3
+
+
+def claim_next_job():
+    """Atomically move the oldest pending job to running. Returns None when the queue is empty."""
+    while True:
+        job_id = IngestJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        # Compare-and-set on status so two workers never run the same job
+        claimed = IngestJob.objects.filter(id=job_id, status='pending').update(
+            status='running', started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return IngestJob.objects.select_related('submission__assignment').get(id=job_id)
+
+
+def run_job(job):
+    """
+    Extract, fingerprint and check one submission. Failed jobs are retried up to MAX_ATTEMPTS.
+    No transaction around the extraction: an open one would lock SQLite writers out meanwhile.
+    """
+    try:
+        check_submission(job.submission)
+    except Exception as e:
+        job.status = 'failed' if job.attempts >= MAX_ATTEMPTS else 'pending'
+        job.error = f'{type(e).__name__}: {e}'
+    else:
+        job.status = 'done'
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs(older_than):
+    """Jobs left 'running' by a worker that died are put back in the queue."""
+    cutoff = timezone.now() - older_than
+    return IngestJob.objects.filter(status='running', started_at__lt=cutoff).update(status='pending')
+
+
+def queue_stats(window=datetime.timedelta(hours=1)):
+    """Queue depth per status plus average wait and run time of jobs finished within `window`."""
+    counts = IngestJob.objects.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        running=Count('id', filter=Q(status='running')),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+    recent = IngestJob.objects.filter(status='done', finished_at__gte=timezone.now() - window).aggregate(
+        done=Count('id'),
+        avg_wait=Avg(F('started_at') - F('created_at')),
+        avg_run=Avg(F('finished_at') - F('started_at')),
+    )
+    return {**counts, **recent}
@@ -0,0 +1,143 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from analytics.benchmarks import compare, measure, scenarios
+from core.seeding import seed_university
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database at several scales and measure latency percentiles, '
+        'query counts and peak memory of the dashboards, risk model and plagiarism checks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Student counts to benchmark at (default: 1000 10000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Timed runs per view (default: 20)',
+        )
+        parser.add_argument(
+            '--command-repeat',
+            type=int,
+            default=3,
+            help='Timed runs per model/plagiarism command (default: 3)',
+        )
+        parser.add_argument(
+            '--submission-rate',
+            type=float,
+            default=0.1,
+            help='Passed to the seeder: chance a student submits each assignment (default: 0.1)',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Seeder random seed (default: 42)')
+        parser.add_argument(
+            '--output',
+            help='Write the JSON results here (default: benchmark-<timestamp>.json)',
+        )
+        parser.add_argument(
+            '--compare',
+            metavar='BASELINE',
+            help='Earlier results file; exit with an error if any scenario regressed against it',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed p50 slowdown against --compare, as a fraction (default: 0.2)',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        results = {
+            'started_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'command_repeat': options['command_repeat'],
+            'seed': options['seed'],
+            'scales': {},
+        }
+
+        workdir = tempfile.mkdtemp(prefix='benchmark-')
+        # Never touch the real database: everything runs against a test database (on disk for
+        # SQLite, which would otherwise keep a 100k-student dataset in memory)
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            test_settings['NAME'] = os.path.join(workdir, 'benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                MEDIA_ROOT=os.path.join(workdir, 'media'),
+                RISK_MODEL_DIR=os.path.join(workdir, 'models'),
+                # Scales clear the cache: never the one the real workers share
+                CACHES={'default': {**settings.CACHES['default'], 'LOCATION': os.path.join(workdir, 'cache')}},
+            ):
+                for scale in sorted(options['scales']):
+                    results['scales'][str(scale)] = self._run_scale(scale, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        output = options['output'] or f"benchmark-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {output}'))
+
+        if baseline is not None:
+            regressions = compare(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against {}:\n  {}'.format(options['compare'], '\n  '.join(regressions)))
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def _run_scale(self, scale, options):
+        self.stdout.write(f'== {scale} students ==')
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+
+        started = time.perf_counter()
+        rows = seed_university(students=scale, submission_rate=options['submission_rate'], seed=options['seed'])
+        call_command('index_submissions', stdout=StringIO())
+        seed_seconds = time.perf_counter() - started
+        self.stdout.write(f'  seeded in {seed_seconds:.1f}s: {rows}')
+
+        scale_results = {}
+        for name, kind, func, setup in scenarios():
+            repeat = options['repeat'] if kind == 'view' else options['command_repeat']
+            result = measure(func, repeat, setup)
+            scale_results[name] = result
+            self.stdout.write(
+                f"  {name:<30} p50 {result['p50_ms']:>10.1f}ms  p95 {result['p95_ms']:>10.1f}ms  "
+                f"{result['queries_max']:>5} queries  peak {result['peak_kib']:>10.1f} KiB"
+            )
+
+        return {'seed_seconds': round(seed_seconds, 1), 'rows': rows, 'results': scale_results}
@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Assignment
+from analytics.plagiarism import check_assignment
+
+
+class Command(BaseCommand):
+    help = 'Compare all submissions of an assignment with each other and store PlagiarismReports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('assignment_ids', nargs='*', type=int, help='Assignments to check')
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Check every assignment that has submissions',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=settings.PLAGIARISM_THRESHOLD,
+            help=f'Minimum similarity (0-100) to report (default: {settings.PLAGIARISM_THRESHOLD})',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='PDF extraction processes (default: settings.PDF_EXTRACT_WORKERS, i.e. one per CPU)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            help='Seconds before giving up on one PDF (default: settings.PDF_EXTRACT_TIMEOUT)',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            assignments = Assignment.objects.filter(submission__isnull=False).distinct()
+        elif options['assignment_ids']:
+            assignments = Assignment.objects.filter(id__in=options['assignment_ids'])
+        else:
+            raise CommandError('Pass one or more assignment ids, or --all.')
+
+        for assignment in assignments:
+            started = time.perf_counter()
+            submission_count, reports = check_assignment(
+                assignment, options['threshold'],
+                workers=options['workers'], timeout=options['timeout'], progress=self.report_progress,
+            )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'{assignment}: {submission_count} submissions, {len(reports)} pairs >= '
+                f"{options['threshold']}% ({elapsed:.2f}s)"
+            ))
+
+    def report_progress(self, done, total, elapsed):
+        # Roughly every 10% (and on the last file) so big batches do not flood the console
+        if done == total or done % max(1, total // 10) == 0:
+            rate = done / elapsed if elapsed else 0
+            self.stdout.write(f'  extracted {done}/{total} new PDFs ({rate:.1f} files/s)')
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.models import Submission
+from analytics.utils import submission_texts
+
+
+class Command(BaseCommand):
+    help = 'Extract and cache the text of submitted PDFs across a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assignment', type=int, help='Only this assignment (default: every submission)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='PDF extraction processes (default: settings.PDF_EXTRACT_WORKERS, i.e. one per CPU)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            help='Seconds before giving up on one PDF (default: settings.PDF_EXTRACT_TIMEOUT)',
+        )
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.order_by('id')
+        if options['assignment']:
+            submissions = submissions.filter(assignment_id=options['assignment'])
+        submissions = list(submissions)
+
+        started = time.perf_counter()
+        texts = submission_texts(submissions, options['workers'], options['timeout'], self.report_progress)
+        elapsed = time.perf_counter() - started
+
+        empty = sum(1 for text in texts if not text)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(submissions)} submissions ready in {elapsed:.2f}s '
+            f'({len(submissions) / elapsed if elapsed else 0:.1f} files/s, {empty} without text)'
+        ))
+
+    def report_progress(self, done, total, elapsed):
+        if done == total or done % max(1, total // 10) == 0:
+            rate = done / elapsed if elapsed else 0
+            self.stdout.write(f'  extracted {done}/{total} new PDFs ({rate:.1f} files/s)')
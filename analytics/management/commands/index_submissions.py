@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.models import Submission
+from analytics.near_duplicates import index_submissions
+from analytics.utils import submission_texts
+
+
+class Command(BaseCommand):
+    help = 'Build the MinHash/LSH near-duplicate index over submitted PDFs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Re-index every submission, not just the ones missing from the index',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Submissions extracted and indexed per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='PDF extraction processes (default: settings.PDF_EXTRACT_WORKERS, i.e. one per CPU)',
+        )
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.order_by('id')
+        if not options['rebuild']:
+            submissions = submissions.filter(minhashsignature__isnull=True)
+        submission_ids = list(submissions.values_list('id', flat=True))
+
+        started = time.perf_counter()
+        indexed = 0
+        chunk_size = options['chunk_size']
+        for start in range(0, len(submission_ids), chunk_size):
+            chunk = list(Submission.objects.filter(id__in=submission_ids[start:start + chunk_size]).order_by('id'))
+            texts = submission_texts(chunk, options['workers'])
+            indexed += len(index_submissions(chunk, texts))
+            self.stdout.write(f'  {min(start + chunk_size, len(submission_ids))}/{len(submission_ids)} submissions')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} of {len(submission_ids)} submissions in {elapsed:.2f}s '
+            f'({len(submission_ids) - indexed} had no text)'
+        ))
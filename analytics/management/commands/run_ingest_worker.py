@@ -0,0 +1,74 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from analytics.ingest import claim_next_job, queue_stats, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued submission ingest jobs (text extraction, fingerprinting, plagiarism check)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling for new jobs',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty (default: 2)',
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=30,
+            help="Requeue jobs stuck in 'running' longer than this on startup (default: 30)",
+        )
+        parser.add_argument(
+            '--report-every',
+            type=int,
+            default=50,
+            help='Print queue depth and latency after this many jobs (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs(datetime.timedelta(minutes=options['stale_minutes']))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+        self.report()
+
+        processed = 0
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            job = run_job(job)
+            processed += 1
+            latency = (job.finished_at - job.created_at).total_seconds()
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(
+                f'Job {job.id} (submission {job.submission_id}): {job.status} in {latency:.2f}s from upload'
+                + (f' - {job.error}' if job.error else '')
+            ))
+            if processed % options['report_every'] == 0:
+                self.report()
+
+        self.report()
+
+    def report(self):
+        stats = queue_stats()
+
+        def seconds(value):
+            return f'{value.total_seconds():.2f}s' if value is not None else 'n/a'
+
+        self.stdout.write(
+            f"Queue: {stats['pending']} pending, {stats['running']} running, {stats['failed']} failed | "
+            f"last hour: {stats['done']} done, avg wait {seconds(stats['avg_wait'])}, "
+            f"avg run {seconds(stats['avg_run'])}"
+        )
@@ -1,8 +1,14 @@
 import numpy as np
-from django.core.management.base import BaseCommand
-from django.db.models import Avg, Count, Q
-from core.models import StudentProfile, Attendance, Grade
-from analytics.models import StudentRisk
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from analytics import registry
+from analytics.features import FEATURE_NAMES, build_student_features
+from analytics.models import StudentRisk, RiskDirtyStudent
+from analytics.snapshot import load_snapshot
+from core.models import StudentProfile
+from core.utils import CHUNK_SIZE, chunks
 
 
 class Command(BaseCommand):
@@ -21,67 +27,178 @@ class Command(BaseCommand):
             default=50.0,
             help='Risk score above this = High risk (default: 50)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT when storing predictions (default: 1000)',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only rescore students whose attendance or grades changed since the last run, '
+                 'with the latest saved model (one is trained on every student if there is none)',
+        )
+        parser.add_argument(
+            '--score-only',
+            action='store_true',
+            help='Skip training and score with a saved model (thresholds come from the artifact)',
+        )
+        parser.add_argument(
+            '--from-snapshot',
+            action='store_true',
+            help='Read features from the analytics snapshot (see export_snapshot) instead of the database',
+        )
+        parser.add_argument(
+            '--model-version',
+            help='Saved model version to score with (default: latest). Implies --score-only',
+        )
 
     def handle(self, *args, **options):
-        passing_marks = options['passing_marks']
-        risk_threshold = options['risk_threshold']
+        query_count = [0]
 
-        students = StudentProfile.objects.all()
-        if not students.exists():
-            self.stdout.write(self.style.WARNING('No students found. Nothing to train.'))
-            return
-
-        self.stdout.write(f'Building training data for {students.count()} students...')
+        def count_queries(execute, sql, params, many, context):
+            query_count[0] += 1
+            return execute(sql, params, many, context)
 
-        features = []
-        labels = []
-        student_ids = []
+        with connection.execute_wrapper(count_queries):
+            self._train_and_store(options)
 
-        for student in students:
-            # Feature 1: Attendance percentage
-            total_classes = Attendance.objects.filter(student=student).count()
-            if total_classes > 0:
-                present_count = Attendance.objects.filter(student=student, status='P').count()
-                attendance_pct = (present_count / total_classes) * 100
-            else:
-                attendance_pct = 100.0
-
-            # Feature 2: Average marks across all subjects
-            avg_data = Grade.objects.filter(student=student).aggregate(Avg('marks'))
-            avg_marks = float(avg_data['marks__avg'] or 0)
+        self.stdout.write(f'Issued {query_count[0]} database queries')
 
-            # Feature 3: Number of subjects with marks below passing
-            failing_count = Grade.objects.filter(
-                student=student, marks__lt=passing_marks
-            ).values('subject').distinct().count()
+    def _train_and_store(self, options):
+        passing_marks = options['passing_marks']
+        risk_threshold = options['risk_threshold']
+        batch_size = options['batch_size']
+        incremental = options['incremental']
+        score_only = options['score_only'] or bool(options['model_version'])
+
+        snapshot = None
+        if options['from_snapshot']:
+            if incremental:
+                raise CommandError('--incremental needs live stats; it cannot be combined with --from-snapshot.')
+            snapshot = load_snapshot()
+            if snapshot is None:
+                raise CommandError('No analytics snapshot found. Run export_snapshot first.')
+            self.stdout.write(f'Reading features from the snapshot exported at {snapshot.exported_at}')
+
+        artifact = None
+        if score_only:
+            artifact = registry.load_model(options['model_version'])
+            if artifact is None:
+                raise CommandError('No saved risk model found. Run train_risk_model without --score-only first.')
+            if artifact['feature_names'] != FEATURE_NAMES:
+                raise CommandError(
+                    f"Model {artifact['version']} was trained on features {artifact['feature_names']}, "
+                    f"expected {FEATURE_NAMES}. Retrain it."
+                )
+        elif incremental:
+            # Rescoring a few students is no reason to refit: reuse the latest model if it still fits
+            artifact = registry.load_model()
+            if artifact is not None and artifact['feature_names'] != FEATURE_NAMES:
+                self.stdout.write(f"Model {artifact['version']} uses other features; retraining on every student.")
+                artifact = None
+            elif artifact is None:
+                self.stdout.write('No saved risk model yet; training on every student.')
+            # A new model rescores everyone, so nobody keeps a score from the old one
+            incremental = artifact is not None
+        if artifact is not None:
+            passing_marks = artifact['passing_marks']
+            risk_threshold = artifact['risk_threshold']
+            self.stdout.write(f"Scoring with saved model {artifact['version']}")
+
+        # Anything marked dirty after this point is left for the next run
+        cutoff = timezone.now()
+        students = None
+        if incremental:
+            dirty_ids = list(
+                RiskDirtyStudent.objects.filter(marked_at__lte=cutoff).values_list('student_id', flat=True)
+            )
+            if not dirty_ids:
+                self.stdout.write(self.style.SUCCESS('No attendance or grade changes since the last run.'))
+                return
+            self.stdout.write(f'Rescoring {len(dirty_ids)} changed students...')
+            if len(dirty_ids) <= CHUNK_SIZE:
+                # A saved model needs no training set, so only the dirty students are loaded
+                students = StudentProfile.objects.filter(user_id__in=dirty_ids)
+
+        features = build_student_features(passing_marks, students, snapshot)
+        if snapshot is not None:
+            # Students deleted since the export cannot be given a StudentRisk row
+            features = features[features.index.isin(list(StudentProfile.objects.values_list('user_id', flat=True)))]
+        if incremental:
+            features = features[features.index.isin(dirty_ids)]
+        if features.empty:
+            self.stdout.write(self.style.WARNING('No students found. Nothing to train.'))
+            return
 
-            # Feature 4: Total subjects enrolled
-            total_subjects = Grade.objects.filter(student=student).values('subject').distinct().count()
+        X = features.to_numpy(dtype=float)
+        self.stdout.write(f'Features shape: {X.shape}')
 
-            # Feature 5: Fail ratio (failing subjects / total subjects)
-            fail_ratio = failing_count / total_subjects if total_subjects > 0 else 0
+        if artifact is not None:
+            predictions = registry.predict_risk(artifact, X)
+            model_version = artifact['version']
+        else:
+            predictions, model_version = self._train(features, X, passing_marks, risk_threshold)
 
-            # Feature 6: Number of absences
-            absence_count = Attendance.objects.filter(student=student, status='A').count()
+        risk_scores = np.clip(np.round(np.asarray(predictions, dtype=float), 2), 0, 100)
+        risk_levels = np.select(
+            [risk_scores >= risk_threshold, risk_scores >= risk_threshold * 0.5],
+            ['high', 'medium'],
+            default='low',
+        )
 
-            feature_row = [attendance_pct, avg_marks, failing_count, total_subjects, fail_ratio, absence_count]
-            features.append(feature_row)
-            student_ids.append(student.user_id)
+        # Store predictions (stats come straight from the feature frame, no re-querying)
+        risks = [
+            StudentRisk(
+                student_id=student_id,
+                risk_score=float(risk_score),
+                risk_level=risk_level,
+                attendance_pct=round(attendance_pct, 2),
+                avg_marks=round(avg_marks, 2),
+                failing_subjects=int(failing_count),
+                model_version=model_version,
+            )
+            for student_id, risk_score, risk_level, attendance_pct, avg_marks, failing_count in zip(
+                features.index.tolist(), risk_scores, risk_levels,
+                features['attendance_pct'].tolist(), features['avg_marks'].tolist(),
+                features['failing_subjects'].tolist(),
+            )
+        ]
+
+        with transaction.atomic():
+            if incremental:
+                # Only replace the rows of the students read above; everyone else keeps their score.
+                # The ids are fixed up front: a student marked again mid-run must not keep two rows.
+                for chunk in chunks(dirty_ids):
+                    StudentRisk.objects.filter(student_id__in=chunk).delete()
+            else:
+                StudentRisk.objects.all().delete()
+            StudentRisk.objects.bulk_create(risks, batch_size=batch_size)
+            # Students marked again since the cutoff stay dirty for the next run
+            if incremental:
+                for chunk in chunks(dirty_ids):
+                    RiskDirtyStudent.objects.filter(student_id__in=chunk, marked_at__lte=cutoff).delete()
+            else:
+                RiskDirtyStudent.objects.filter(marked_at__lte=cutoff).delete()
 
-            # Label: at-risk if attendance < 75% OR avg marks < passing OR fail ratio >= 0.5
-            is_at_risk = 1 if (attendance_pct < 75 or avg_marks < passing_marks or fail_ratio >= 0.5) else 0
-            labels.append(is_at_risk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully stored {len(risks)} risk predictions (model: {model_version})'
+        ))
 
-        X = np.array(features)
-        y = np.array(labels)
+    def _train(self, features, X, passing_marks, risk_threshold):
+        """Fit a fresh model on every student and save it. Returns (predictions, model_version)."""
+        # Label: at-risk if attendance < 75% OR avg marks < passing OR fail ratio >= 0.5
+        y = (
+            (features['attendance_pct'] < 75)
+            | (features['avg_marks'] < passing_marks)
+            | (features['fail_ratio'] >= 0.5)
+        ).to_numpy(dtype=int)
 
-        self.stdout.write(f'Features shape: {X.shape}')
         self.stdout.write(f'At-risk students: {sum(y)} / {len(y)}')
 
         # Train model inline (no need for sklearn for simple threshold-based rules)
         # But we also use RandomForest for more nuanced predictions when enough data
-        model_version = 'v1.0'
-
         if len(y) >= 10:
             from sklearn.ensemble import RandomForestClassifier
             from sklearn.model_selection import cross_val_score
@@ -92,70 +209,21 @@ class Command(BaseCommand):
 
             clf.fit(X, y)
 
-            if clf.n_classes_ > 1:
-                predictions = clf.predict_proba(X)[:, 1] * 100
-            else:
-                predictions = clf.predict(X).astype(float) * 100
-            model_version = 'v1.0-ml'
-        else:
-            # Rule-based fallback for small datasets
-            self.stdout.write('Not enough data for ML model. Using rule-based scoring.')
-            predictions = []
-            for row in features:
-                att, avg, fail_c, total_s, fail_r, abs_c = row
-                score = 0
-                if att < 75:
-                    score += (75 - att) * 0.8
-                if avg < passing_marks:
-                    score += (passing_marks - avg) * 0.6
-                if fail_r >= 0.5:
-                    score += 20
-                if abs_c > total_s * 0.3:
-                    score += 15
-                predictions.append(min(score, 100))
-
-        # Store predictions
-        StudentRisk.objects.all().delete()
-        created_count = 0
-
-        for i, student_id in enumerate(student_ids):
-            risk_score = round(float(predictions[i]), 2)
-            risk_score = max(0, min(100, risk_score))
-
-            if risk_score >= risk_threshold:
-                risk_level = 'high'
-            elif risk_score >= risk_threshold * 0.5:
-                risk_level = 'medium'
-            else:
-                risk_level = 'low'
-
-            # Recalculate stats for storage
-            student = StudentProfile.objects.get(user_id=student_id)
-            total_classes = Attendance.objects.filter(student=student).count()
-            if total_classes > 0:
-                present_count = Attendance.objects.filter(student=student, status='P').count()
-                att_pct = round((present_count / total_classes) * 100, 2)
-            else:
-                att_pct = 100.0
-
-            avg_data = Grade.objects.filter(student=student).aggregate(Avg('marks'))
-            avg_m = round(float(avg_data['marks__avg'] or 0), 2)
-
-            fail_subj = Grade.objects.filter(
-                student=student, marks__lt=passing_marks
-            ).values('subject').distinct().count()
-
-            StudentRisk.objects.create(
-                student=student,
-                risk_score=risk_score,
-                risk_level=risk_level,
-                attendance_pct=att_pct,
-                avg_marks=avg_m,
-                failing_subjects=fail_subj,
-                model_version=model_version,
+            artifact = registry.save_model(
+                clf, FEATURE_NAMES, passing_marks, risk_threshold,
+                cv_accuracy=float(scores.mean()),
+                n_samples=len(y),
             )
-            created_count += 1
-
-        self.stdout.write(self.style.SUCCESS(
-            f'Successfully stored {created_count} risk predictions (model: {model_version})'
-        ))
+            self.stdout.write(f"Saved model {artifact['version']} to {registry.artifact_path(artifact['version'])}")
+            return registry.predict_risk(artifact, X), artifact['version']
+
+        # Rule-based fallback for small datasets
+        self.stdout.write('Not enough data for ML model. Using rule-based scoring.')
+        score = (
+            (75 - features['attendance_pct']).clip(lower=0) * 0.8
+            + (passing_marks - features['avg_marks']).clip(lower=0) * 0.6
+            + np.where(features['fail_ratio'] >= 0.5, 20, 0)
+            + np.where(features['absence_count'] > features['total_subjects'] * 0.3, 15, 0)
+            + np.where(features['absence_streak'] >= settings.ABSENCE_STREAK_ALERT, 10, 0)
+        )
+        return score.clip(upper=100).to_numpy(), 'v1.0'
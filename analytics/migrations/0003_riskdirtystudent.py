@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_plagiarismreport'),
+        ('core', '0005_subject_teacher'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskDirtyStudent',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.studentprofile')),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,66 @@
+import hashlib
+import re
+
+import numpy as np
+
+
+# 128 permutations split into 32 bands of 4 rows: pairs with Jaccard ~0.5 share a
+# band with ~87% probability, pairs at ~0.2 only ~5% of the time.
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5  # words
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed: signatures stored in the database must stay comparable across runs
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text):
+    """Set of overlapping SHINGLE_SIZE-word windows of the normalised text."""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=4).digest(), 'little')
+
+
+def signature(text):
+    """NUM_PERM uint32 MinHash signature of the text, or None for empty text."""
+    shingle_set = shingles(text)
+    if not shingle_set:
+        return None
+
+    hashes = np.fromiter((_hash32(s) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    # Universal hashing (a*x + b) mod p for every permutation at once; uint64 wrap-around is intended
+    permuted = np.bitwise_and((np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME, _MAX_HASH)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def to_bytes(sig):
+    return sig.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+
+def band_keys(sig):
+    """One integer per band: band number in the top bits, 56-bit hash of the band's rows below."""
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS].astype('<u4').tobytes()
+        band_hash = int.from_bytes(hashlib.blake2b(rows, digest_size=7).digest(), 'little')
+        keys.append((band << 56) | band_hash)
+    return keys
+
+
+def estimated_jaccard(sig_a, sig_b):
+    return float(np.mean(sig_a == sig_b))
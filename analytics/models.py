@@ -37,3 +37,89 @@ class PlagiarismReport(models.Model):
 
     def __str__(self):
         return f"{self.submission_a.student} vs {self.submission_b.student} ({self.similarity_score}%)"
+
+
+class RiskDirtyStudent(models.Model):
+    """Students whose Attendance/Grade rows changed since their risk score was last computed."""
+    student = models.OneToOneField(StudentProfile, on_delete=models.CASCADE, primary_key=True)
+    marked_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def mark(cls, student_ids):
+        # Upsert so that marked_at moves forward for students that are already dirty
+        cls.objects.bulk_create(
+            [cls(student_id=student_id) for student_id in student_ids],
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['marked_at'],
+        )
+
+    def __str__(self):
+        return f"{self.student} (dirty since {self.marked_at})"
+
+
+class ExtractedText(models.Model):
+    """PDF text keyed by the SHA-256 of the file, shared by every byte-identical upload."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    text = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]}... ({len(self.text)} chars)"
+
+
+class MinHashSignature(models.Model):
+    """MinHash signature of a submission's text (NUM_PERM little-endian uint32, see analytics/minhash.py)."""
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True)
+    signature = models.BinaryField()
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Signature of {self.submission_id}"
+
+
+class LshBucket(models.Model):
+    """One LSH band of a signature. Submissions that share a key are near-duplicate candidates."""
+    key = models.BigIntegerField(db_index=True)
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='lsh_buckets')
+
+    def __str__(self):
+        return f"{self.key} -> {self.submission_id}"
+
+
+class IngestJob(models.Model):
+    """Background work queued for a new submission: extract text, fingerprint, plagiarism check."""
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Ingest {self.submission_id} ({self.status})"
+
+
+class DashboardEvent(models.Model):
+    """
+    A small stats delta for open live dashboards ('subject:<id>' topic), written
+    when attendance or grades change and fanned out by analytics/events.py in every worker.
+    """
+    topic = models.CharField(max_length=40, db_index=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from core.models import Submission
+from core.utils import chunks
+from . import minhash
+from .models import MinHashSignature, LshBucket, PlagiarismReport
+from .plagiarism import scores_against
+from .utils import submission_texts
+
+
+# At most this many LSH candidates (best estimated Jaccard first) get exact TF-IDF scoring
+MAX_EXACT_CANDIDATES = 50
+
+
+def index_submissions(submissions, texts, batch_size=1000):
+    """
+    Store the MinHash signature and LSH band keys of each submission (replacing old ones).
+    Returns {submission_id: signature} for the submissions that had any text.
+    """
+    signatures = {}
+    for submission, text in zip(submissions, texts):
+        sig = minhash.signature(text)
+        if sig is not None:
+            signatures[submission.pk] = sig
+
+    with transaction.atomic():
+        for ids in chunks(submission.pk for submission in submissions):
+            LshBucket.objects.filter(submission_id__in=ids).delete()
+            MinHashSignature.objects.filter(submission_id__in=ids).exclude(submission_id__in=signatures).delete()
+
+        MinHashSignature.objects.bulk_create(
+            [MinHashSignature(submission_id=pk, signature=minhash.to_bytes(sig)) for pk, sig in signatures.items()],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['submission'],
+            update_fields=['signature', 'indexed_at'],
+        )
+        LshBucket.objects.bulk_create(
+            [LshBucket(key=key, submission_id=pk) for pk, sig in signatures.items() for key in minhash.band_keys(sig)],
+            batch_size=batch_size,
+        )
+
+    return signatures
+
+
+def find_candidates(sig, exclude_id=None, min_jaccard=None):
+    """
+    Indexed submissions (any assignment, any year) that share at least one LSH band with
+    the signature, as [(submission_id, estimated_jaccard)] best first.
+    """
+    if min_jaccard is None:
+        min_jaccard = settings.NEAR_DUPLICATE_MIN_JACCARD
+
+    candidate_ids = set(
+        LshBucket.objects.filter(key__in=minhash.band_keys(sig)).values_list('submission_id', flat=True)
+    )
+    candidate_ids.discard(exclude_id)
+    if not candidate_ids:
+        return []
+
+    # LSH only guarantees a shared band; the full signatures weed out weak matches cheaply.
+    # Popular bands can match many submissions, so they are read a chunk at a time.
+    estimates = []
+    for ids in chunks(sorted(candidate_ids)):
+        for submission_id, data in MinHashSignature.objects.filter(submission_id__in=ids).values_list(
+            'submission_id', 'signature'
+        ):
+            jaccard = minhash.estimated_jaccard(sig, minhash.from_bytes(data))
+            if jaccard >= min_jaccard:
+                estimates.append((submission_id, jaccard))
+    estimates.sort(key=lambda item: -item[1])
+    return estimates
+
+
+def check_submission(submission, threshold=None):
+    """
+    Index one submission and score it exactly against its LSH candidates only.
+    Pairs at or above the threshold are stored as PlagiarismReports (older submission first).
+    Texts are extracted before any write: only the index and report writes share a transaction.
+    Raises ExtractionFailed when the submission's own PDF times out, so it can be retried.
+    """
+    if threshold is None:
+        threshold = settings.PLAGIARISM_THRESHOLD
+
+    text = submission_texts([submission], workers=1, strict=True)[0]
+    sig = minhash.signature(text)
+    if sig is None:
+        index_submissions([submission], [text])
+        return []
+
+    candidate_ids = [pk for pk, _ in find_candidates(sig, exclude_id=submission.pk)[:MAX_EXACT_CANDIDATES]]
+    candidates = [
+        candidate
+        for ids in chunks(sorted(candidate_ids))
+        for candidate in Submission.objects.filter(pk__in=ids).order_by('pk')
+    ]
+    scores = scores_against(text, submission_texts(candidates, workers=1))
+
+    reports = []
+    for candidate, score in zip(candidates, scores):
+        if score < threshold:
+            continue
+        first, second = sorted([candidate, submission], key=lambda s: s.pk)
+        reports.append(PlagiarismReport(
+            assignment=submission.assignment,
+            submission_a=first,
+            submission_b=second,
+            similarity_score=min(score, 100),
+        ))
+
+    with transaction.atomic():
+        index_submissions([submission], [text])
+        for ids in chunks(candidate_ids):
+            PlagiarismReport.objects.filter(
+                Q(submission_a=submission, submission_b_id__in=ids)
+                | Q(submission_b=submission, submission_a_id__in=ids)
+            ).delete()
+        PlagiarismReport.objects.bulk_create(reports)
+
+    return reports
@@ -0,0 +1,84 @@
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from sklearn.feature_extraction.text import TfidfVectorizer
+from core.models import Submission
+from .models import PlagiarismReport
+from .utils import submission_texts
+
+
+def similar_pairs(texts, threshold):
+    """
+    Fit one TF-IDF vectorizer over the whole corpus and return every pair (i, j, score)
+    with i < j and cosine similarity >= threshold (0-100), from a single sparse product.
+    """
+    indexes = [i for i, text in enumerate(texts) if text]
+    if len(indexes) < 2:
+        return []
+
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+    try:
+        tfidf_matrix = vectorizer.fit_transform([texts[i] for i in indexes])
+    except ValueError:
+        # Only stop words / no usable tokens in the corpus
+        return []
+
+    # Rows are L2-normalised, so X @ X.T is the full cosine-similarity matrix
+    similarity = sparse.triu(tfidf_matrix @ tfidf_matrix.T, k=1).tocoo()
+    keep = similarity.data * 100 >= threshold
+
+    pairs = []
+    for row, col, score in zip(similarity.row[keep], similarity.col[keep], similarity.data[keep]):
+        pairs.append((indexes[row], indexes[col], round(float(score) * 100, 2)))
+    return pairs
+
+
+def scores_against(text, others):
+    """Similarity (0-100) of `text` to each of `others`, from one TF-IDF fit over all of them."""
+    scores = [0.0] * len(others)
+    indexes = [i for i, other in enumerate(others) if other]
+    if not text or not indexes:
+        return scores
+
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+    try:
+        tfidf_matrix = vectorizer.fit_transform([text] + [others[i] for i in indexes])
+    except ValueError:
+        return scores
+
+    similarity = (tfidf_matrix[1:] @ tfidf_matrix[0].T).toarray().ravel()
+    for i, score in zip(indexes, similarity):
+        scores[i] = round(float(score) * 100, 2)
+    return scores
+
+
+def check_assignment(assignment, threshold=None, batch_size=1000, workers=None, timeout=None, progress=None):
+    """
+    Compare every submission of an assignment against each other and store the flagged pairs.
+    `workers`, `timeout` and `progress` are passed through to the text extraction pool.
+    """
+    if threshold is None:
+        threshold = settings.PLAGIARISM_THRESHOLD
+
+    submissions = list(Submission.objects.filter(assignment=assignment).order_by('id'))
+    texts = submission_texts(submissions, workers, timeout, progress)
+    pairs = similar_pairs(texts, threshold)
+
+    reports = [
+        PlagiarismReport(
+            assignment=assignment,
+            submission_a=submissions[i],
+            submission_b=submissions[j],
+            similarity_score=min(score, 100),
+        )
+        for i, j, score in pairs
+    ]
+
+    with transaction.atomic():
+        # Only pairs inside this assignment; cross-assignment matches belong to the near-duplicate index
+        PlagiarismReport.objects.filter(
+            submission_a__assignment=assignment, submission_b__assignment=assignment
+        ).delete()
+        PlagiarismReport.objects.bulk_create(reports, batch_size=batch_size)
+
+    return len(submissions), reports
@@ -0,0 +1,81 @@
+import functools
+import itertools
+from pathlib import Path
+
+import joblib
+from django.conf import settings
+from django.utils import timezone
+
+
+LATEST_POINTER = 'LATEST'
+
+
+def model_dir():
+    return Path(settings.RISK_MODEL_DIR)
+
+
+def artifact_path(version):
+    return model_dir() / f'risk-{version}.joblib'
+
+
+def save_model(classifier, feature_names, passing_marks, risk_threshold, **metadata):
+    """Persist a trained classifier as a versioned artifact and make it the latest one."""
+    trained_at = timezone.now()
+    model_dir().mkdir(parents=True, exist_ok=True)
+    # Microseconds keep versions apart; the suffix covers clocks that repeat a reading.
+    # Creating the file exclusively means an artifact (and its cached load) is never replaced.
+    base = trained_at.strftime('v%Y%m%d-%H%M%S-%f')
+    for attempt in itertools.count():
+        version = f'{base}-{attempt}' if attempt else base
+        try:
+            handle = open(artifact_path(version), 'xb')
+        except FileExistsError:
+            continue
+        break
+
+    artifact = {
+        'version': version,
+        'trained_at': trained_at.isoformat(),
+        'classifier': classifier,
+        'feature_names': list(feature_names),
+        'passing_marks': passing_marks,
+        'risk_threshold': risk_threshold,
+        **metadata,
+    }
+
+    with handle:
+        joblib.dump(artifact, handle)
+    # Write the pointer last so readers never see a version whose file is missing
+    (model_dir() / LATEST_POINTER).write_text(version)
+    return artifact
+
+
+def latest_version():
+    pointer = model_dir() / LATEST_POINTER
+    if not pointer.exists():
+        return None
+    return pointer.read_text().strip() or None
+
+
+@functools.lru_cache(maxsize=4)
+def _load(path):
+    return joblib.load(path)
+
+
+def load_model(version=None):
+    """Load an artifact (the latest one by default). Returns None if it does not exist."""
+    version = version or latest_version()
+    if not version:
+        return None
+    path = artifact_path(version)
+    if not path.exists():
+        return None
+    return _load(str(path))
+
+
+def predict_risk(artifact, X):
+    """Vectorized risk scores (0-100) for a whole feature matrix in one call."""
+    classifier = artifact['classifier']
+    if classifier.n_classes_ > 1:
+        return classifier.predict_proba(X)[:, 1] * 100
+    return classifier.predict(X).astype(float) * 100
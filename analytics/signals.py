@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from core.models import Submission
+from core.signals import attendance_changed, grades_changed
+from .events import publish_stats_deltas
+from .models import RiskDirtyStudent, IngestJob
+
+
+@receiver(attendance_changed)
+@receiver(grades_changed)
+def mark_risk_dirty(sender, pairs, **kwargs):
+    """Queue the affected students for the next `train_risk_model --incremental` run."""
+    student_ids = {student_id for student_id, _ in pairs}
+    RiskDirtyStudent.mark(student_ids)
+
+
+@receiver(attendance_changed)
+@receiver(grades_changed)
+def push_dashboard_deltas(sender, pairs, **kwargs):
+    """Open dashboards get the new totals over /analytics/events/ once the write commits."""
+    transaction.on_commit(lambda: publish_stats_deltas(pairs))
+
+
+@receiver(post_save, sender=Submission)
+def queue_submission_ingest(sender, instance, created, **kwargs):
+    """Text extraction and plagiarism checks run in `run_ingest_worker`, not in the upload request."""
+    if created:
+        IngestJob.objects.create(submission=instance)
@@ -0,0 +1,436 @@
+import datetime
+import itertools
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from core.models import Attendance, Grade, StudentProfile, Subject
+from .frames import CHUNK_SIZE, iter_frames
+
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 3
+
+# Attendance status bits
+PRESENT = 1
+ABSENT = 2
+
+# Column files: {prefix}_{column}.bin, raw little-endian arrays of these dtypes
+ID_DTYPE = np.dtype('<i8')
+ATTENDANCE_COLUMNS = {
+    'id': ID_DTYPE,              # database id, ascending (appends only add larger ones)
+    'student': np.dtype('<i4'),  # code, an index into the student ids
+    'subject': np.dtype('<i4'),  # code, an index into the subject ids
+    'day': np.dtype('<i4'),      # days since 1970-01-01
+    'status': np.dtype('u1'),    # PRESENT / ABSENT bits
+}
+GRADE_COLUMNS = {
+    'id': ID_DTYPE,
+    'student': np.dtype('<i4'),
+    'subject': np.dtype('<i4'),
+    'marks': np.dtype('<i4'),    # hundredths of a mark, so sums stay exact
+}
+
+# An append re-reads rows whose updated_at is at most this long before the previous export
+# started: a write still uncommitted while that export read the table is not missed
+CHANGE_MARGIN = datetime.timedelta(minutes=10)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_dir():
+    return Path(settings.ANALYTICS_SNAPSHOT_DIR)
+
+
+def _column_path(path, prefix, column):
+    return path / f'{prefix}_{column}.bin'
+
+
+def _map(file_path, dtype, length):
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(file_path, dtype=dtype, mode='r', shape=(length,))
+
+
+class Snapshot:
+    """
+    A columnar copy of the Attendance and Grade history, mapped read-only from disk.
+    Arrays are numpy memmaps: loading copies nothing and never touches the database.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.student_ids = _map(path / 'students.bin', ID_DTYPE, manifest['students'])
+        self.subject_ids = _map(path / 'subjects.bin', ID_DTYPE, manifest['subjects'])
+        self.attendance = ATTENDANCE.map(path, manifest)
+        self.grades = GRADES.map(path, manifest)
+
+    @property
+    def exported_at(self):
+        return datetime.datetime.fromisoformat(self.manifest['exported_at'])
+
+    def dates(self):
+        """Attendance days as datetime64[D] (a copy; the snapshot stores int32 day numbers)."""
+        return self.attendance['day'].astype('datetime64[D]')
+
+    def student_frame(self, passing_marks=None):
+        """
+        Same rows as `frames.student_frame` for every student in the snapshot, computed
+        with bincounts over the mapped columns (any passing mark, no extra cost).
+        """
+        if passing_marks is None:
+            passing_marks = settings.PASSING_MARKS
+        students = len(self.student_ids)
+        subjects = max(len(self.subject_ids), 1)
+
+        att_student = self.attendance['student']
+        status = self.attendance['status']
+        total = np.bincount(att_student, minlength=students)
+        present = np.bincount(att_student, weights=status & PRESENT, minlength=students)
+        absent = np.bincount(att_student, weights=(status & ABSENT) >> 1, minlength=students)
+
+        grade_student = self.grades['student']
+        marks = self.grades['marks']
+        grade_count = np.bincount(grade_student, minlength=students)
+        marks_total = np.bincount(grade_student, weights=marks, minlength=students) / 100
+
+        # Subjects are counted once per student, however many grades a pair has
+        pairs = grade_student.astype(np.int64) * subjects + self.grades['subject']
+        graded = np.bincount(np.unique(pairs) // subjects, minlength=students)
+        failing_pairs = np.unique(pairs[marks < passing_marks * 100])
+        failing = np.bincount(failing_pairs // subjects, minlength=students)
+
+        recent_absences, absence_streak = self._absence_runs(students, subjects)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_marks = np.where(grade_count > 0, marks_total / grade_count, np.nan)
+
+        frame = pd.DataFrame({
+            'total': total,
+            'present': present,
+            'absent': absent,
+            'avg_marks': avg_marks,
+            'graded': graded,
+            'failing': failing,
+            'recent_absences': recent_absences,
+            'absence_streak': absence_streak,
+        }, index=pd.Index(self.student_ids, name='student_id'))
+        frame['avg_marks'] = frame['avg_marks'].round(2)
+        return frame.astype({
+            'total': 'int32', 'present': 'int32', 'absent': 'int32', 'graded': 'int32', 'failing': 'int32',
+            'recent_absences': 'int32', 'absence_streak': 'int32',
+        }).sort_index()
+
+    def _absence_runs(self, students, subjects):
+        """
+        Per student: absences among each subject's latest settings.RECENT_CLASSES classes
+        (summed) and the longest run of absences up to a subject's latest class, as
+        `core.attendance_bits.AttendanceBits` computes them for StudentSubjectStats.
+        """
+        recent = np.zeros(students, dtype=np.int64)
+        streak = np.zeros(students, dtype=np.int64)
+        rows = len(self.attendance['student'])
+        if rows == 0:
+            return recent, streak
+
+        # Each pair's classes in date order (appended exports are not)
+        pairs = self.attendance['student'].astype(np.int64) * subjects + self.attendance['subject']
+        order = np.lexsort((self.attendance['day'], pairs))
+        pairs = pairs[order]
+        present = (self.attendance['status'][order] & PRESENT).astype(bool)
+
+        starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]])
+        ends = np.r_[starts[1:], rows]
+        pair_students = pairs[starts] // subjects
+        position = np.arange(rows)
+
+        from_end = np.repeat(ends, ends - starts) - position
+        missed = ~present & (from_end <= settings.RECENT_CLASSES)
+        recent += np.bincount(pairs[missed] // subjects, minlength=students)
+
+        # Classes after the pair's last present one (or all of them when there is none)
+        last_present = np.maximum.reduceat(np.where(present, position, -1), starts)
+        np.maximum.at(streak, pair_students, ends - 1 - np.maximum(last_present, starts - 1))
+        return recent, streak
+
+
+def load_snapshot(path=None):
+    """The snapshot at `path` (default settings.ANALYTICS_SNAPSHOT_DIR), or None if there is none."""
+    path = Path(path) if path is not None else snapshot_dir()
+    try:
+        manifest = json.loads((path / MANIFEST).read_text())
+    except FileNotFoundError:
+        return None
+    if manifest.get('version') != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format {manifest.get('version')} is not {FORMAT_VERSION}. Re-export it.")
+    return Snapshot(path, manifest)
+
+
+class _Codes:
+    """Dense int32 codes for database ids. New ids get the next codes, so old codes never move."""
+
+    def __init__(self, ids):
+        self.ids = np.asarray(ids, dtype=ID_DTYPE)
+        self._index()
+
+    def _index(self):
+        self._order = np.argsort(self.ids, kind='stable')
+        self._sorted = self.ids[self._order]
+
+    def encode(self, ids):
+        ids = np.asarray(ids, dtype=ID_DTYPE)
+        missing = np.setdiff1d(ids, self.ids)
+        if len(missing):
+            # Rows of students/subjects created while the export was running
+            self.ids = np.concatenate([self.ids, missing])
+            self._index()
+        return self._order[np.searchsorted(self._sorted, ids)].astype(np.int32)
+
+
+def _write_manifest(path, manifest):
+    # Written last and swapped in atomically: readers only map rows the manifest counts
+    temp = path / f'{MANIFEST}.tmp'
+    temp.write_text(json.dumps(manifest, indent=2))
+    os.replace(temp, path / MANIFEST)
+
+
+class _ColumnFiles:
+    """The open files of one column group, appending after the first `rows` rows."""
+
+    def __init__(self, path, prefix, dtypes, rows=0):
+        self.dtypes = dtypes
+        self.files = {}
+        for column, dtype in dtypes.items():
+            handle = open(_column_path(path, prefix, column), 'r+b' if rows else 'wb')
+            # Drop anything a crashed append wrote past the manifest's row count
+            handle.truncate(rows * dtype.itemsize)
+            handle.seek(0, os.SEEK_END)
+            self.files[column] = handle
+
+    def write(self, columns):
+        for column, values in columns.items():
+            self.files[column].write(np.ascontiguousarray(values, dtype=self.dtypes[column]).tobytes())
+
+    def close(self):
+        for handle in self.files.values():
+            handle.close()
+
+
+def _status_bits(frame):
+    status = frame['status'].to_numpy()
+    return np.where(status == 'P', PRESENT, np.where(status == 'A', ABSENT, 0))
+
+
+def _marks_hundredths(frame):
+    return np.rint(frame['marks'].to_numpy() * 100)
+
+
+def _encode_attendance(frame, students, subjects):
+    return {
+        'id': frame['id'],
+        'student': students.encode(frame['student_id']),
+        'subject': subjects.encode(frame['subject_id']),
+        'day': frame['date'].to_numpy().astype('datetime64[D]').astype(np.int64),
+    }
+
+
+def _encode_grades(frame, students, subjects):
+    return {
+        'id': frame['id'],
+        'student': students.encode(frame['student_id']),
+        'subject': subjects.encode(frame['subject_id']),
+    }
+
+
+def _next_generation(prefix, name):
+    return f"{name}{int(prefix.removeprefix(name) or 0) + 1}"
+
+
+class _Table:
+    """
+    How one model is stored. Rows are appended in id order; the one column edited in place
+    (`edited`, also the manifest key of its file) has generations, so patching it never
+    touches a file a reader may have mapped.
+    """
+
+    def __init__(self, name, model, dtypes, columns, encode, edited, encode_edited, rows_key, last_id_key):
+        self.name = name
+        self.model = model
+        self.dtypes = dtypes
+        self.columns = columns
+        self.encode = encode
+        self.edited = edited
+        self.encode_edited = encode_edited
+        self.rows_key = rows_key
+        self.last_id_key = last_id_key
+
+    def map(self, path, manifest):
+        return {
+            column: _map(
+                _column_path(path, manifest[self.edited] if column == self.edited else self.name, column),
+                dtype,
+                manifest[self.rows_key],
+            )
+            for column, dtype in self.dtypes.items()
+        }
+
+    def check_deletes(self, manifest):
+        live_rows = self.model.objects.filter(id__lte=manifest[self.last_id_key]).count()
+        if live_rows != manifest[self.rows_key]:
+            raise SnapshotError(
+                f'{manifest[self.rows_key] - live_rows} exported {self.name} rows were deleted. Run a full export.'
+            )
+
+    def patch(self, path, manifest, ids, since, chunk_size):
+        """
+        Rewrite the edited column of the exported rows written at or after `since` (their
+        positions are found by id), in a new generation of the file. Returns the replaced
+        generation, or None when no exported row changed.
+        """
+        queryset = self.model.objects.filter(id__lte=manifest[self.last_id_key], updated_at__gte=since).order_by('id')
+        frames = iter_frames(queryset, {'id': 'int64', self.edited: self.columns[self.edited]}, chunk_size=chunk_size)
+        first = next(frames, None)
+        if first is None:
+            return None
+
+        old = manifest[self.edited]
+        manifest[self.edited] = _next_generation(old, self.name)
+        dtype, rows = self.dtypes[self.edited], manifest[self.rows_key]
+        target = _column_path(path, manifest[self.edited], self.edited)
+        with open(_column_path(path, old, self.edited), 'rb') as source, open(target, 'wb') as copy:
+            shutil.copyfileobj(source, copy)
+            # Drop anything a crashed append wrote past the manifest's row count
+            copy.truncate(rows * dtype.itemsize)
+
+        values = np.memmap(target, dtype=dtype, mode='r+', shape=(rows,))
+        for frame in itertools.chain([first], frames):
+            values[np.searchsorted(ids, frame['id'].to_numpy())] = self.encode_edited(frame)
+        values.flush()
+        del values
+        return old
+
+    def append(self, path, manifest, students, subjects, chunk_size):
+        """Append the rows with ids past the manifest's last one, and count them in it."""
+        rows = manifest[self.rows_key]
+        dtypes = {column: dtype for column, dtype in self.dtypes.items() if column != self.edited}
+        files = _ColumnFiles(path, self.name, dtypes, rows)
+        edited = _ColumnFiles(path, manifest[self.edited], {self.edited: self.dtypes[self.edited]}, rows)
+        try:
+            queryset = self.model.objects.filter(id__gt=manifest[self.last_id_key]).order_by('id')
+            for frame in iter_frames(queryset, self.columns, chunk_size=chunk_size):
+                files.write(self.encode(frame, students, subjects))
+                edited.write({self.edited: self.encode_edited(frame)})
+                rows += len(frame)
+                manifest[self.last_id_key] = int(frame['id'].iloc[-1])
+        finally:
+            files.close()
+            edited.close()
+        manifest[self.rows_key] = rows
+
+
+ATTENDANCE = _Table(
+    'attendance', Attendance, ATTENDANCE_COLUMNS,
+    {'id': 'int64', 'student_id': 'int64', 'subject_id': 'int64', 'date': 'datetime64[s]', 'status': 'str'},
+    _encode_attendance, 'status', _status_bits, 'attendance_rows', 'last_attendance_id',
+)
+GRADES = _Table(
+    'grades', Grade, GRADE_COLUMNS,
+    {'id': 'int64', 'student_id': 'int64', 'subject_id': 'int64', 'marks': 'float64'},
+    _encode_grades, 'marks', _marks_hundredths, 'grade_rows', 'last_grade_id',
+)
+TABLES = [ATTENDANCE, GRADES]
+
+
+def _ids(queryset, field):
+    return np.fromiter(queryset.order_by(field).values_list(field, flat=True).iterator(), dtype=ID_DTYPE)
+
+
+def export_snapshot(path=None, append=False, chunk_size=CHUNK_SIZE):
+    """
+    Export Attendance and Grade into a columnar snapshot at `path` and return its manifest.
+    A full export is written beside the old snapshot and swapped in when complete. With
+    `append`, only rows added or written since the last export are read (by id and by the
+    indexed updated_at): new rows are appended and edited statuses and marks patched.
+    Deleted rows need a full export.
+    """
+    path = Path(path) if path is not None else snapshot_dir()
+    current = load_snapshot(path) if append else None
+    if current is None:
+        return _full_export(path, chunk_size)
+
+    started = timezone.now()
+    manifest = dict(current.manifest)
+    since = datetime.datetime.fromisoformat(manifest['changes_since'])
+    for table in TABLES:
+        table.check_deletes(manifest)
+
+    students = _Codes(current.student_ids)
+    subjects = _Codes(current.subject_ids)
+    known_students, known_subjects = len(students.ids), len(subjects.ids)
+    students.encode(_ids(StudentProfile.objects.all(), 'user_id'))
+    subjects.encode(_ids(Subject.objects.all(), 'id'))
+
+    replaced = []
+    for table, rows in ((ATTENDANCE, current.attendance), (GRADES, current.grades)):
+        old = table.patch(path, manifest, rows['id'], since, chunk_size)
+        if old is not None:
+            replaced.append(_column_path(path, old, table.edited))
+        table.append(path, manifest, students, subjects, chunk_size)
+
+    for name, codes, known in (('students', students, known_students), ('subjects', subjects, known_subjects)):
+        with open(path / f'{name}.bin', 'r+b') as handle:
+            handle.truncate(known * ID_DTYPE.itemsize)
+            handle.seek(0, os.SEEK_END)
+            handle.write(codes.ids[known:].tobytes())
+        manifest[name] = len(codes.ids)
+
+    manifest['exported_at'] = timezone.now().isoformat()
+    manifest['changes_since'] = (started - CHANGE_MARGIN).isoformat()
+    _write_manifest(path, manifest)
+    # Open memmaps keep the replaced generations alive until they are closed
+    for file_path in replaced:
+        file_path.unlink(missing_ok=True)
+    return manifest
+
+
+def _full_export(path, chunk_size):
+    staging = path.with_name(f'{path.name}.new')
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    started = timezone.now()
+    manifest = {'version': FORMAT_VERSION}
+    for table in TABLES:
+        manifest.update({table.rows_key: 0, table.last_id_key: 0, table.edited: table.name})
+
+    students = _Codes(_ids(StudentProfile.objects.all(), 'user_id'))
+    subjects = _Codes(_ids(Subject.objects.all(), 'id'))
+    for table in TABLES:
+        table.append(staging, manifest, students, subjects, chunk_size)
+    (staging / 'students.bin').write_bytes(students.ids.tobytes())
+    (staging / 'subjects.bin').write_bytes(subjects.ids.tobytes())
+
+    manifest.update({
+        'exported_at': timezone.now().isoformat(),
+        'changes_since': (started - CHANGE_MARGIN).isoformat(),
+        'students': len(students.ids),
+        'subjects': len(subjects.ids),
+    })
+    _write_manifest(staging, manifest)
+
+    # Swap directories; processes still mapping the old files keep reading them
+    retired = path.with_name(f'{path.name}.old')
+    shutil.rmtree(retired, ignore_errors=True)
+    if path.exists():
+        path.rename(retired)
+    staging.rename(path)
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
@@ -1,3 +1,707 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import multiprocessing
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.tests import MEDIA_ROOT, QueryBudgetMixin, seed_dataset
+from core.models import Attendance, Grade, StudentProfile, Subject, Submission, User
+from core.stats import rebuild_stats
+from core.utils import CHUNK_SIZE
+from . import minhash, registry
+from .benchmarks import compare
+from .events import RESYNC, EventBroker, subject_topic
+from .features import FEATURE_NAMES, build_student_features
+from .ingest import MAX_ATTEMPTS, claim_next_job, requeue_stale_jobs, run_job
+from .models import (
+    DashboardEvent, ExtractedText, IngestJob, LshBucket, MinHashSignature, PlagiarismReport, RiskDirtyStudent, StudentRisk,
+)
+from .near_duplicates import check_submission, find_candidates, index_submissions
+from .plagiarism import check_assignment, scores_against, similar_pairs
+from .snapshot import ABSENT, SnapshotError, export_snapshot, load_snapshot
+from .utils import cached_texts, extract_texts_parallel
+
+
+MODEL_DIR = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RISK_MODEL_DIR=MODEL_DIR)
+class AnalyticsQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset()
+        cls.teacher_user = cls.data['teacher'].user
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
+
+    def train(self, *args):
+        out = StringIO()
+        call_command('train_risk_model', *args, stdout=out)
+        return out.getvalue()
+
+    def test_train_risk_model(self):
+        # Features come from the precomputed stats, so the cost does not grow with the students
+        self.assertMaxQueries(10, self.train)
+        self.assertEqual(StudentRisk.objects.count(), len(self.data['students']))
+
+    def test_score_only_uses_saved_model(self):
+        self.train()
+        output = self.assertMaxQueries(10, self.train, '--score-only')
+        self.assertIn('Scoring with saved model', output)
+        self.assertEqual(StudentRisk.objects.count(), len(self.data['students']))
+
+    def test_incremental_scores_dirty_students_with_saved_model(self):
+        self.train()
+        version = registry.latest_version()
+        student = self.data['students'][0]
+        RiskDirtyStudent.mark([student.pk])
+
+        output = self.train('--incremental')
+        self.assertIn('Rescoring 1 changed students', output)
+        self.assertIn(f'Scoring with saved model {version}', output)
+        self.assertEqual(registry.latest_version(), version)
+        self.assertEqual(set(StudentRisk.objects.values_list('model_version', flat=True)), {version})
+        self.assertEqual(StudentRisk.objects.count(), len(self.data['students']))
+        self.assertFalse(RiskDirtyStudent.objects.exists())
+
+    def test_deleting_a_subject_marks_its_students_dirty(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data['subjects'][0].delete()
+        self.assertEqual(RiskDirtyStudent.objects.count(), len(self.data['students']))
+
+    def test_incremental_keeps_student_marked_again_mid_run(self):
+        self.train()
+        student = self.data['students'][0]
+        RiskDirtyStudent.mark([student.pk])
+        predict_risk = registry.predict_risk
+
+        def predict_and_mark(artifact, X):
+            # A grade saved while the run is scoring
+            RiskDirtyStudent.mark([student.pk])
+            return predict_risk(artifact, X)
+
+        with mock.patch.object(registry, 'predict_risk', predict_and_mark):
+            self.train('--incremental')
+        self.assertEqual(StudentRisk.objects.filter(student=student).count(), 1)
+        self.assertTrue(RiskDirtyStudent.objects.filter(student=student).exists())
+
+    def test_incremental_without_saved_model_trains_everyone(self):
+        with override_settings(RISK_MODEL_DIR=tempfile.mkdtemp(dir=MODEL_DIR)):
+            RiskDirtyStudent.mark([self.data['students'][0].pk])
+            output = self.train('--incremental')
+            self.assertIn('No saved risk model yet', output)
+            version = registry.latest_version()
+        self.assertEqual(StudentRisk.objects.filter(model_version=version).count(), len(self.data['students']))
+        self.assertFalse(RiskDirtyStudent.objects.exists())
+
+    def test_models_saved_in_the_same_instant_get_their_own_versions(self):
+        with override_settings(RISK_MODEL_DIR=tempfile.mkdtemp(dir=MODEL_DIR)):
+            now = timezone.now()
+            with mock.patch('analytics.registry.timezone.now', return_value=now):
+                first = registry.save_model('first', FEATURE_NAMES, 40.0, 50.0)
+                second = registry.save_model('second', FEATURE_NAMES, 40.0, 50.0)
+            self.assertNotEqual(first['version'], second['version'])
+            self.assertEqual(registry.load_model(first['version'])['classifier'], 'first')
+            self.assertEqual(registry.load_model()['classifier'], 'second')
+
+    def test_score_only_rejects_model_with_other_features(self):
+        # A model saved before the attendance streak features were added
+        registry.save_model(object(), FEATURE_NAMES[:6], 40.0, 50.0)
+        with self.assertRaisesMessage(CommandError, 'Retrain it.'):
+            self.train('--score-only')
+
+    def test_at_risk_students(self):
+        self.train()
+        self.client.force_login(self.teacher_user)
+        response = self.assertMaxQueries(7, self.client.get, reverse('at_risk_students'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_live_dashboard(self):
+        self.client.force_login(self.teacher_user)
+        response = self.assertMaxQueries(8, self.client.get, reverse('live_dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class LiveDashboardDataTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=10, days=3)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.data['teacher'].user)
+        self.url = reverse('live_dashboard_data')
+
+    def test_unchanged_poll_is_not_modified_without_aggregates(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('subject_avgs', first.json())
+
+        # Session, user and teacher profile; the version comes from the cache
+        poll = self.assertMaxQueries(3, self.client.get, self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(poll.status_code, 304)
+        self.assertEqual(poll['ETag'], first['ETag'])
+
+        poll = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(poll.status_code, 304)
+
+    def test_attendance_change_changes_etag(self):
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(
+                student=self.data['students'][0], subject=self.data['subjects'][0],
+                date=datetime.date(2026, 6, 1), status='P',
+            )
+        poll = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(poll.status_code, 200)
+        self.assertNotEqual(poll['ETag'], first['ETag'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class FeatureFrameTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=6, days=4)
+        user = User.objects.create(username='newcomer', is_student=True)
+        cls.newcomer = StudentProfile.objects.create(user=user, roll_number='R9999', batch_year='2025')
+
+    def test_features_match_the_raw_tables(self):
+        features = build_student_features(40.0)
+        self.assertEqual(list(features.columns), FEATURE_NAMES)
+        self.assertEqual(features.index.tolist(), sorted(s.pk for s in self.data['students'] + [self.newcomer]))
+
+        student = self.data['students'][0]
+        rows = Attendance.objects.filter(student=student)
+        row = features.loc[student.pk]
+        self.assertAlmostEqual(row['attendance_pct'], rows.filter(status='P').count() / rows.count() * 100)
+        self.assertEqual(row['absence_count'], rows.filter(status='A').count())
+        self.assertEqual(row['total_subjects'], len(self.data['subjects']))
+
+    def test_student_without_stats_gets_defaults(self):
+        row = build_student_features(40.0).loc[self.newcomer.pk]
+        self.assertEqual(row.tolist(), [100.0, 0.0, 0, 0, 0.0, 0, 0, 0])
+
+    def test_custom_passing_marks_recount_failing_subjects(self):
+        features = build_student_features(101.0)
+        graded = features.drop(self.newcomer.pk)
+        self.assertTrue((graded['failing_subjects'] == graded['total_subjects']).all())
+        self.assertTrue((graded['fail_ratio'] == 1.0).all())
+
+        strict = Grade.objects.filter(marks__lt=60).values('student_id', 'subject_id').distinct().count()
+        self.assertEqual(build_student_features(60.0)['failing_subjects'].sum(), strict)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=6, days=4)
+        # Written long before any export, so appends only see the rows a test writes
+        written = timezone.now() - datetime.timedelta(days=1)
+        Attendance.objects.update(updated_at=written)
+        Grade.objects.update(updated_at=written)
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+
+    def test_snapshot_features_match_the_database(self):
+        export_snapshot(self.path)
+        with self.assertNumQueries(0):
+            snapshot = load_snapshot(self.path)
+            from_snapshot = build_student_features(55.0, snapshot=snapshot)
+        self.assertTrue(from_snapshot.equals(build_student_features(55.0)))
+        self.assertEqual(len(snapshot.attendance['day']), Attendance.objects.count())
+
+    @override_settings(RECENT_CLASSES=2)
+    def test_snapshot_absence_runs_match_the_bitmaps(self):
+        rebuild_stats()
+        # Appended rows are out of date order: this absence is the pair's oldest class
+        export_snapshot(self.path)
+        student, subject = self.data['students'][1], self.data['subjects'][1]
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(student=student, subject=subject, date=datetime.date(2025, 12, 1), status='A')
+        export_snapshot(self.path, append=True)
+
+        columns = ['recent_absences', 'absence_streak']
+        from_snapshot = build_student_features(40.0, snapshot=load_snapshot(self.path))[columns]
+        self.assertTrue(from_snapshot.equals(build_student_features(40.0)[columns]))
+        self.assertGreater(from_snapshot['absence_streak'].sum(), 0)
+
+    def test_append_adds_new_attendance_and_refreshes_grades(self):
+        export_snapshot(self.path)
+        student, subject = self.data['students'][0], self.data['subjects'][0]
+        Attendance.objects.create(student=student, subject=subject, date=datetime.date(2026, 6, 1), status='A')
+        for grade in Grade.objects.filter(student=student):
+            grade.marks = 10
+            grade.save()
+
+        manifest = export_snapshot(self.path, append=True)
+        self.assertEqual(manifest['attendance_rows'], Attendance.objects.count())
+        self.assertEqual((manifest['status'], manifest['marks']), ('attendance', 'grades1'))
+        snapshot = load_snapshot(self.path)
+        self.assertEqual(str(snapshot.dates()[-1]), '2026-06-01')
+        self.assertEqual(snapshot.attendance['status'][-1], ABSENT)
+        self.assertEqual(build_student_features(40.0, snapshot=snapshot).loc[student.pk, 'avg_marks'], 10.0)
+
+    def test_append_picks_up_statuses_changed_in_place(self):
+        export_snapshot(self.path)
+        student, subject = self.data['students'][0], self.data['subjects'][0]
+        record = Attendance.objects.filter(student=student, subject=subject, status='P').order_by('id').first()
+        # Re-marking a class keeps the row (and its id), as take_attendance's upsert does
+        record.status = 'A'
+        with self.captureOnCommitCallbacks(execute=True):
+            record.save()
+
+        export_snapshot(self.path, append=True)
+        snapshot = load_snapshot(self.path)
+        self.assertTrue(build_student_features(55.0, snapshot=snapshot).equals(build_student_features(55.0)))
+        absent = (snapshot.attendance['status'] == ABSENT).sum()
+        self.assertEqual(absent, Attendance.objects.filter(status='A').count())
+        status_files = [name for name in os.listdir(self.path) if name.endswith('_status.bin')]
+        self.assertEqual(status_files, ['attendance1_status.bin'])
+
+    def test_append_without_edits_keeps_the_edited_columns(self):
+        export_snapshot(self.path)
+        student, subject = self.data['students'][0], self.data['subjects'][0]
+        Grade.objects.create(student=student, subject=Subject.objects.create(name='New', code='NEW'), marks=70)
+        Attendance.objects.create(student=student, subject=subject, date=datetime.date(2026, 6, 1), status='P')
+
+        manifest = export_snapshot(self.path, append=True)
+        # Nothing exported was written since, so no status or marks file is copied
+        self.assertEqual((manifest['status'], manifest['marks']), ('attendance', 'grades'))
+        self.assertEqual(
+            (manifest['attendance_rows'], manifest['grade_rows']), (Attendance.objects.count(), Grade.objects.count()),
+        )
+        snapshot = load_snapshot(self.path)
+        self.assertEqual(snapshot.grades['marks'][-1], 7000)
+        ids = list(Attendance.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(snapshot.attendance['id'].tolist(), ids)
+
+    def test_append_after_deletes_needs_a_full_export(self):
+        export_snapshot(self.path)
+        Attendance.objects.filter(pk=Attendance.objects.order_by('id').first().pk).delete()
+        with self.assertRaises(SnapshotError):
+            export_snapshot(self.path, append=True)
+
+    def test_train_from_snapshot(self):
+        with override_settings(ANALYTICS_SNAPSHOT_DIR=f'{self.path}/snapshot', RISK_MODEL_DIR=f'{self.path}/models'):
+            call_command('export_snapshot', stdout=StringIO())
+            call_command('train_risk_model', '--from-snapshot', stdout=StringIO())
+        self.assertEqual(StudentRisk.objects.count(), len(self.data['students']))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DashboardEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=5, days=3)
+
+    def test_attendance_change_publishes_deltas(self):
+        student, subject = self.data['students'][0], self.data['subjects'][0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(student=student, subject=subject, date=datetime.date(2026, 6, 1), status='A')
+
+        subject_event = DashboardEvent.objects.get(topic=subject_topic(subject.pk))
+        self.assertEqual(subject_event.payload['type'], 'subject')
+        self.assertEqual(
+            subject_event.payload['present'] + subject_event.payload['absent'],
+            Attendance.objects.filter(subject=subject).count(),
+        )
+        # One event per subject, none per student: only subject topics are streamed
+        self.assertEqual(DashboardEvent.objects.count(), 1)
+
+    def test_wsgi_request_gets_no_content(self):
+        # Streams need an async server; under WSGI the page keeps polling instead
+        self.client.force_login(self.data['teacher'].user)
+        response = self.client.get(reverse('dashboard_events'))
+        self.assertEqual(response.status_code, 204)
+
+    def test_students_have_no_stream(self):
+        async def request():
+            client = AsyncClient()
+            await client.aforce_login(self.data['students'][0].user)
+            return await client.get(reverse('dashboard_events'))
+
+        self.assertEqual(async_to_sync(request)().status_code, 204)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, DASHBOARD_EVENTS_POLL_SECONDS=0.01)
+class EventBrokerTests(TransactionTestCase):
+
+    def test_poller_dispatches_new_events_to_subscribers(self):
+        async def receive():
+            broker = EventBroker()
+            queue = broker.subscribe([subject_topic(1)])
+            other = broker.subscribe([subject_topic(2)])
+            await asyncio.sleep(0.05)
+            await DashboardEvent.objects.acreate(topic=subject_topic(1), payload={'type': 'subject'})
+            try:
+                return await asyncio.wait_for(queue.get(), timeout=5), other.empty()
+            finally:
+                broker.unsubscribe(queue, [subject_topic(1)])
+                broker.unsubscribe(other, [subject_topic(2)])
+
+        event, other_empty = asyncio.run(receive())
+        self.assertEqual(event.topic, subject_topic(1))
+        self.assertTrue(other_empty)
+
+    def test_full_queue_is_replaced_by_resync(self):
+        async def overflow():
+            broker = EventBroker()
+            queue = broker.subscribe([subject_topic(1)])
+            broker._poller.cancel()
+            events = [DashboardEvent(pk=i, topic=subject_topic(1), payload={}) for i in range(1, 200)]
+            broker.dispatch(events)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        queued = asyncio.run(overflow())
+        self.assertIn(RESYNC, queued)
+        self.assertLess(len(queued), 200)
+
+
+ESSAY = 'photosynthesis converts light energy into chemical energy stored in glucose molecules'
+
+
+class SimilarPairsTests(TestCase):
+
+    def test_pairs_at_or_above_threshold(self):
+        texts = [ESSAY, '', ESSAY, 'the of and', 'plate tectonics shapes continents over millions of years']
+        self.assertEqual(similar_pairs(texts, 90), [(0, 2, 100.0)])
+
+        partial = [ESSAY, 'photosynthesis converts light energy while volcanoes erupt molten rock']
+        [(i, j, score)] = similar_pairs(partial, 10)
+        self.assertEqual((i, j), (0, 1))
+        self.assertLess(score, 90)
+        self.assertEqual(similar_pairs(partial, 90), [])
+
+    def test_empty_and_stop_word_texts_have_no_pairs(self):
+        self.assertEqual(similar_pairs(['', ESSAY, ''], 0), [])
+        self.assertEqual(similar_pairs(['the and of', 'of the and', ''], 0), [])
+        self.assertEqual(scores_against('', [ESSAY]), [0.0])
+        self.assertEqual(scores_against(ESSAY, ['', ESSAY]), [0.0, 100.0])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CheckAssignmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=6, subjects=2, days=1)
+        cls.assignment, cls.other = cls.data['assignments']
+        cls.own = list(Submission.objects.filter(assignment=cls.assignment).order_by('id'))
+        cls.theirs = list(Submission.objects.filter(assignment=cls.other).order_by('id'))
+
+    def report(self, a, b):
+        return PlagiarismReport.objects.create(
+            assignment=a.assignment, submission_a=a, submission_b=b, similarity_score=95,
+        )
+
+    def test_replaces_only_the_assignments_own_reports(self):
+        stale = self.report(self.own[0], self.own[1])
+        other_assignment = self.report(self.theirs[0], self.theirs[1])
+        cross_assignment = self.report(self.own[0], self.theirs[0])
+
+        texts = [ESSAY, 'plate tectonics shapes continents', ESSAY]
+        with mock.patch('analytics.plagiarism.submission_texts', return_value=texts):
+            checked, reports = check_assignment(self.assignment, threshold=80)
+
+        self.assertEqual((checked, len(reports)), (3, 1))
+        self.assertFalse(PlagiarismReport.objects.filter(pk=stale.pk).exists())
+        self.assertEqual(PlagiarismReport.objects.filter(pk__in=[other_assignment.pk, cross_assignment.pk]).count(), 2)
+        report = PlagiarismReport.objects.get(submission_a__assignment=self.assignment, submission_b__assignment=self.assignment)
+        self.assertEqual((report.submission_a, report.submission_b), (self.own[0], self.own[2]))
+        self.assertEqual(float(report.similarity_score), 100.0)
+
+    def test_unreadable_submissions_clear_old_reports(self):
+        self.report(self.own[0], self.own[1])
+        with mock.patch('analytics.plagiarism.submission_texts', return_value=['', '', '']):
+            self.assertEqual(check_assignment(self.assignment, threshold=80), (3, []))
+        self.assertFalse(PlagiarismReport.objects.filter(assignment=self.assignment).exists())
+
+
+def _crash_on_first_pdf(path):
+    # Stands in for a parser that takes its worker process down with it
+    if path.endswith('f0.pdf'):
+        os._exit(1)
+    return f'text of {os.path.basename(path)}'
+
+
+def _read_any_pdf(path):
+    return f'text of {os.path.basename(path)}'
+
+
+@skipUnless(multiprocessing.get_start_method() == 'fork', 'workers must inherit the patched extractor')
+class ExtractionCrashTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.paths = []
+        for i in range(6):
+            path = os.path.join(directory, f'f{i}.pdf')
+            with open(path, 'w') as pdf_file:
+                pdf_file.write(f'%PDF-1.4 file {i}')
+            self.paths.append(path)
+
+    def test_crash_fails_only_the_crashing_file(self):
+        with mock.patch('analytics.utils.extract_text_from_pdf', _crash_on_first_pdf):
+            texts, failed = extract_texts_parallel(self.paths, workers=2)
+        self.assertEqual(failed, {0})
+        self.assertEqual(texts, [''] + [f'text of f{i}.pdf' for i in range(1, 6)])
+
+    def test_crashed_file_is_not_cached(self):
+        with mock.patch('analytics.utils.extract_text_from_pdf', _crash_on_first_pdf):
+            texts = cached_texts(self.paths, workers=2)
+        self.assertEqual(texts[0], '')
+        self.assertEqual(ExtractedText.objects.count(), 5)
+
+        with mock.patch('analytics.utils.extract_text_from_pdf', _read_any_pdf):
+            self.assertEqual(cached_texts(self.paths, workers=2)[0], 'text of f0.pdf')
+
+
+class CachedTextsTests(TestCase):
+
+    def test_known_hashes_are_looked_up_in_chunks(self):
+        # One IN (...) of every submission's hash would pass SQLite's variable limit at scale
+        hashes = [f'{i:064x}' for i in range(CHUNK_SIZE + 1)]
+        ExtractedText.objects.bulk_create([ExtractedText(sha256=sha256, text=sha256[-3:]) for sha256 in hashes])
+        with self.assertNumQueries(2):
+            texts = cached_texts(['unused.pdf'] * len(hashes), hashes=hashes)
+        self.assertEqual(texts, [sha256[-3:] for sha256 in hashes])
+
+
+FOX = 'The quick brown fox jumps over the lazy dog'
+LONG_ESSAY = ' '.join(f'word{i}' for i in range(200))
+NEAR_COPY = LONG_ESSAY.replace('word100 ', 'changed ')
+
+
+class MinHashTests(TestCase):
+
+    def test_signature_is_pinned(self):
+        # Stored signatures and band keys are only comparable while the seed and encodings hold
+        sig = minhash.signature(FOX)
+        self.assertEqual((sig.dtype, len(sig)), (np.uint32, minhash.NUM_PERM))
+        self.assertEqual(sig[:4].tolist(), [42788414, 386310529, 611189717, 5754530])
+        self.assertEqual(minhash.band_keys(sig)[:2], [45883263109121024, 103602579138332324])
+        self.assertTrue(np.array_equal(minhash.from_bytes(minhash.to_bytes(sig)), sig))
+
+    def test_band_keys(self):
+        sig = minhash.signature(LONG_ESSAY)
+        keys = minhash.band_keys(sig)
+        self.assertEqual(len(keys), minhash.BANDS)
+        self.assertEqual([key >> 56 for key in keys], list(range(minhash.BANDS)))
+
+        # Changing one band's rows changes that band's key only
+        other = sig.copy()
+        other[minhash.ROWS] += 1
+        changed = [a != b for a, b in zip(keys, minhash.band_keys(other))]
+        self.assertEqual(changed, [False, True] + [False] * (minhash.BANDS - 2))
+
+    def test_shingles_and_estimates(self):
+        self.assertIsNone(minhash.signature(''))
+        self.assertEqual(minhash.shingles('Two words'), {'two words'})
+        self.assertEqual(
+            minhash.signature('the  Quick, brown fox jumps!').tolist(),
+            minhash.signature('the quick brown fox jumps').tolist(),
+        )
+        sig = minhash.signature(LONG_ESSAY)
+        self.assertEqual(minhash.estimated_jaccard(sig, sig), 1.0)
+        self.assertGreater(minhash.estimated_jaccard(sig, minhash.signature(NEAR_COPY)), 0.8)
+        self.assertLess(minhash.estimated_jaccard(sig, minhash.signature(FOX)), 0.1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class NearDuplicateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=6, subjects=2, days=1)
+        cls.submissions = list(Submission.objects.order_by('id'))
+        # Submissions alternate between the two assignments
+        cls.original, cls.copy, cls.unrelated = cls.submissions[0], cls.submissions[1], cls.submissions[2]
+        cls.texts = {cls.original.pk: LONG_ESSAY, cls.copy.pk: NEAR_COPY, cls.unrelated.pk: FOX}
+
+    def texts_of(self, submissions, workers=None, strict=False):
+        return [self.texts.get(submission.pk, '') for submission in submissions]
+
+    def index(self, submissions):
+        return index_submissions(submissions, self.texts_of(submissions))
+
+    def test_find_candidates_thresholds_the_estimate(self):
+        signatures = self.index([self.original, self.copy, self.unrelated])
+        sig = signatures[self.original.pk]
+        candidates = find_candidates(sig, exclude_id=self.original.pk)
+        self.assertEqual([pk for pk, _ in candidates], [self.copy.pk])
+        self.assertEqual(find_candidates(sig, exclude_id=self.original.pk, min_jaccard=1.0), [])
+
+    def test_reindexing_replaces_signature_and_buckets(self):
+        self.index([self.original])
+        self.texts[self.original.pk] = FOX
+        self.addCleanup(self.texts.__setitem__, self.original.pk, LONG_ESSAY)
+        sig = self.index([self.original])[self.original.pk]
+        self.assertEqual(
+            set(LshBucket.objects.filter(submission=self.original).values_list('key', flat=True)),
+            set(minhash.band_keys(sig)),
+        )
+        stored = MinHashSignature.objects.get(submission=self.original).signature
+        self.assertEqual(minhash.from_bytes(stored).tolist(), sig.tolist())
+
+        # No text any more: nothing left to match against
+        self.assertEqual(index_submissions([self.original], ['']), {})
+        self.assertFalse(MinHashSignature.objects.filter(submission=self.original).exists())
+        self.assertFalse(LshBucket.objects.filter(submission=self.original).exists())
+
+    def test_check_submission_reports_across_assignments(self):
+        self.assertNotEqual(self.original.assignment_id, self.copy.assignment_id)
+        self.index([self.original, self.unrelated])
+        with mock.patch('analytics.near_duplicates.submission_texts', self.texts_of):
+            reports = check_submission(self.copy, threshold=80)
+
+        [report] = reports
+        self.assertEqual((report.submission_a, report.submission_b), (self.original, self.copy))
+        self.assertEqual(report.assignment, self.copy.assignment)
+        self.assertGreaterEqual(float(report.similarity_score), 80)
+
+        # Rechecking replaces the pair's report instead of adding another
+        with mock.patch('analytics.near_duplicates.submission_texts', self.texts_of):
+            check_submission(self.copy, threshold=80)
+        self.assertEqual(PlagiarismReport.objects.filter(submission_b=self.copy).count(), 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class IngestQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=3, subjects=2, days=1)
+        start = timezone.now() - datetime.timedelta(minutes=10)
+        # Distinct creation times, oldest submission first
+        for minutes, job in enumerate(IngestJob.objects.order_by('submission_id')):
+            IngestJob.objects.filter(pk=job.pk).update(created_at=start + datetime.timedelta(minutes=minutes))
+        cls.jobs = list(IngestJob.objects.order_by('created_at'))
+
+    def test_new_submissions_are_queued_once(self):
+        self.assertEqual(
+            sorted(job.submission_id for job in self.jobs), sorted(Submission.objects.values_list('id', flat=True)),
+        )
+        self.assertTrue(all(job.status == 'pending' for job in self.jobs))
+        self.jobs[0].submission.save()
+        self.assertEqual(IngestJob.objects.count(), len(self.jobs))
+
+    def test_claims_oldest_pending_job(self):
+        first, second = claim_next_job(), claim_next_job()
+        self.assertEqual([first.pk, second.pk], [job.pk for job in self.jobs[:2]])
+        self.assertEqual((first.status, first.attempts), ('running', 1))
+        self.assertIsNotNone(first.started_at)
+        for _ in self.jobs[2:]:
+            claim_next_job()
+        self.assertIsNone(claim_next_job())
+
+    def test_claim_skips_job_taken_by_another_worker(self):
+        first = QuerySet.first
+        raced = []
+
+        def taken_meanwhile(queryset):
+            job_id = first(queryset)
+            if not raced:
+                # Another worker wins the race between the lookup and the update
+                raced.append(job_id)
+                IngestJob.objects.filter(id=job_id).update(status='running')
+            return job_id
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=taken_meanwhile):
+            claimed = claim_next_job()
+        self.assertEqual(raced, [self.jobs[0].pk])
+        self.assertEqual(claimed.pk, self.jobs[1].pk)
+        self.assertEqual(IngestJob.objects.get(pk=self.jobs[0].pk).attempts, 0)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        with mock.patch('analytics.ingest.check_submission', side_effect=RuntimeError('bad pdf')):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                job = claim_next_job()
+                self.assertEqual((job.pk, job.attempts), (self.jobs[0].pk, attempt))
+                run_job(job)
+        job = IngestJob.objects.get(pk=self.jobs[0].pk)
+        self.assertEqual((job.status, job.error), ('failed', 'RuntimeError: bad pdf'))
+        self.assertEqual(claim_next_job().pk, self.jobs[1].pk)
+
+    def test_extraction_timeout_puts_job_back_in_queue(self):
+        with mock.patch('analytics.utils.extract_texts_parallel', return_value=([''], {0})):
+            job = run_job(claim_next_job())
+        self.assertEqual(job.status, 'pending')
+        self.assertTrue(job.error.startswith('ExtractionFailed: '))
+        self.assertFalse(MinHashSignature.objects.filter(submission=job.submission).exists())
+
+    def test_successful_job_is_done(self):
+        with mock.patch('analytics.ingest.check_submission') as check:
+            job = run_job(claim_next_job())
+        check.assert_called_once_with(job.submission)
+        self.assertEqual(IngestJob.objects.get(pk=job.pk).status, 'done')
+
+    def test_job_extracts_outside_a_transaction(self):
+        # An open transaction during a slow extraction would lock SQLite writers out
+        outer_blocks = len(connection.atomic_blocks)
+        depths = []
+
+        def texts_of(submissions, workers=None, strict=False):
+            depths.append(len(connection.atomic_blocks) - outer_blocks)
+            return [ESSAY for _ in submissions]
+
+        with mock.patch('analytics.near_duplicates.submission_texts', texts_of):
+            job = run_job(claim_next_job())
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(set(depths), {0})
+        self.assertTrue(MinHashSignature.objects.filter(submission=job.submission).exists())
+
+    def test_requeue_stale_jobs(self):
+        stale, fresh = claim_next_job(), claim_next_job()
+        IngestJob.objects.filter(pk=stale.pk).update(started_at=timezone.now() - datetime.timedelta(hours=2))
+        self.assertEqual(requeue_stale_jobs(datetime.timedelta(hours=1)), 1)
+        self.assertEqual(IngestJob.objects.get(pk=stale.pk).status, 'pending')
+        self.assertEqual(IngestJob.objects.get(pk=fresh.pk).status, 'running')
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+
+    @staticmethod
+    def results(**scenarios):
+        return {'scales': {'100': {'results': {
+            name: {'p50_ms': p50_ms, 'queries_max': queries} for name, (p50_ms, queries) in scenarios.items()
+        }}}}
+
+    def test_slowdown_past_tolerance_or_extra_query_regresses(self):
+        baseline = self.results(dashboard=(10.0, 5), history=(20.0, 3), report=(30.0, 8))
+        current = self.results(dashboard=(11.9, 5), history=(24.1, 3), report=(30.0, 9))
+        self.assertEqual(compare(baseline, current, tolerance=0.2), [
+            '100 students, history: p50 20.0ms -> 24.1ms',
+            '100 students, report: queries 8 -> 9',
+        ])
+
+    def test_only_shared_scales_and_scenarios_count(self):
+        baseline = self.results(dashboard=(10.0, 5), retired=(1.0, 1))
+        current = self.results(dashboard=(9.0, 4), added=(500.0, 50))
+        current['scales']['1000'] = current['scales']['100']
+        self.assertEqual(compare(baseline, current, tolerance=0.2), [])
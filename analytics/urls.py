@@ -4,4 +4,7 @@ from . import views
 urlpatterns = [
     path('at-risk/', views.at_risk_students, name='at_risk_students'),
     path('dashboard/', views.live_dashboard, name='live_dashboard'),
+    path('dashboard/data/', views.live_dashboard_data, name='live_dashboard_data'),
+    path('events/', views.dashboard_events, name='dashboard_events'),
+    path('dashboard/cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
 ]
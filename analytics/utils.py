@@ -1,7 +1,17 @@
+import hashlib
 import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from PyPDF2 import PdfReader
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from core.utils import chunks
+
+# No model imports at module level: extraction pool workers import this module
+# without a configured Django, and only need the PDF helpers.
 
 
 def extract_text_from_pdf(pdf_file_path):
@@ -18,6 +28,184 @@ def extract_text_from_pdf(pdf_file_path):
         return ""
 
 
+class ExtractionTimeout(BaseException):
+    # BaseException so extract_text_from_pdf's `except Exception` cannot swallow it
+    pass
+
+
+class ExtractionFailed(Exception):
+    """PDFs that timed out or crashed their worker, raised by cached_texts(strict=True)."""
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def extract_text_with_timeout(pdf_file_path, timeout=None):
+    """
+    extract_text_from_pdf with a wall-clock limit. Returns (text, timed_out).
+    The limit uses SIGALRM, so it only applies on Unix and in a main thread
+    (which is where process-pool workers run).
+    """
+    use_alarm = (
+        timeout and hasattr(signal, 'SIGALRM')
+        and threading.current_thread() is threading.main_thread()
+    )
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return extract_text_from_pdf(pdf_file_path), False
+    except ExtractionTimeout:
+        return "", True
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def extract_texts_parallel(pdf_file_paths, workers=None, timeout=None, progress=None):
+    """
+    Extract many PDFs across a process pool (PyPDF2 is CPU-bound pure Python).
+    Returns (texts, failed) where texts follows the input order and failed is the
+    set of input indexes that hit the per-file timeout or crashed their worker
+    (their text is ""). A crash breaks the whole pool, so the files it left
+    unfinished are retried one at a time (see _extract_isolated): only the file
+    that crashed is reported as failed.
+    `progress(done, total, elapsed_seconds)` is called after each file.
+    """
+    total = len(pdf_file_paths)
+    texts = [""] * total
+    failed = set()
+    started = time.perf_counter()
+    done = 0
+
+    def finished(i, text, expired):
+        nonlocal done
+        texts[i] = text
+        if expired:
+            failed.add(i)
+        done += 1
+        if progress:
+            progress(done, total, time.perf_counter() - started)
+
+    if workers == 1 or total < 2:
+        for i, path in enumerate(pdf_file_paths):
+            finished(i, *extract_text_with_timeout(path, timeout))
+        return texts, failed
+
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(extract_text_with_timeout, path, timeout): i
+            for i, path in enumerate(pdf_file_paths)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                text, expired = future.result()
+            except BrokenProcessPool:
+                # Every file still in the pool fails with the one that crashed it
+                unfinished.append(i)
+                continue
+            except Exception:
+                text, expired = "", True
+            finished(i, text, expired)
+
+    for i, result in _extract_isolated(pdf_file_paths, sorted(unfinished), timeout):
+        finished(i, *result)
+    return texts, failed
+
+
+def _extract_isolated(pdf_file_paths, indexes, timeout):
+    """
+    Yield (index, (text, failed)) for the given files, run in order by a single-worker
+    pool. When a file crashes the worker, it is the one being extracted, so only it
+    fails; a fresh pool carries on with the files after it.
+    """
+    remaining = list(indexes)
+    while remaining:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            futures = [pool.submit(extract_text_with_timeout, pdf_file_paths[i], timeout) for i in remaining]
+            for position, (i, future) in enumerate(zip(remaining, futures)):
+                try:
+                    yield i, future.result()
+                except BrokenProcessPool:
+                    yield i, ("", True)
+                    remaining = remaining[position + 1:]
+                    break
+                except Exception:
+                    yield i, ("", True)
+            else:
+                remaining = []
+
+
+def file_sha256(pdf_file_path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(pdf_file_path, 'rb') as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_texts(pdf_file_paths, workers=None, timeout=None, progress=None, hashes=None, strict=False):
+    """
+    Text of every PDF in the list, in order. Content already parsed once (by any
+    upload with the same bytes) comes from ExtractedText; only new content is parsed,
+    across a process pool (see extract_texts_parallel). Files that time out or crash
+    their worker come back as "" and are not cached, so the next run retries them.
+    `hashes` may carry already known SHA-256s (falsy entries are hashed from the file).
+    With `strict`, such files raise ExtractionFailed instead (after the others are cached).
+    """
+    from django.conf import settings
+    from .models import ExtractedText
+
+    if workers is None:
+        workers = settings.PDF_EXTRACT_WORKERS
+    if timeout is None:
+        timeout = settings.PDF_EXTRACT_TIMEOUT
+
+    hashes = [
+        known_hash or file_sha256(path)
+        for path, known_hash in zip(pdf_file_paths, hashes or [None] * len(pdf_file_paths))
+    ]
+    known = {}
+    for chunk in chunks(set(hashes)):
+        known.update(ExtractedText.objects.filter(sha256__in=chunk).values_list('sha256', 'text'))
+
+    # One parse per unseen content hash, however many uploads share it
+    missing = {}
+    for path, sha256 in zip(pdf_file_paths, hashes):
+        if sha256 not in known and sha256 not in missing:
+            missing[sha256] = path
+
+    texts, failed = extract_texts_parallel(list(missing.values()), workers, timeout, progress)
+    new_entries = [
+        ExtractedText(sha256=sha256, text=text)
+        for i, (sha256, text) in enumerate(zip(missing.keys(), texts))
+        if i not in failed
+    ]
+    ExtractedText.objects.bulk_create(new_entries, ignore_conflicts=True)
+    if strict and failed:
+        paths = list(missing.values())
+        raise ExtractionFailed(', '.join(os.path.basename(paths[i]) for i in sorted(failed)))
+
+    known.update(zip(missing.keys(), texts))
+    return [known[sha256] for sha256 in hashes]
+
+
+def submission_texts(submissions, workers=None, timeout=None, progress=None, strict=False):
+    """cached_texts for Submission objects, reusing the SHA-256 recorded at upload time."""
+    return cached_texts(
+        [submission.pdf_file.path for submission in submissions],
+        workers, timeout, progress,
+        hashes=[submission.sha256 for submission in submissions],
+        strict=strict,
+    )
+
+
 def compute_similarity(text_a, text_b):
     """Compute cosine similarity between two texts using TF-IDF."""
     if not text_a or not text_b:
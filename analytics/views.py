@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.db.models import Avg, Count
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db.models import Count, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from analytics.events import event_stream, subject_topic
+from analytics.frames import performance_frame, subject_frame
 from analytics.models import StudentRisk
-from core.models import StudentProfile, Attendance, Grade, Subject, TeacherSubjectHistory
+from core import dashboard_cache
+from core.models import Grade
 
 
 @login_required(login_url='login')
@@ -33,58 +41,97 @@ def live_dashboard(request):
         return redirect('student_dashboard')
 
     teacher = request.user.teacherprofile
-    active_subjects = TeacherSubjectHistory.objects.filter(
-        teacher=teacher, is_active=True
-    ).select_related('subject')
+    active = [history for history in dashboard_cache.teacher_subjects(teacher.pk) if history.is_active]
+    context = {
+        'charts': _live_dashboard_data(teacher.pk, active),
+        'poll_seconds': settings.LIVE_DASHBOARD_POLL_SECONDS,
+    }
+    return render(request, 'analytics/live_dashboard.html', context)
+
+
+@login_required(login_url='login')
+def live_dashboard_data(request):
+    """
+    The live dashboard's chart data as JSON, for polling. Polls whose ETag or
+    Last-Modified still match get a 304 from the cached versions alone, without a query.
+    """
+    if not request.user.is_teacher:
+        return JsonResponse({'error': 'Teachers only'}, status=403)
+
+    teacher = request.user.teacherprofile
+    active = [history for history in dashboard_cache.teacher_subjects(teacher.pk) if history.is_active]
+    etag, last_modified = _charts_version(teacher.pk, active)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(_live_dashboard_data(teacher.pk, active))
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Let browsers keep the body, but make them revalidate on every poll
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _live_dashboard_data(teacher_id, active):
+    # Charts 1-3 only change with this teacher's subjects; the scatter with any student's stats,
+    # so it is cached once for every teacher
+    subject_charts = dashboard_cache.cached(
+        'live_dashboard', _subject_chart_tags(teacher_id, active),
+        lambda: _subject_charts([(h.subject_id, h.subject.name, h.subject.code) for h in active]),
+    )
+    scatter = dashboard_cache.cached('live_dashboard_scatter', SCATTER_TAGS, _performance_scatter)
+    return {**subject_charts, **scatter}
+
+
+SCATTER_TAGS = [('student_stats',), ('students',)]
+
+
+def _subject_chart_tags(teacher_id, active):
+    return [('teacher', teacher_id)] + dashboard_cache.subject_tags(active)
+
+
+def _charts_version(teacher_id, active):
+    """
+    (ETag, Last-Modified timestamp) of the chart data, from the dashboard cache versions
+    that every change to it bumps (see core/signals.py), so a poll costs no query.
+    """
+    digest, changed_at = dashboard_cache.version(_subject_chart_tags(teacher_id, active) + SCATTER_TAGS)
+    return quote_etag(digest), int(changed_at) or None
+
+
+# Charts 1, 2 and 4 come from the analytics frames (analytics/frames.py) over the
+# precomputed stats, and chart 3 from one conditional-aggregate query, so the page cost
+# does not grow with the number of attendance or grade rows.
+
+def _subject_charts(active_subjects):
+    subject_ids = [subject_id for subject_id, _, _ in active_subjects]
+
+    # Charts 1 & 2 share one per-subject groupby
+    totals = subject_frame(subject_ids)
 
     # Chart 1: Subject-wise average marks (bar chart)
-    subject_names = []
-    subject_avgs = []
-    for h in active_subjects:
-        avg = Grade.objects.filter(subject=h.subject).aggregate(Avg('marks'))['marks__avg']
-        subject_names.append(f"{h.subject.name} ({h.subject.code})")
-        subject_avgs.append(round(float(avg or 0), 2))
+    subject_names = [f"{name} ({code})" for _, name, code in active_subjects]
+    subject_avgs = totals['average'].tolist()
 
     # Chart 2: Attendance distribution per subject (pie chart)
-    att_labels = []
-    att_present = []
-    att_absent = []
-    for h in active_subjects:
-        total = Attendance.objects.filter(subject=h.subject).count()
-        present = Attendance.objects.filter(subject=h.subject, status='P').count()
-        att_labels.append(h.subject.code)
-        att_present.append(present)
-        att_absent.append(total - present)
-
-    # Chart 3: Grade distribution (histogram-like breakdown)
-    grade_buckets = {'O': 0, 'A+': 0, 'A': 0, 'B+': 0, 'B': 0, 'C': 0, 'F': 0}
-    all_grades = Grade.objects.filter(subject__in=[h.subject for h in active_subjects])
-    for g in all_grades:
-        if g.marks >= 90: grade_buckets['O'] += 1
-        elif g.marks >= 80: grade_buckets['A+'] += 1
-        elif g.marks >= 70: grade_buckets['A'] += 1
-        elif g.marks >= 60: grade_buckets['B+'] += 1
-        elif g.marks >= 50: grade_buckets['B'] += 1
-        elif g.marks >= 40: grade_buckets['C'] += 1
-        else: grade_buckets['F'] += 1
-
-    # Chart 4: Student performance scatter (marks vs attendance %)
-    scatter_x = []  # attendance %
-    scatter_y = []  # avg marks
-    scatter_text = []
-    for student in StudentProfile.objects.all():
-        total_cls = Attendance.objects.filter(student=student).count()
-        if total_cls == 0:
-            continue
-        present = Attendance.objects.filter(student=student, status='P').count()
-        att_pct = round((present / total_cls) * 100, 1)
-        avg_mark = Grade.objects.filter(student=student).aggregate(Avg('marks'))['marks__avg']
-        if avg_mark is not None:
-            scatter_x.append(att_pct)
-            scatter_y.append(round(float(avg_mark), 1))
-            scatter_text.append(student.user.username)
+    att_labels = [code for _, _, code in active_subjects]
+    att_present = totals['present'].tolist()
+    att_absent = totals['absent'].tolist()
 
-    context = {
+    # Chart 3: Grade distribution (histogram-like breakdown), bucketed in SQL
+    grade_buckets = Grade.objects.filter(subject_id__in=subject_ids).aggregate(**{
+        'O': Count('id', filter=Q(marks__gte=90)),
+        'A+': Count('id', filter=Q(marks__gte=80, marks__lt=90)),
+        'A': Count('id', filter=Q(marks__gte=70, marks__lt=80)),
+        'B+': Count('id', filter=Q(marks__gte=60, marks__lt=70)),
+        'B': Count('id', filter=Q(marks__gte=50, marks__lt=60)),
+        'C': Count('id', filter=Q(marks__gte=40, marks__lt=50)),
+        'F': Count('id', filter=Q(marks__lt=40)),
+    })
+
+    return {
+        'subject_ids': subject_ids,
         'subject_names': subject_names,
         'subject_avgs': subject_avgs,
         'att_labels': att_labels,
@@ -92,8 +139,45 @@ def live_dashboard(request):
         'att_absent': att_absent,
         'grade_labels': list(grade_buckets.keys()),
         'grade_values': list(grade_buckets.values()),
-        'scatter_x': scatter_x,
-        'scatter_y': scatter_y,
-        'scatter_text': scatter_text,
     }
-    return render(request, 'analytics/live_dashboard.html', context)
+
+
+def _performance_scatter():
+    # Chart 4: Student performance scatter (marks vs attendance %), read from StudentStats
+    students = performance_frame()
+    return {
+        'scatter_x': students['attendance_pct'].round(1).tolist(),
+        'scatter_y': students['avg_marks'].round(1).tolist(),
+        'scatter_text': students['username'].tolist(),
+    }
+
+
+@login_required(login_url='login')
+def dashboard_cache_stats(request):
+    if not request.user.is_teacher:
+        return redirect('student_dashboard')
+    return JsonResponse(dashboard_cache.cache_stats())
+
+
+@login_required(login_url='login')
+async def dashboard_events(request):
+    """
+    Server-sent stats deltas for a teacher's live dashboard: their active subjects.
+    Needs an ASGI server to stream.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the endless stream would pin a worker thread; 204 tells EventSource to stop
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    if not user.is_teacher:
+        # Only the live dashboard streams; students have nothing to subscribe to
+        return HttpResponse(status=204)
+    histories = await sync_to_async(dashboard_cache.teacher_subjects)(user.id)
+    topics = [subject_topic(history.subject_id) for history in histories if history.is_active]
+
+    return StreamingHttpResponse(
+        event_stream(topics, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
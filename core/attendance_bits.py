@@ -0,0 +1,59 @@
+class AttendanceBits:
+    """
+    One student's attendance in one subject as a bitmap: bit i is set when they were present
+    at the subject's i-th class (oldest first). A semester of daily classes is a few dozen
+    bytes, and every question below is answered with whole-word integer operations instead
+    of a scan over Attendance rows.
+    """
+
+    __slots__ = ('value', 'length')
+
+    def __init__(self, value=0, length=0):
+        self.value = value
+        self.length = length
+
+    @classmethod
+    def from_statuses(cls, statuses):
+        """From status strings in date order ('P' = present, anything else = absent)."""
+        flags = ''.join('1' if status == 'P' else '0' for status in statuses)
+        # int() reads the most significant bit first, so the newest class goes first
+        return cls(int(flags[::-1] or '0', 2), len(flags))
+
+    @classmethod
+    def from_bytes(cls, data, length):
+        return cls(int.from_bytes(bytes(data), 'little'), length)
+
+    def to_bytes(self):
+        return self.value.to_bytes((self.length + 7) // 8, 'little')
+
+    @property
+    def present(self):
+        return self.value.bit_count()
+
+    @property
+    def absent(self):
+        return self.length - self.present
+
+    @property
+    def percentage(self):
+        return self.present / self.length * 100 if self.length else 100.0
+
+    def present_streak(self):
+        """Classes attended in a row, up to and including the latest one."""
+        missed = ~self.value & ((1 << self.length) - 1)
+        return self.length - missed.bit_length()
+
+    def absence_streak(self):
+        """Classes missed in a row, up to and including the latest one."""
+        return self.length - self.value.bit_length()
+
+    def absences_in_last(self, classes):
+        """Classes missed among the latest `classes` ones."""
+        window = min(classes, self.length)
+        return window - (self.value >> (self.length - window)).bit_count()
+
+    def __eq__(self, other):
+        return isinstance(other, AttendanceBits) and (self.value, self.length) == (other.value, other.length)
+
+    def __repr__(self):
+        return f"AttendanceBits({format(self.value, f'0{self.length}b')[::-1] if self.length else ''!r})"
@@ -0,0 +1,127 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import TeacherSubjectHistory
+
+
+# Cached dashboard parts, in the order cache_stats() reports them
+DASHBOARDS = ['teacher_subjects', 'teacher_dashboard', 'live_dashboard', 'live_dashboard_scatter']
+
+# Version tags an entry can depend on (see core/signals.py for what bumps them):
+#   ('teacher', id)     the teacher's TeacherSubjectHistory rows, or a subject they teach, changed
+#   ('subject', id)     Attendance or Grade rows of that subject changed
+#   ('student_stats',)  any Attendance or Grade row changed
+#   ('students',)       a student was added or removed
+#   ('all',)            bulk writes that send no signals (every entry depends on it)
+
+
+def _version_key(tag):
+    return 'dash_ver:' + ':'.join(str(part) for part in tag)
+
+
+def _counter_key(name, outcome):
+    return f'dash_stats:{name}:{outcome}'
+
+
+def _new_token():
+    # Random, not a counter: an evicted version can never come back with an old value.
+    # The leading timestamp is when the tag last changed (see version()).
+    return f'{time.time():.6f}-{uuid.uuid4().hex}'
+
+
+def _changed_at(token):
+    stamp, separator, _ = token.partition('-')
+    return float(stamp) if separator else 0.0
+
+
+def _versions(tags):
+    """{tag: current version token}, creating tokens for tags never seen (or evicted)."""
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(keys.keys())
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # add() keeps a token another process created in the meantime
+        for key in missing:
+            cache.add(key, _new_token(), None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: token for key, token in found.items()}
+
+
+def bump(*tags):
+    """
+    Expire every entry that depends on any of the tags. Happens once the surrounding
+    transaction commits, so no request can recompute and re-cache the old data meanwhile.
+    """
+    transaction.on_commit(lambda: cache.set_many({_version_key(tag): _new_token() for tag in tags}, None))
+
+
+def invalidate_all():
+    bump(('all',))
+
+
+def _count(name, outcome):
+    key = _counter_key(name, outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, None)
+
+
+def version(tags):
+    """
+    (digest, changed_at) of the tags' current versions: the digest changes whenever any of
+    them is bumped, and changed_at is the Unix time of the latest bump (0 when unknown).
+    Reads the cache only, never the database.
+    """
+    tags = sorted(set(tags) | {('all',)})
+    versions = _versions(tags)
+    digest = hashlib.md5(repr([(tag, versions[tag]) for tag in tags]).encode()).hexdigest()
+    return digest, max(_changed_at(token) for token in versions.values())
+
+
+def cached(name, tags, compute):
+    """compute()'s result, cached under `name` until any of the version tags is bumped."""
+    digest, _ = version(tags)
+    key = f'dashboard:{name}:{digest}'
+
+    value = cache.get(key)
+    if value is not None:
+        _count(name, 'hits')
+        return value
+
+    _count(name, 'misses')
+    value = compute()
+    cache.set(key, value, settings.DASHBOARD_CACHE_TIMEOUT)
+    return value
+
+
+def teacher_subjects(teacher_id):
+    """The teacher's TeacherSubjectHistory rows (active and past) with their subjects."""
+    return cached('teacher_subjects', [('teacher', teacher_id)], lambda: list(
+        TeacherSubjectHistory.objects.filter(teacher_id=teacher_id).select_related('subject').order_by('id')
+    ))
+
+
+def subject_tags(histories):
+    return [('subject', history.subject_id) for history in histories if history.is_active]
+
+
+def cache_stats():
+    """{dashboard: {'hits', 'misses', 'hit_rate'}} as counted by this cache backend."""
+    counters = cache.get_many([_counter_key(name, outcome) for name in DASHBOARDS for outcome in ('hits', 'misses')])
+    stats = {}
+    for name in DASHBOARDS:
+        hits = counters.get(_counter_key(name, 'hits'), 0)
+        misses = counters.get(_counter_key(name, 'misses'), 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
@@ -0,0 +1,93 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from .models import Grade
+
+
+# Relative curve: (minimum % of the subject's highest marks, letter, grade point)
+GRADE_CURVE = [
+    (90, 'O', 10.0),
+    (80, 'A+', 9.0),
+    (70, 'A', 8.0),
+    (60, 'B+', 7.0),
+    (50, 'B', 6.0),
+    (40, 'C', 5.0),
+]
+FAILING_GRADE = {'letter': 'F', 'point': 0.0}
+
+MAX_CACHE_TIMEOUT = 60 * 60
+
+MAX_MARKS = 100
+
+
+def _max_key(subject_id):
+    return f'grade_max:{subject_id}'
+
+
+def parse_marks(value):
+    """Marks typed by a teacher or read from a file, as a Decimal. ValueError unless 0 to MAX_MARKS, 2 decimals."""
+    try:
+        marks = Decimal(str(value).strip())
+    except InvalidOperation:
+        marks = None
+    if marks is None or not marks.is_finite() or not 0 <= marks <= MAX_MARKS or marks != round(marks, 2):
+        raise ValueError(f"marks must be a number from 0 to {MAX_MARKS} with at most two decimals, not '{value}'")
+    return marks
+
+
+def curve_grade(marks, highest_score):
+    """Letter and point for `marks` relative to the subject's highest marks."""
+    # Safety check: prevent dividing by zero if no one has marks or highest is 0
+    if not highest_score or highest_score == 0:
+        return dict(FAILING_GRADE)
+
+    relative_percentage = (marks / highest_score) * 100
+    for minimum, letter, point in GRADE_CURVE:
+        if relative_percentage >= minimum:
+            return {'letter': letter, 'point': point}
+    return dict(FAILING_GRADE)
+
+
+def subject_maxima(subject_ids):
+    """{subject_id: highest marks} with cache misses filled by one grouped MAX query."""
+    subject_ids = set(subject_ids)
+    keys = {_max_key(subject_id): subject_id for subject_id in subject_ids}
+    cached = cache.get_many(keys.keys())
+    maxima = {keys[key]: value for key, value in cached.items()}
+
+    missing = subject_ids - maxima.keys()
+    if missing:
+        found = dict(
+            Grade.objects.filter(subject_id__in=missing)
+            .values('subject_id').annotate(highest=Max('marks'))
+            .order_by().values_list('subject_id', 'highest')
+        )
+        # Subjects without grades are cached as 0 so they are not queried again
+        fresh = {subject_id: found.get(subject_id) or 0 for subject_id in missing}
+        cache.set_many({_max_key(subject_id): value for subject_id, value in fresh.items()}, MAX_CACHE_TIMEOUT)
+        maxima.update(fresh)
+
+    return maxima
+
+
+def invalidate_subject_maxima(subject_ids):
+    """Drop the cached maxima once the surrounding transaction commits (see dashboard_cache.bump)."""
+    keys = [_max_key(subject_id) for subject_id in subject_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def relative_grades(grades):
+    """
+    Curve a whole batch of Grade objects (list or queryset) in one pass.
+    Returns {grade.pk: {'letter': ..., 'point': ...}}.
+    """
+    grades = list(grades)
+    maxima = subject_maxima({grade.subject_id for grade in grades})
+    return {grade.pk: curve_grade(grade.marks, maxima[grade.subject_id]) for grade in grades}
+
+
+def subject_relative_grades(subject_id):
+    """Letter and point for every grade in one subject, keyed by grade pk."""
+    return relative_grades(Grade.objects.filter(subject_id=subject_id).only('id', 'subject_id', 'marks'))
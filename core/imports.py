@@ -0,0 +1,230 @@
+import csv
+import datetime
+import itertools
+import time
+
+from django.conf import settings
+from django.db import transaction
+from .grading import parse_marks
+from .models import Attendance, Grade, StudentProfile, Subject
+from .signals import notify_bulk_changes
+from .utils import chunks
+
+
+class CsvImportError(Exception):
+    """
+    The file cannot be imported (e.g. a required column is missing), or not past some line.
+    `result` is what the batches before that line committed, or None if nothing was written.
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class _Lookup:
+    """
+    Natural key -> primary key (e.g. roll number -> student id). Keys are queried a batch
+    at a time, only the ones not seen before, and remembered, misses included.
+    """
+
+    def __init__(self, queryset, key_field, id_field='id'):
+        self.queryset = queryset
+        self.key_field = key_field
+        self.id_field = id_field
+        self._ids = {}
+
+    def resolve(self, keys):
+        unknown = sorted({key for key in keys if key not in self._ids})
+        for chunk in chunks(unknown):
+            found = dict(
+                self.queryset.filter(**{f'{self.key_field}__in': chunk}).values_list(self.key_field, self.id_field)
+            )
+            for key in chunk:
+                self._ids[key] = found.get(key)
+
+    def get(self, key):
+        return self._ids.get(key)
+
+
+class _Importer:
+    """How one CSV kind maps onto its model; subclasses build one unsaved row per CSV row."""
+
+    model = None
+    columns = []
+    unique_fields = []
+    update_fields = []
+
+    def __init__(self):
+        self.students = _Lookup(StudentProfile.objects.all(), 'roll_number', 'user_id')
+        self.subjects = _Lookup(Subject.objects.all(), 'code')
+
+    def resolve(self, rows):
+        rows = [row for row in rows if self.complete(row)]
+        self.students.resolve(row['roll_number'].strip() for row in rows)
+        self.subjects.resolve(row['subject_code'].strip() for row in rows)
+
+    def _pair(self, row):
+        roll_number = row['roll_number'].strip()
+        subject_code = row['subject_code'].strip()
+        student_id = self.students.get(roll_number)
+        if student_id is None:
+            raise ValueError(f"Unknown roll_number '{roll_number}'")
+        subject_id = self.subjects.get(subject_code)
+        if subject_id is None:
+            raise ValueError(f"Unknown subject_code '{subject_code}'")
+        return student_id, subject_id
+
+    def record(self, row):
+        raise NotImplementedError
+
+    def key(self, record):
+        return tuple(getattr(record, self.model._meta.get_field(field).attname) for field in self.unique_fields)
+
+    def complete(self, row):
+        # DictReader fills the columns a short line lacks with None
+        return all(row.get(column) is not None for column in self.columns)
+
+
+class GradeImporter(_Importer):
+    model = Grade
+    columns = ['roll_number', 'subject_code', 'marks']
+    unique_fields = ['student', 'subject']
+    update_fields = ['marks', 'updated_at']
+
+    def record(self, row):
+        student_id, subject_id = self._pair(row)
+        return Grade(student_id=student_id, subject_id=subject_id, marks=parse_marks(row['marks']))
+
+
+class AttendanceImporter(_Importer):
+    model = Attendance
+    columns = ['roll_number', 'subject_code', 'date', 'status']
+    unique_fields = ['student', 'subject', 'date']
+    update_fields = ['status', 'updated_at']
+
+    def record(self, row):
+        student_id, subject_id = self._pair(row)
+        try:
+            date = datetime.date.fromisoformat(row['date'].strip())
+        except ValueError:
+            raise ValueError(f"date must be YYYY-MM-DD, not '{row['date']}'")
+        status = row['status'].strip().upper()
+        if status not in ('P', 'A'):
+            raise ValueError(f"status must be P or A, not '{row['status']}'")
+        return Attendance(student_id=student_id, subject_id=subject_id, date=date, status=status)
+
+
+IMPORTERS = {
+    'grades': GradeImporter,
+    'attendance': AttendanceImporter,
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else 0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'seconds': round(self.seconds, 2),
+            'rows_per_second': self.rows_per_second,
+        }
+
+
+def _batches(reader, size):
+    rows = ((reader.line_num, row) for row in reader)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+def import_csv(kind, lines, rejects=None, batch_size=None, log=None):
+    """
+    Stream CSV `lines` (with a header row) into `kind` ('grades' or 'attendance'),
+    `batch_size` rows per transaction: each batch is validated against the cached
+    student/subject lookups and written as one upsert. The change signal is sent once,
+    for every pair written, when the file is done. Invalid rows are skipped and, given a `rejects` text file, written
+    to it with their line number and error. Only one batch is held in memory at a time.
+    Bytes that are not UTF-8 stop the import with a CsvImportError carrying the committed result.
+    """
+    importer = IMPORTERS[kind]()
+    batch_size = batch_size or settings.CSV_IMPORT_BATCH_SIZE
+    result = ImportResult()
+    started = time.perf_counter()
+
+    reader = csv.DictReader(lines)
+    fieldnames = [name.strip() for name in reader.fieldnames or []]
+    missing = [column for column in importer.columns if column not in fieldnames]
+    if missing:
+        raise CsvImportError(f"Missing column(s): {', '.join(missing)}. Expected {', '.join(importer.columns)}.")
+    reader.fieldnames = fieldnames
+
+    writer = None
+    if rejects is not None:
+        writer = csv.writer(rejects)
+        writer.writerow(['line', *importer.columns, 'error'])
+
+    # Pairs written so far. The change signal goes out once for all of them at the end: a
+    # backfill touches the same students in every batch, and refreshing their stats per batch
+    # would re-read their whole history each time. Bounded by students x subjects, not file size.
+    changed = set()
+    try:
+        for batch in _batches(reader, batch_size):
+            importer.resolve(row for _, row in batch)
+
+            # Later rows win when a file repeats a key, as if they were saved one after another
+            records = {}
+            for line, row in batch:
+                try:
+                    if not importer.complete(row):
+                        raise ValueError('Too few columns')
+                    record = importer.record(row)
+                except ValueError as error:
+                    result.rejected += 1
+                    if writer is not None:
+                        writer.writerow([line, *(row.get(column) for column in importer.columns), str(error)])
+                    continue
+                records[importer.key(record)] = record
+
+            if records:
+                with transaction.atomic():
+                    importer.model.objects.bulk_create(
+                        records.values(),
+                        batch_size=500,
+                        update_conflicts=True,
+                        unique_fields=importer.unique_fields,
+                        update_fields=importer.update_fields,
+                    )
+                changed.update((record.student_id, record.subject_id) for record in records.values())
+
+            result.rows += len(batch)
+            result.imported = result.rows - result.rejected
+            result.seconds = time.perf_counter() - started
+            if log:
+                log(f'{result.rows} rows, {result.rejected} rejected ({result.rows_per_second} rows/s)')
+    except UnicodeDecodeError as error:
+        # Mid-file: the batches before this one are committed, so report them with the error
+        result.seconds = time.perf_counter() - started
+        raise CsvImportError(
+            f'Not UTF-8 after line {reader.line_num} ({error.reason}); '
+            f'{result.imported} of the {result.rows} rows before its batch were imported',
+            result if result.rows else None,
+        ) from error
+    finally:
+        # Also after a failed batch: the ones before it are committed
+        if changed:
+            with transaction.atomic():
+                notify_bulk_changes(importer.model, changed)
+
+    result.seconds = time.perf_counter() - started
+    return result
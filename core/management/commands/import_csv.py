@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from core.imports import IMPORTERS, CsvImportError, import_csv
+
+
+class Command(BaseCommand):
+    help = 'Stream a grades or attendance CSV into the database in batched upserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help='What the file holds')
+        parser.add_argument(
+            'path',
+            help='CSV with a header row: roll_number,subject_code,marks (grades) '
+                 'or roll_number,subject_code,date,status (attendance)',
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Where to write the rejected rows (default: <path>.rejected.csv)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows per transaction (default: settings.CSV_IMPORT_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        rejects_path = options['rejects'] or f"{options['path']}.rejected.csv"
+        log = self.stdout.write if options['verbosity'] > 1 else None
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines, \
+                    open(rejects_path, 'w', newline='', encoding='utf-8') as rejects:
+                result = import_csv(options['kind'], lines, rejects, options['batch_size'], log)
+        except CsvImportError as error:
+            if error.result is not None and error.result.rejected:
+                self.stderr.write(f'{error.result.rejected} rows rejected, see {rejects_path}')
+            elif os.path.exists(rejects_path):
+                os.remove(rejects_path)
+            raise CommandError(str(error))
+        except (OSError, UnicodeDecodeError) as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} of {result.rows} rows in {result.seconds:.1f}s '
+            f'({result.rows_per_second} rows/s)'
+        ))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(f'{result.rejected} rows rejected, see {rejects_path}'))
+        else:
+            os.remove(rejects_path)
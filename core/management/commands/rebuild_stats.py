@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from core import dashboard_cache
+from core.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute StudentSubjectStats and StudentStats from the raw Attendance and Grade tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        pair_count, student_count = rebuild_stats(batch_size=options['batch_size'])
+        # Only reaches servers that share this cache backend (not the default per-process LocMemCache)
+        dashboard_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats for {pair_count} student/subject pairs and {student_count} students'
+        ))
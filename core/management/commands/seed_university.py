@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.models import User
+from core.seeding import USERNAME_PREFIX, seed_university
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a deterministic synthetic university for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='Number of students (default: 1000)')
+        parser.add_argument('--teachers', type=int, default=50, help='Number of teachers (default: 50)')
+        parser.add_argument('--subjects', type=int, default=100, help='Number of subjects (default: 100)')
+        parser.add_argument(
+            '--subjects-per-student',
+            type=int,
+            default=5,
+            help='Subjects each student is enrolled in (default: 5)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=20,
+            help='Class days of attendance per enrolment (default: 20)',
+        )
+        parser.add_argument(
+            '--assignments-per-subject',
+            type=int,
+            default=2,
+            help='Assignments per subject (default: 2)',
+        )
+        parser.add_argument(
+            '--submission-rate',
+            type=float,
+            default=0.5,
+            help='Chance a student submits each assignment (default: 0.5)',
+        )
+        parser.add_argument(
+            '--duplicate-rate',
+            type=float,
+            default=0.05,
+            help='Chance a submission copies an earlier one of the same assignment (default: 0.05)',
+        )
+        parser.add_argument('--password', default='password', help='Password of every seeded user')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows per INSERT (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError(
+                'The database already contains seeded users. Run "manage.py flush" first for a fresh dataset.'
+            )
+        if min(options['teachers'], options['subjects'], options['students']) < 1:
+            raise CommandError('--students, --teachers and --subjects must all be at least 1.')
+
+        started = time.monotonic()
+
+        def log(message):
+            self.stdout.write(f'[{time.monotonic() - started:7.1f}s] {message}')
+
+        counts = seed_university(
+            students=options['students'],
+            teachers=options['teachers'],
+            subjects=options['subjects'],
+            subjects_per_student=options['subjects_per_student'],
+            days=options['days'],
+            assignments_per_subject=options['assignments_per_subject'],
+            submission_rate=options['submission_rate'],
+            duplicate_rate=options['duplicate_rate'],
+            password=options['password'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=log,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded ' + ', '.join(f'{count} {name}' for name, count in counts.items())
+            + f' in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:12
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    # Stats for the rows written before the tables existed (what core.stats.rebuild_stats does)
+    Attendance = apps.get_model('core', 'Attendance')
+    Grade = apps.get_model('core', 'Grade')
+    StudentSubjectStats = apps.get_model('core', 'StudentSubjectStats')
+    StudentStats = apps.get_model('core', 'StudentStats')
+
+    rows = {}
+
+    def row_for(student_id, subject_id):
+        key = (student_id, subject_id)
+        if key not in rows:
+            rows[key] = StudentSubjectStats(student_id=student_id, subject_id=subject_id)
+        return rows[key]
+
+    attendance = Attendance.objects.values('student_id', 'subject_id').annotate(
+        total=Count('id'), present=Count('id', filter=Q(status='P')),
+    ).order_by()
+    for row in attendance.iterator():
+        stats = row_for(row['student_id'], row['subject_id'])
+        stats.total_classes = row['total']
+        stats.present_classes = row['present']
+        stats.absent_classes = row['total'] - row['present']
+
+    grades = Grade.objects.values('student_id', 'subject_id').annotate(
+        count=Count('id'), total=Sum('marks'), failing=Count('id', filter=Q(marks__lt=settings.PASSING_MARKS)),
+    ).order_by()
+    for row in grades.iterator():
+        stats = row_for(row['student_id'], row['subject_id'])
+        stats.grade_count = row['count']
+        stats.marks_total = Decimal(row['total'])
+        stats.avg_marks = round(stats.marks_total / row['count'], 2)
+        stats.is_failing = row['failing'] > 0
+
+    StudentSubjectStats.objects.bulk_create(rows.values(), batch_size=1000)
+
+    totals = StudentSubjectStats.objects.values('student_id').annotate(
+        total=Sum('total_classes'),
+        present=Sum('present_classes'),
+        absent=Sum('absent_classes'),
+        marks=Sum('marks_total'),
+        grades=Sum('grade_count'),
+        graded=Count('id', filter=Q(grade_count__gt=0)),
+        failing=Count('id', filter=Q(is_failing=True)),
+    ).order_by()
+    StudentStats.objects.bulk_create([
+        StudentStats(
+            student_id=row['student_id'],
+            total_classes=row['total'],
+            present_classes=row['present'],
+            absent_classes=row['absent'],
+            avg_marks=round(Decimal(row['marks']) / row['grades'], 2) if row['grades'] else None,
+            graded_subjects=row['graded'],
+            failing_subjects=row['failing'],
+        )
+        for row in totals.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_subject_teacher'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentStats',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.studentprofile')),
+                ('total_classes', models.PositiveIntegerField(default=0)),
+                ('present_classes', models.PositiveIntegerField(default=0)),
+                ('absent_classes', models.PositiveIntegerField(default=0)),
+                ('avg_marks', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('graded_subjects', models.PositiveIntegerField(default=0)),
+                ('failing_subjects', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentSubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_classes', models.PositiveIntegerField(default=0)),
+                ('present_classes', models.PositiveIntegerField(default=0)),
+                ('absent_classes', models.PositiveIntegerField(default=0)),
+                ('grade_count', models.PositiveIntegerField(default=0)),
+                ('marks_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('avg_marks', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('is_failing', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.studentprofile')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.subject')),
+            ],
+            options={
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
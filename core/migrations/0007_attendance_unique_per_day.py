@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:14
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    # mark_attendance used to allow several rows per student/subject/day: keep the latest one
+    Attendance = apps.get_model('core', 'Attendance')
+    latest_ids = (
+        Attendance.objects.values('student_id', 'subject_id', 'date')
+        .annotate(latest_id=Max('id'))
+        .values('latest_id')
+    )
+    Attendance.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_student_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='attendance',
+            unique_together={('student', 'subject', 'date')},
+        ),
+    ]
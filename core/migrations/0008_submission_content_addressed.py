@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_attendance_unique_per_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='pdf_file',
+            field=models.FileField(storage=core.storage.submission_storage, upload_to='submissions/'),
+        ),
+    ]
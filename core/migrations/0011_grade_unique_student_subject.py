@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def remove_duplicate_grades(apps, schema_editor):
+    # Grades saved before manage_grades upserted could repeat a student/subject: keep the latest one
+    Grade = apps.get_model('core', 'Grade')
+    latest_ids = (
+        Grade.objects.values('student_id', 'subject_id')
+        .annotate(latest_id=Max('id'))
+        .values('latest_id')
+    )
+    Grade.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_attendance_student_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_grades, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='grade',
+            unique_together={('student', 'subject')},
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:12
+
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+from core.attendance_bits import AttendanceBits
+
+
+def rebuild_stats(apps, schema_editor):
+    # Every stats row again, as core.stats.rebuild_stats does: fills the new bitmap and streak
+    # columns, and drops what the duplicate rows removed by 0007 and 0011 still counted
+    Attendance = apps.get_model('core', 'Attendance')
+    Grade = apps.get_model('core', 'Grade')
+    StudentSubjectStats = apps.get_model('core', 'StudentSubjectStats')
+    StudentStats = apps.get_model('core', 'StudentStats')
+
+    StudentStats.objects.all().delete()
+    StudentSubjectStats.objects.all().delete()
+
+    rows = {}
+
+    def row_for(student_id, subject_id):
+        key = (student_id, subject_id)
+        if key not in rows:
+            rows[key] = StudentSubjectStats(student_id=student_id, subject_id=subject_id)
+        return rows[key]
+
+    attendance = Attendance.objects.order_by('student_id', 'subject_id', 'date').values_list(
+        'student_id', 'subject_id', 'status',
+    )
+    for key, group in groupby(attendance.iterator(), key=itemgetter(0, 1)):
+        bits = AttendanceBits.from_statuses(status for _, _, status in group)
+        stats = row_for(*key)
+        stats.total_classes = bits.length
+        stats.present_classes = bits.present
+        stats.absent_classes = bits.absent
+        stats.attendance_bits = bits.to_bytes()
+        stats.recent_absences = bits.absences_in_last(settings.RECENT_CLASSES)
+        stats.absence_streak = bits.absence_streak()
+
+    grades = Grade.objects.values('student_id', 'subject_id').annotate(
+        count=Count('id'), total=Sum('marks'), failing=Count('id', filter=Q(marks__lt=settings.PASSING_MARKS)),
+    ).order_by()
+    for row in grades.iterator():
+        stats = row_for(row['student_id'], row['subject_id'])
+        stats.grade_count = row['count']
+        stats.marks_total = Decimal(row['total'])
+        stats.avg_marks = round(stats.marks_total / row['count'], 2)
+        stats.is_failing = row['failing'] > 0
+
+    StudentSubjectStats.objects.bulk_create(rows.values(), batch_size=1000)
+
+    totals = StudentSubjectStats.objects.values('student_id').annotate(
+        total=Sum('total_classes'),
+        present=Sum('present_classes'),
+        absent=Sum('absent_classes'),
+        marks=Sum('marks_total'),
+        grades=Sum('grade_count'),
+        graded=Count('id', filter=Q(grade_count__gt=0)),
+        failing=Count('id', filter=Q(is_failing=True)),
+        recent_absences=Sum('recent_absences'),
+        absence_streak=Max('absence_streak'),
+    ).order_by()
+    StudentStats.objects.bulk_create([
+        StudentStats(
+            student_id=row['student_id'],
+            total_classes=row['total'],
+            present_classes=row['present'],
+            absent_classes=row['absent'],
+            avg_marks=round(Decimal(row['marks']) / row['grades'], 2) if row['grades'] else None,
+            graded_subjects=row['graded'],
+            failing_subjects=row['failing'],
+            recent_absences=row['recent_absences'],
+            absence_streak=row['absence_streak'],
+        )
+        for row in totals.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_grade_unique_student_subject'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentstats',
+            name='absence_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentstats',
+            name='recent_absences',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentsubjectstats',
+            name='absence_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentsubjectstats',
+            name='attendance_bits',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='studentsubjectstats',
+            name='recent_absences',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(rebuild_stats, migrations.RunPython.noop),
+    ]
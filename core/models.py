@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db.models import Max
+from .attendance_bits import AttendanceBits
+from .storage import content_hash, submission_storage
 
 # 1. CORE AUTHENTICATION
 class User(AbstractUser):
@@ -55,6 +56,18 @@ class Attendance(models.Model):
     
     # auto_now_add=True means "Save the exact clock time when this is created"
     time = models.TimeField(auto_now_add=True, null=True) 
+    # Last write, upserts included: snapshot appends re-read the rows changed since the last export
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # One status per student, subject and day (lets take_attendance upsert the whole class)
+        unique_together = ('student', 'subject', 'date')
+        indexes = [
+            models.Index(fields=['student', 'status'], name='attendance_student_status_idx'),
+            models.Index(fields=['subject', 'date'], name='attendance_subject_date_idx'),
+            # A student's history, newest first, one keyset page at a time
+            models.Index(fields=['student', 'date', 'id'], name='attendance_student_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.username} - {self.date} {self.time}"
@@ -63,34 +76,23 @@ class Grade(models.Model):
     student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     marks = models.DecimalField(max_digits=5, decimal_places=2)
+    # Last write, upserts included: snapshot appends re-read the rows changed since the last export
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # One grade per student and subject (lets imports upsert a batch at a time)
+        unique_together = ('student', 'subject')
+        indexes = [
+            # Per-subject lookups, curve maxima and rankings read straight from this index
+            models.Index(fields=['subject', 'marks'], name='grade_subject_marks_idx'),
+        ]
 
     def get_relative_grade(self):
-        # 1. Find the highest marks any student got in THIS specific subject
-        highest_score_dict = Grade.objects.filter(subject=self.subject).aggregate(Max('marks'))
-        highest_score = highest_score_dict['marks__max']
-
-        # 2. Safety check: prevent dividing by zero if no one has marks or highest is 0
-        if not highest_score or highest_score == 0:
-            return {'letter': 'F', 'point': 0.0}
-
-        # 3. Calculate the relative percentage
-        relative_percentage = (self.marks / highest_score) * 100
-
-        # 4. Assign the dynamic grade based on the curve
-        if relative_percentage >= 90:
-            return {'letter': 'O', 'point': 10.0}  
-        elif relative_percentage >= 80:
-            return {'letter': 'A+', 'point': 9.0}
-        elif relative_percentage >= 70:
-            return {'letter': 'A', 'point': 8.0}
-        elif relative_percentage >= 60:
-            return {'letter': 'B+', 'point': 7.0}
-        elif relative_percentage >= 50:
-            return {'letter': 'B', 'point': 6.0}
-        elif relative_percentage >= 40:
-            return {'letter': 'C', 'point': 5.0}
-        else:
-            return {'letter': 'F', 'point': 0.0}
+        # The curve and the cached per-subject highest marks live in core/grading.py
+        from .grading import curve_grade, subject_maxima
+
+        highest_score = subject_maxima([self.subject_id])[self.subject_id]
+        return curve_grade(self.marks, highest_score)
             
     def __str__(self):
         return f"{self.student.user.username} - {self.subject.name}: {self.marks}"
@@ -109,11 +111,69 @@ class Submission(models.Model):
     # CHANGE 'Student' TO 'StudentProfile' (Or whatever your exact class name is!)
     student = models.ForeignKey('StudentProfile', on_delete=models.CASCADE) 
     
-    pdf_file = models.FileField(upload_to='submissions/')
+    # Content-addressed: identical uploads share one file (see core/storage.py)
+    pdf_file = models.FileField(upload_to='submissions/', storage=submission_storage)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('assignment', 'student') 
 
+    def save(self, *args, **kwargs):
+        # Store the file first: its content hash is part of the name the storage picks
+        if self.pdf_file and not self.pdf_file._committed:
+            self.pdf_file.save(self.pdf_file.name, self.pdf_file.file, save=False)
+        self.sha256 = content_hash(self.pdf_file.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.student.user.username} - {self.assignment.title}"
+
+# 4. PRECOMPUTED STATISTICS (kept up to date by core/stats.py, never edit by hand)
+class StudentSubjectStats(models.Model):
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    total_classes = models.PositiveIntegerField(default=0)
+    present_classes = models.PositiveIntegerField(default=0)
+    absent_classes = models.PositiveIntegerField(default=0)
+    grade_count = models.PositiveIntegerField(default=0)
+    marks_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    avg_marks = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    is_failing = models.BooleanField(default=False)  # Any grade below settings.PASSING_MARKS
+    # Bit i set = present at the pair's i-th class by date (see core/attendance_bits.py)
+    attendance_bits = models.BinaryField(default=b'')
+    recent_absences = models.PositiveIntegerField(default=0)  # Within the latest settings.RECENT_CLASSES
+    absence_streak = models.PositiveIntegerField(default=0)  # Classes missed in a row, up to the latest
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'subject')
+
+    @property
+    def attendance(self):
+        return AttendanceBits.from_bytes(self.attendance_bits, self.total_classes)
+
+    def __str__(self):
+        return f"{self.student} - {self.subject.code}: {self.present_classes}/{self.total_classes}"
+
+
+class StudentStats(models.Model):
+    student = models.OneToOneField(StudentProfile, on_delete=models.CASCADE, primary_key=True)
+    total_classes = models.PositiveIntegerField(default=0)
+    present_classes = models.PositiveIntegerField(default=0)
+    absent_classes = models.PositiveIntegerField(default=0)
+    avg_marks = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    graded_subjects = models.PositiveIntegerField(default=0)
+    failing_subjects = models.PositiveIntegerField(default=0)
+    recent_absences = models.PositiveIntegerField(default=0)  # Summed over subjects
+    absence_streak = models.PositiveIntegerField(default=0)  # Longest current streak of any subject
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def attendance_pct(self):
+        if self.total_classes == 0:
+            return 100.0
+        return (self.present_classes / self.total_classes) * 100
+
     def __str__(self):
-        return f"{self.student.user.username} - {self.assignment.title}"
\ No newline at end of file
+        return f"{self.student}: {self.present_classes}/{self.total_classes} classes, avg {self.avg_marks}"
@@ -0,0 +1,88 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of rows plus the opaque cursor of the next page (None on the last page)."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _fields(queryset, ordering):
+    """[(field, descending)] for an ordering like ['-date', '-id']."""
+    fields = []
+    for name in ordering:
+        descending = name.startswith('-')
+        fields.append((queryset.model._meta.get_field(name.lstrip('-')), descending))
+    return fields
+
+
+def _encode(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _decode(cursor, fields):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError
+        return [field.to_python(value) for (field, _), value in zip(fields, values)]
+    except (ValueError, ValidationError):
+        raise BadRequest('Invalid cursor')
+
+
+def _after(fields, values):
+    """Rows strictly after `values` in the ordering: a lexicographic (a, b, c) > (x, y, z)."""
+    condition = None
+    for (field, descending), value in reversed(list(zip(fields, values))):
+        strictly = Q(**{f"{field.attname}__{'lt' if descending else 'gt'}": value})
+        condition = strictly if condition is None else strictly | (Q(**{field.attname: value}) & condition)
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=None):
+    """
+    The page of `queryset` after `cursor`, in `ordering` (model field names, '-' for
+    descending, the last one unique, e.g. ['-date', '-id']). Unlike OFFSET paging, every
+    page is one index range read however deep the client has scrolled.
+    """
+    page_size = page_size or settings.HISTORY_PAGE_SIZE
+    fields = _fields(queryset, ordering)
+
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(fields, _decode(cursor, fields)))
+
+    # One extra row tells whether there is a next page without a COUNT
+    rows = list(queryset[:page_size + 1])
+    items = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = _encode([field.value_to_string(last) for field, _ in fields])
+    return KeysetPage(items, next_cursor)
+
+
+def requested_page_size(request):
+    """?limit= from a JSON client, capped at settings.HISTORY_MAX_PAGE_SIZE."""
+    try:
+        limit = int(request.GET.get('limit', settings.HISTORY_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit must be an integer')
+    return max(1, min(limit, settings.HISTORY_MAX_PAGE_SIZE))
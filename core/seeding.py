@@ -0,0 +1,250 @@
+import datetime
+import random
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import (
+    User, Subject, TeacherProfile, TeacherSubjectHistory, StudentProfile,
+    Attendance, Grade, Assignment, Submission,
+)
+from . import dashboard_cache
+from .storage import content_hash, submission_storage
+from .stats import rebuild_stats
+
+
+# Every seeded username starts with this, so a second run can refuse instead of colliding
+USERNAME_PREFIX = 'seed-'
+
+# Page cache for this connection while seeding, in KiB
+SQLITE_CACHE_KB = 256 * 1024
+
+# Submission texts are drawn from a large pseudo-word vocabulary, so independent
+# submissions score low against each other and only the deliberate copies match
+SYLLABLES = 'ka lo mi ne ru sa te vo di pa ge zu ho be fi an el or is um'.split()
+VOCABULARY_SIZE = 2000
+WORDS_PER_SUBMISSION = 80
+
+
+def stub_pdf(text):
+    """Smallest single-page PDF whose text PyPDF2 can extract again."""
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode()
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return pdf
+
+
+def class_days(start, count):
+    """The first `count` weekdays from `start` on."""
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += datetime.timedelta(days=1)
+    return days
+
+
+def _insert(model, rows, batch_size):
+    """bulk_create a generator in slices, so millions of rows never sit in memory at once."""
+    rows = iter(rows)
+    created = 0
+    while True:
+        chunk = list(islice(rows, batch_size * 10))
+        if not chunk:
+            return created
+        model.objects.bulk_create(chunk, batch_size=batch_size)
+        created += len(chunk)
+
+
+def _insert_values(model, field_names, rows, batch_size):
+    """
+    executemany() plain tuples of already database-ready values into the model's table.
+    For the millions of Attendance rows, bulk_create spends ~10x longer compiling SQL
+    per value than the database spends inserting.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+
+    rows = iter(rows)
+    created = 0
+    with connection.cursor() as cursor:
+        while True:
+            chunk = list(islice(rows, batch_size * 10))
+            if not chunk:
+                return created
+            cursor.executemany(sql, chunk)
+            created += len(chunk)
+
+
+def _db_value(model, field_name, value):
+    return model._meta.get_field(field_name).get_db_prep_save(value, connection)
+
+
+def seed_university(
+    students=1000, teachers=50, subjects=100, subjects_per_student=5, days=20,
+    assignments_per_subject=2, submission_rate=0.5, duplicate_rate=0.05,
+    start=datetime.date(2025, 1, 6), password='password', seed=42, batch_size=2000, log=None,
+):
+    """
+    Fill the database with a synthetic university, identical for the same arguments.
+    Every table is written in bulk (no per-row signals), then the stats are rebuilt once.
+    Returns {model name: rows created}.
+    """
+    log = log or (lambda message: None)
+    rnd = random.Random(seed)
+    counts = {}
+    subjects_per_student = min(subjects_per_student, subjects)
+
+    # One hash for everyone: hashing per user would dominate the whole run
+    password_hash = make_password(password)
+
+    if connection.vendor == 'sqlite':
+        # The default 2 MB page cache thrashes on the Attendance indexes once they outgrow it
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_KB}')
+
+    with transaction.atomic():
+        teacher_users = User.objects.bulk_create([
+            User(username=f'{USERNAME_PREFIX}teacher{i:05d}', password=password_hash, is_teacher=True)
+            for i in range(teachers)
+        ], batch_size=batch_size)
+        teacher_list = TeacherProfile.objects.bulk_create([
+            TeacherProfile(user=user, department=f'Department {i % 10}') for i, user in enumerate(teacher_users)
+        ], batch_size=batch_size)
+        counts['teachers'] = len(teacher_list)
+
+        # Subjects are dealt round-robin; a teacher's last subject is history when they have several
+        subject_list = Subject.objects.bulk_create([
+            Subject(name=f'Subject {i}', code=f'SEED{i:05d}', teacher=teacher_list[i % teachers])
+            for i in range(subjects)
+        ], batch_size=batch_size)
+        taught = {}
+        for subject in subject_list:
+            taught.setdefault(subject.teacher_id, []).append(subject.pk)
+        TeacherSubjectHistory.objects.bulk_create([
+            TeacherSubjectHistory(
+                teacher=subject.teacher, subject=subject,
+                is_active=len(taught[subject.teacher_id]) == 1 or taught[subject.teacher_id][-1] != subject.pk,
+            )
+            for subject in subject_list
+        ], batch_size=batch_size)
+        counts['subjects'] = len(subject_list)
+        log(f'{teachers} teachers, {subjects} subjects')
+
+        student_users = []
+        for offset in range(0, students, batch_size * 10):
+            student_users += User.objects.bulk_create([
+                User(username=f'{USERNAME_PREFIX}student{i:07d}', password=password_hash, is_student=True)
+                for i in range(offset, min(students, offset + batch_size * 10))
+            ], batch_size=batch_size)
+        student_ids = [user.pk for user in student_users]
+        counts['students'] = _insert(StudentProfile, (
+            StudentProfile(user_id=user_id, roll_number=f'S{i:07d}', batch_year=str(start.year - i % 4))
+            for i, user_id in enumerate(student_ids)
+        ), batch_size)
+        log(f'{students} students')
+
+        # A per-student "ability" drives both attendance and marks, so the risk model has signal to find
+        ability = [rnd.betavariate(5, 2) for _ in student_ids]
+        enrolment = [rnd.sample(subject_list, subjects_per_student) for _ in student_ids]
+        dates = class_days(start, days)
+
+        # Only a handful of distinct dates and marks: convert each to its database form once
+        db_dates = [_db_value(Attendance, 'date', date) for date in dates]
+        db_time = _db_value(Attendance, 'time', datetime.time(9, 0))
+        db_now = _db_value(Attendance, 'updated_at', timezone.now())
+        db_marks = [_db_value(Grade, 'marks', Decimal(marks)) for marks in range(101)]
+
+        def attendance_rows():
+            for student_id, skill, enrolled in zip(student_ids, ability, enrolment):
+                present_chance = 0.55 + 0.45 * skill
+                for subject in enrolled:
+                    for date in db_dates:
+                        status = 'P' if rnd.random() < present_chance else 'A'
+                        yield student_id, subject.pk, date, status, db_time, db_now
+
+        counts['attendance'] = _insert_values(
+            Attendance, ['student', 'subject', 'date', 'status', 'time', 'updated_at'], attendance_rows(), batch_size
+        )
+        log(f"{counts['attendance']} attendance rows")
+
+        def grade_rows():
+            for student_id, skill, enrolled in zip(student_ids, ability, enrolment):
+                for subject in enrolled:
+                    marks = max(0, min(100, round(rnd.gauss(100 * skill, 12))))
+                    yield student_id, subject.pk, db_marks[marks], db_now
+
+        counts['grades'] = _insert_values(
+            Grade, ['student', 'subject', 'marks', 'updated_at'], grade_rows(), batch_size
+        )
+        log(f"{counts['grades']} grades")
+
+        assignment_list = Assignment.objects.bulk_create([
+            Assignment(
+                title=f'{subject.name} assignment {n + 1}', subject=subject,
+                due_date=dates[min(len(dates) - 1, (n + 1) * len(dates) // (assignments_per_subject + 1))],
+            )
+            for subject in subject_list for n in range(assignments_per_subject)
+        ], batch_size=batch_size)
+        counts['assignments'] = len(assignment_list)
+        by_subject = {}
+        for assignment in assignment_list:
+            by_subject.setdefault(assignment.subject_id, []).append(assignment)
+
+        storage = submission_storage()
+        vocabulary = [''.join(rnd.choice(SYLLABLES) for _ in range(3)) for _ in range(VOCABULARY_SIZE)]
+        db_submitted_at = _db_value(Submission, 'submitted_at', timezone.make_aware(
+            datetime.datetime.combine(dates[-1], datetime.time(12, 0))
+        ))
+
+        def submission_rows():
+            # Some submissions copy an earlier one of the same assignment, to give plagiarism checks work
+            earlier = {}
+            for student_id, enrolled in zip(student_ids, enrolment):
+                for subject in enrolled:
+                    for assignment in by_subject.get(subject.pk, []):
+                        if rnd.random() >= submission_rate:
+                            continue
+                        previous = earlier.setdefault(assignment.pk, [])
+                        if previous and rnd.random() < duplicate_rate:
+                            name = rnd.choice(previous)
+                        else:
+                            text = ' '.join(rnd.choices(vocabulary, k=WORDS_PER_SUBMISSION))
+                            name = storage.save('submissions/work.pdf', ContentFile(stub_pdf(text)))
+                            previous.append(name)
+                        yield assignment.pk, student_id, name, content_hash(name), db_submitted_at
+
+        counts['submissions'] = _insert_values(
+            Submission, ['assignment', 'student', 'pdf_file', 'sha256', 'submitted_at'], submission_rows(), batch_size
+        )
+        log(f"{counts['submissions']} submissions")
+
+    pair_count, student_count = rebuild_stats(batch_size=batch_size)
+    dashboard_cache.invalidate_all()
+    log(f'Rebuilt stats for {pair_count} student/subject pairs and {student_count} students')
+    return counts
@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import Signal, receiver
+from .models import Attendance, Grade, StudentProfile, Subject, TeacherSubjectHistory
+from . import dashboard_cache
+from .grading import invalidate_subject_maxima
+from .stats import refresh_stats
+
+
+# Sent with pairs={(student_id, subject_id), ...} whenever Attendance or Grade rows change.
+# bulk_create / bulk_update skip post_save, so bulk write paths call notify_bulk_changes.
+attendance_changed = Signal()
+grades_changed = Signal()
+
+
+def notify_bulk_changes(model, pairs):
+    """Tell the stats / curve / risk / dashboard listeners about Attendance or Grade rows written in bulk."""
+    if pairs:
+        signal = attendance_changed if model is Attendance else grades_changed
+        signal.send(sender=model, pairs=set(pairs))
+
+
+def _origin_model(origin):
+    return getattr(origin, 'model', type(origin))
+
+
+def is_cascade_delete(sender, origin):
+    # Rows removed because their student/subject was deleted do not refresh stats one by one:
+    # a student's are gone with it, a subject's are refreshed by refresh_after_subject_delete
+    return origin is not None and _origin_model(origin) is not sender
+
+
+def expire_cascaded(sender, instance, origin):
+    """A row deleted with its student still changes the curve and charts of its subject."""
+    if _origin_model(origin) is Subject:
+        return
+    if sender is Grade:
+        # e.g. the top scorer was deleted: the rest of the class is curved against a new maximum
+        invalidate_subject_maxima({instance.subject_id})
+    dashboard_cache.bump(('student_stats',), ('subject', instance.subject_id))
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, **kwargs):
+    attendance_changed.send(sender=Attendance, pairs={(instance.student_id, instance.subject_id)})
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, origin=None, **kwargs):
+    if not is_cascade_delete(sender, origin):
+        attendance_changed.send(sender=Attendance, pairs={(instance.student_id, instance.subject_id)})
+    else:
+        expire_cascaded(sender, instance, origin)
+
+
+@receiver(post_save, sender=Grade)
+def grade_saved(sender, instance, **kwargs):
+    grades_changed.send(sender=Grade, pairs={(instance.student_id, instance.subject_id)})
+
+
+@receiver(post_delete, sender=Grade)
+def grade_deleted(sender, instance, origin=None, **kwargs):
+    if not is_cascade_delete(sender, origin):
+        grades_changed.send(sender=Grade, pairs={(instance.student_id, instance.subject_id)})
+    else:
+        expire_cascaded(sender, instance, origin)
+
+
+@receiver(attendance_changed)
+@receiver(grades_changed)
+def refresh_student_stats(sender, pairs, **kwargs):
+    refresh_stats(pairs)
+
+
+@receiver(grades_changed)
+def reset_subject_curves(sender, pairs, **kwargs):
+    invalidate_subject_maxima({subject_id for _, subject_id in pairs})
+
+
+@receiver(attendance_changed)
+@receiver(grades_changed)
+def expire_subject_dashboards(sender, pairs, **kwargs):
+    subject_tags = [('subject', subject_id) for subject_id in {subject_id for _, subject_id in pairs}]
+    dashboard_cache.bump(('student_stats',), *subject_tags)
+
+
+@receiver(post_save, sender=TeacherSubjectHistory)
+@receiver(post_delete, sender=TeacherSubjectHistory)
+def expire_teacher_dashboards(sender, instance, **kwargs):
+    dashboard_cache.bump(('teacher', instance.teacher_id))
+
+
+@receiver(post_save, sender=Subject)
+def expire_subject_name(sender, instance, created, **kwargs):
+    # Names and codes are cached with each teacher's subject list
+    if not created:
+        teacher_ids = TeacherSubjectHistory.objects.filter(subject=instance).values_list('teacher_id', flat=True)
+        dashboard_cache.bump(*(('teacher', teacher_id) for teacher_id in teacher_ids))
+
+
+@receiver(pre_delete, sender=Subject)
+def refresh_after_subject_delete(sender, instance, **kwargs):
+    """
+    The subject's Attendance/Grade rows cascade without change signals, but its students'
+    StudentStats (and risk scores) still counted them: send the signals once the delete commits.
+    """
+    attendance_pairs = {
+        (student_id, instance.pk)
+        for student_id in Attendance.objects.filter(subject=instance).values_list('student_id', flat=True).distinct()
+    }
+    grade_pairs = {
+        (student_id, instance.pk)
+        for student_id in Grade.objects.filter(subject=instance).values_list('student_id', flat=True).distinct()
+    }
+
+    def notify():
+        with transaction.atomic():
+            notify_bulk_changes(Attendance, attendance_pairs)
+            notify_bulk_changes(Grade, grade_pairs)
+
+    transaction.on_commit(notify)
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+def expire_student_count(sender, instance, **kwargs):
+    dashboard_cache.bump(('students',))
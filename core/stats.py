@@ -0,0 +1,150 @@
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from .attendance_bits import AttendanceBits
+from .models import Attendance, Grade, StudentSubjectStats, StudentStats
+from .utils import chunks
+
+
+PAIR_FIELDS = [
+    'total_classes', 'present_classes', 'absent_classes',
+    'attendance_bits', 'recent_absences', 'absence_streak',
+    'grade_count', 'marks_total', 'avg_marks', 'is_failing', 'updated_at',
+]
+STUDENT_FIELDS = [
+    'total_classes', 'present_classes', 'absent_classes',
+    'avg_marks', 'graded_subjects', 'failing_subjects',
+    'recent_absences', 'absence_streak', 'updated_at',
+]
+
+def _pair_rows(attendance_rows, grade_rows):
+    """Group raw Attendance/Grade rows into unsaved StudentSubjectStats keyed by (student_id, subject_id)."""
+    rows = {}
+
+    def row_for(student_id, subject_id):
+        key = (student_id, subject_id)
+        if key not in rows:
+            rows[key] = StudentSubjectStats(student_id=student_id, subject_id=subject_id)
+        return rows[key]
+
+    # One ordered pass instead of a COUNT per status: the date order is what the bitmap needs
+    attendance = attendance_rows.order_by('student_id', 'subject_id', 'date').values_list(
+        'student_id', 'subject_id', 'status',
+    )
+    for key, group in groupby(attendance.iterator(), key=itemgetter(0, 1)):
+        bits = AttendanceBits.from_statuses(status for _, _, status in group)
+        stats = row_for(*key)
+        stats.total_classes = bits.length
+        stats.present_classes = bits.present
+        stats.absent_classes = bits.absent
+        stats.attendance_bits = bits.to_bytes()
+        stats.recent_absences = bits.absences_in_last(settings.RECENT_CLASSES)
+        stats.absence_streak = bits.absence_streak()
+
+    grades = grade_rows.values('student_id', 'subject_id').annotate(
+        count=Count('id'),
+        total=Sum('marks'),
+        failing=Count('id', filter=Q(marks__lt=settings.PASSING_MARKS)),
+    ).order_by()
+    for row in grades.iterator():
+        stats = row_for(row['student_id'], row['subject_id'])
+        stats.grade_count = row['count']
+        stats.marks_total = Decimal(row['total'])
+        stats.avg_marks = round(stats.marks_total / row['count'], 2)
+        stats.is_failing = row['failing'] > 0
+
+    return rows
+
+
+def _student_rows(pair_stats):
+    """Roll StudentSubjectStats up into unsaved StudentStats, one per student."""
+    totals = pair_stats.values('student_id').annotate(
+        total=Sum('total_classes'),
+        present=Sum('present_classes'),
+        absent=Sum('absent_classes'),
+        marks=Sum('marks_total'),
+        grades=Sum('grade_count'),
+        graded=Count('id', filter=Q(grade_count__gt=0)),
+        failing=Count('id', filter=Q(is_failing=True)),
+        recent_absences=Sum('recent_absences'),
+        absence_streak=Max('absence_streak'),
+    ).order_by()
+
+    rows = []
+    for row in totals.iterator():
+        rows.append(StudentStats(
+            student_id=row['student_id'],
+            total_classes=row['total'],
+            present_classes=row['present'],
+            absent_classes=row['absent'],
+            avg_marks=round(Decimal(row['marks']) / row['grades'], 2) if row['grades'] else None,
+            graded_subjects=row['graded'],
+            failing_subjects=row['failing'],
+            recent_absences=row['recent_absences'],
+            absence_streak=row['absence_streak'],
+        ))
+    return rows
+
+
+def refresh_stats(pairs):
+    """
+    Recompute the stats of the given (student_id, subject_id) pairs and of their students.
+    Called from the Attendance/Grade change signals, so it only reads the affected rows.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return
+    subject_ids = {subject_id for _, subject_id in pairs}
+
+    with transaction.atomic():
+        for student_ids in chunks(sorted({student_id for student_id, _ in pairs})):
+            in_chunk = set(student_ids)
+            chunk_pairs = [pair for pair in pairs if pair[0] in in_chunk]
+            rows = _pair_rows(
+                Attendance.objects.filter(student_id__in=student_ids, subject_id__in=subject_ids),
+                Grade.objects.filter(student_id__in=student_ids, subject_id__in=subject_ids),
+            )
+
+            fresh = [rows[pair] for pair in chunk_pairs if pair in rows]
+            StudentSubjectStats.objects.bulk_create(
+                fresh,
+                update_conflicts=True,
+                unique_fields=['student', 'subject'],
+                update_fields=PAIR_FIELDS,
+            )
+
+            # Pairs whose last Attendance/Grade row was deleted, one DELETE per subject
+            gone = sorted((pair for pair in chunk_pairs if pair not in rows), key=itemgetter(1))
+            for subject_id, subject_pairs in groupby(gone, key=itemgetter(1)):
+                StudentSubjectStats.objects.filter(
+                    subject_id=subject_id, student_id__in=[student_id for student_id, _ in subject_pairs],
+                ).delete()
+
+            students = _student_rows(StudentSubjectStats.objects.filter(student_id__in=student_ids))
+            StudentStats.objects.bulk_create(
+                students,
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=STUDENT_FIELDS,
+            )
+            kept = [row.student_id for row in students]
+            StudentStats.objects.filter(student_id__in=student_ids).exclude(student_id__in=kept).delete()
+
+
+def rebuild_stats(batch_size=1000):
+    """Throw away and recompute every stats row from the raw tables (backfills, PASSING_MARKS changes)."""
+    with transaction.atomic():
+        StudentStats.objects.all().delete()
+        StudentSubjectStats.objects.all().delete()
+
+        rows = _pair_rows(Attendance.objects.all(), Grade.objects.all())
+        StudentSubjectStats.objects.bulk_create(rows.values(), batch_size=batch_size)
+
+        students = _student_rows(StudentSubjectStats.objects.all())
+        StudentStats.objects.bulk_create(students, batch_size=batch_size)
+
+    return len(rows), len(students)
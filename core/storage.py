@@ -0,0 +1,59 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every distinct file exactly once, at <upload_to>/<sha[:2]>/<sha256><ext>.
+    The upload is streamed to disk chunk by chunk while its SHA-256 is computed, so
+    byte-identical uploads end up sharing one file and nothing is buffered whole.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content, which _save works out
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        os.makedirs(self.location, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.location, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            sha256 = digest.hexdigest()
+            final_name = os.path.join(directory, sha256[:2], sha256 + extension).replace('\\', '/')
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return final_name
+
+
+def content_hash(name):
+    """SHA-256 encoded in a ContentAddressedStorage file name ('' for older, non-hashed names)."""
+    stem = os.path.splitext(os.path.basename(name or ''))[0]
+    if len(stem) == 64 and all(c in '0123456789abcdef' for c in stem):
+        return stem
+    return ''
+
+
+def submission_storage():
+    return ContentAddressedStorage()
@@ -0,0 +1,808 @@
+import csv
+import datetime
+import hashlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import (
+    User, Subject, TeacherProfile, TeacherSubjectHistory, StudentProfile,
+    Attendance, Grade, Assignment, Submission, StudentSubjectStats, StudentStats,
+)
+from .attendance_bits import AttendanceBits
+from .dashboard_cache import cache_stats
+from .grading import curve_grade, relative_grades, subject_maxima
+from .imports import CsvImportError, import_csv
+from .seeding import seed_university
+from .stats import rebuild_stats
+from .storage import content_hash
+from .uploads import SizeLimitUploadHandler
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def seed_dataset(students=40, subjects=4, days=12, seed=7):
+    """
+    A small but realistic university: one teacher (all but the last subject active),
+    daily attendance for every student and subject, one grade per pair, two assignments
+    with a few submissions. Enough rows that any per-row query blows a fixed budget.
+    """
+    rnd = random.Random(seed)
+
+    # No passwords: tests log in with force_login, and hashing would dominate the setup time
+    teacher_user = User.objects.create(username='teacher', is_teacher=True)
+    teacher = TeacherProfile.objects.create(user=teacher_user, department='CS')
+
+    subject_list = []
+    for i in range(subjects):
+        subject = Subject.objects.create(name=f'Subject {i}', code=f'SUB{i}', teacher=teacher)
+        TeacherSubjectHistory.objects.create(teacher=teacher, subject=subject, is_active=i < subjects - 1)
+        subject_list.append(subject)
+
+    student_list = []
+    for i in range(students):
+        user = User.objects.create(username=f'student{i}', is_student=True)
+        student_list.append(StudentProfile.objects.create(user=user, roll_number=f'R{i:04d}', batch_year='2024'))
+
+    start = datetime.date(2026, 1, 5)
+    Attendance.objects.bulk_create([
+        Attendance(
+            student=student, subject=subject,
+            date=start + datetime.timedelta(days=day),
+            status='P' if rnd.random() < 0.8 else 'A',
+        )
+        for student in student_list for subject in subject_list for day in range(days)
+    ])
+    Grade.objects.bulk_create([
+        Grade(student=student, subject=subject, marks=rnd.randint(15, 100))
+        for student in student_list for subject in subject_list
+    ])
+    # bulk_create skips the change signals, so fill the precomputed stats directly
+    rebuild_stats()
+
+    assignments = [
+        Assignment.objects.create(title=f'Assignment {i}', subject=subject_list[i], due_date=start)
+        for i in range(2)
+    ]
+    for i, student in enumerate(student_list[:6]):
+        submission = Submission(assignment=assignments[i % 2], student=student)
+        submission.pdf_file.save('work.pdf', ContentFile(f'%PDF-1.4 work of student {i}'.encode()), save=True)
+
+    return {
+        'teacher': teacher,
+        'subjects': subject_list,
+        'students': student_list,
+        'assignments': assignments,
+    }
+
+
+class QueryBudgetMixin:
+    """assertMaxQueries fails with the captured SQL, so an N+1 regression names itself."""
+
+    def setUp(self):
+        super().setUp()
+        # Budgets are for the uncached path; rows from other tests may reuse the same ids
+        cache.clear()
+
+    def assertMaxQueries(self, budget, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        queries = [query['sql'] for query in context.captured_queries]
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{len(queries)} queries (budget {budget}):\n' + '\n'.join(queries),
+        )
+        return result
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CoreViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    # Budgets include the session + user lookups every authenticated request makes
+    # Writes also pay for savepoints and the stats/risk refresh their signals trigger
+    WRITE_BUDGET = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset()
+        cls.teacher_user = cls.data['teacher'].user
+        cls.student = cls.data['students'][0]
+        cls.subject = cls.data['subjects'][0]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def get_ok(self, budget, url):
+        response = self.assertMaxQueries(budget, self.client.get, url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_public_pages(self):
+        self.get_ok(2, reverse('login'))
+        self.get_ok(2, reverse('signup'))
+
+    def test_logout(self):
+        self.client.force_login(self.teacher_user)
+        response = self.assertMaxQueries(4, self.client.get, reverse('logout'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_teacher_pages(self):
+        self.client.force_login(self.teacher_user)
+        self.get_ok(8, reverse('teacher_dashboard'))
+        self.get_ok(5, reverse('take_attendance'))
+        self.get_ok(5, reverse('manage_grades'))
+        self.get_ok(4, reverse('teacher_submissions'))
+        self.get_ok(4, reverse('teacher_results'))
+
+    def test_student_pages(self):
+        self.client.force_login(self.student.user)
+        self.get_ok(5, reverse('student_dashboard'))
+        self.get_ok(4, reverse('student_attendance'))
+        self.get_ok(4, reverse('student_assignments'))
+
+        submission = Submission.objects.get(student=self.student)
+        self.get_ok(5, reverse('submission_success', args=[submission.id]))
+
+    def test_history_api(self):
+        self.client.force_login(self.student.user)
+        self.get_ok(4, reverse('api_student_attendance'))
+        self.client.force_login(self.teacher_user)
+        self.get_ok(4, reverse('api_teacher_results'))
+        self.get_ok(4, reverse('api_teacher_submissions'))
+
+    def test_take_attendance_saves_whole_class_in_fixed_queries(self):
+        self.client.force_login(self.teacher_user)
+        post = {'subject': self.subject.id, 'date': '2026-03-02'}
+        post.update({f'student_{student.user_id}': 'P' for student in self.data['students'][:25]})
+
+        response = self.assertMaxQueries(self.WRITE_BUDGET, self.client.post, reverse('take_attendance'), post)
+        self.assertEqual(response.status_code, 302)
+        saved = Attendance.objects.filter(subject=self.subject, date='2026-03-02')
+        self.assertEqual(saved.count(), len(self.data['students']))
+        self.assertEqual(saved.filter(status='P').count(), 25)
+
+    def test_mark_attendance(self):
+        self.client.force_login(self.teacher_user)
+        post = {'student_id': self.student.user_id, 'status': 'P'}
+        response = self.assertMaxQueries(self.WRITE_BUDGET, self.client.post, reverse('mark_attendance'), post)
+        self.assertEqual(response.status_code, 302)
+
+    def test_manage_grades_post(self):
+        self.client.force_login(self.teacher_user)
+        post = {'subject': self.subject.id, 'student': self.student.user_id, 'marks': '55'}
+        response = self.assertMaxQueries(self.WRITE_BUDGET, self.client.post, reverse('manage_grades'), post)
+        self.assertEqual(response.status_code, 302)
+
+    def test_grade_grid_saves_whole_class_in_fixed_queries(self):
+        self.client.force_login(self.teacher_user)
+        url = reverse('grade_grid', args=[self.subject.id])
+        self.get_ok(6, url)
+
+        post = {f'marks_{student.user_id}': '61.5' for student in self.data['students']}
+        response = self.assertMaxQueries(self.WRITE_BUDGET, self.client.post, url, post)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Grade.objects.filter(subject=self.subject, marks=61.5).count(), len(self.data['students'])
+        )
+
+    def test_create_assignment(self):
+        self.client.force_login(self.teacher_user)
+        post = {'title': 'Essay', 'subject_id': self.subject.id, 'due_date': '2026-04-01'}
+        response = self.assertMaxQueries(6, self.client.post, reverse('create_assignment'), post)
+        self.assertEqual(response.status_code, 302)
+
+    def test_submit_work(self):
+        student = self.data['students'][-1]
+        self.client.force_login(student.user)
+        post = {'pdf_file': SimpleUploadedFile('essay.pdf', b'%PDF-1.4 new work')}
+        url = reverse('submit_work', args=[self.data['assignments'][0].id])
+        response = self.assertMaxQueries(8, self.client.post, url, post)
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DashboardCacheTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=10, days=3)
+        cls.teacher = cls.data['teacher']
+        cls.active_subject = cls.data['subjects'][0]
+        cls.past_subject = cls.data['subjects'][-1]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher.user)
+
+    def dashboard(self):
+        return self.client.get(reverse('teacher_dashboard')).context
+
+    def test_repeat_load_is_served_from_cache(self):
+        first = self.dashboard()
+        # Only the session, user and teacher profile lookups are left
+        response = self.assertMaxQueries(3, self.client.get, reverse('teacher_dashboard'))
+        self.assertEqual(response.context['subject_averages'], first['subject_averages'])
+        self.assertEqual(cache_stats()['teacher_dashboard'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_grade_change_in_active_subject_expires_entry(self):
+        before = self.dashboard()['subject_averages'][0]['average']
+        with self.captureOnCommitCallbacks(execute=True):
+            for grade in Grade.objects.filter(subject=self.active_subject):
+                grade.marks = 100
+                grade.save()
+        after = self.dashboard()['subject_averages'][0]['average']
+        self.assertNotEqual(before, after)
+        self.assertEqual(after, 100)
+
+    def test_change_in_unrelated_subject_keeps_entry(self):
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(
+                student=self.data['students'][0], subject=self.past_subject, date=datetime.date(2026, 5, 1), status='P',
+            )
+        self.dashboard()
+        self.assertEqual(cache_stats()['teacher_dashboard']['hits'], 1)
+
+    def test_deleting_a_student_expires_live_dashboard_charts(self):
+        self.client.get(reverse('live_dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data['students'][0].user.delete()
+        self.client.get(reverse('live_dashboard'))
+        # The subject charts depend on no student tag, only on their subjects
+        self.assertEqual(cache_stats()['live_dashboard']['misses'], 2)
+
+    def test_subject_history_change_expires_entry(self):
+        self.assertEqual(self.dashboard()['active_subjects_count'], len(self.data['subjects']) - 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            history = TeacherSubjectHistory.objects.get(subject=self.past_subject)
+            history.is_active = True
+            history.save()
+        self.assertEqual(self.dashboard()['active_subjects_count'], len(self.data['subjects']))
+
+    def test_live_dashboard_scatter_follows_any_attendance_change(self):
+        self.client.get(reverse('live_dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(
+                student=self.data['students'][0], subject=self.past_subject, date=datetime.date(2026, 5, 1), status='A',
+            )
+        self.client.get(reverse('live_dashboard'))
+        stats = cache_stats()
+        self.assertEqual(stats['live_dashboard']['hits'], 1)
+        self.assertEqual(stats['live_dashboard_scatter']['misses'], 2)
+
+    def test_stats_endpoint(self):
+        self.dashboard()
+        self.dashboard()
+        response = self.client.get(reverse('dashboard_cache_stats'))
+        self.assertEqual(response.json()['teacher_dashboard']['hits'], 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RelativeGradeTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=3, subjects=2, days=0)
+        cls.subject, cls.ungraded = cls.data['subjects']
+        Grade.objects.filter(subject=cls.ungraded).delete()
+        for student, marks in zip(cls.data['students'], [100, 85, 50]):
+            Grade.objects.filter(student=student, subject=cls.subject).update(marks=marks)
+
+    def curve(self):
+        grades = Grade.objects.filter(subject=self.subject).order_by('-marks')
+        return [grade['letter'] for grade in relative_grades(grades).values()]
+
+    def test_batch_is_curved_against_the_subject_maximum(self):
+        self.assertEqual(self.curve(), ['O', 'A+', 'B'])
+        self.assertEqual(subject_maxima([self.ungraded.pk]), {self.ungraded.pk: 0})
+        self.assertEqual(curve_grade(Decimal('30'), 0), {'letter': 'F', 'point': 0.0})
+
+    def test_maxima_are_cached(self):
+        grades = list(Grade.objects.filter(subject=self.subject))
+        # One grouped MAX for both subjects, then nothing until a grade changes
+        self.assertMaxQueries(1, subject_maxima, [self.subject.pk, self.ungraded.pk])
+        self.assertMaxQueries(0, relative_grades, grades)
+
+    def test_grade_change_resets_the_curve(self):
+        self.curve()
+        top = Grade.objects.get(subject=self.subject, marks=100)
+        top.marks = 60
+        with self.captureOnCommitCallbacks(execute=True):
+            top.save()
+            # Until the save commits other requests still read the old maximum, so the
+            # cached one is only dropped afterwards (or they would cache it again)
+            self.assertEqual(cache.get(f'grade_max:{self.subject.pk}'), 100)
+        self.assertEqual(subject_maxima([self.subject.pk])[self.subject.pk], 85)
+        self.assertEqual(self.curve(), ['O', 'A', 'B'])
+
+    def test_deleting_the_top_student_resets_the_curve(self):
+        self.curve()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data['students'][0].user.delete()
+            self.data['students'][1].delete()
+        self.assertEqual(self.curve(), ['O'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SubmissionUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=9, subjects=2, days=1)
+        cls.assignment = cls.data['assignments'][0]
+        # The first six students already submitted something
+        cls.students = cls.data['students'][6:]
+
+    def submit(self, student, content, client=None):
+        client = client or self.client
+        client.force_login(student.user)
+        upload = SimpleUploadedFile('essay.pdf', content, content_type='application/pdf')
+        return client.post(reverse('submit_work', args=[self.assignment.id]), {'pdf_file': upload})
+
+    def test_identical_uploads_share_one_file(self):
+        content = b'%PDF-1.4 the same essay twice'
+        sha256 = hashlib.sha256(content).hexdigest()
+        for student in self.students[:2]:
+            self.assertEqual(self.submit(student, content).status_code, 302)
+
+        first, second = Submission.objects.filter(student__in=self.students[:2]).order_by('id')
+        self.assertEqual(first.pdf_file.name, f'submissions/{sha256[:2]}/{sha256}.pdf')
+        self.assertEqual(second.pdf_file.name, first.pdf_file.name)
+        self.assertEqual((first.sha256, second.sha256), (sha256, sha256))
+        directory = os.path.dirname(first.pdf_file.path)
+        self.assertEqual([name for name in os.listdir(directory) if name.startswith(sha256)], [f'{sha256}.pdf'])
+        with first.pdf_file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        # The streamed temporary copy is gone
+        self.assertFalse([name for name in os.listdir(MEDIA_ROOT) if name.endswith('.upload')])
+
+    def test_different_content_gets_its_own_file(self):
+        self.submit(self.students[0], b'%PDF-1.4 one essay')
+        self.submit(self.students[1], b'%PDF-1.4 another essay')
+        first, second = Submission.objects.filter(student__in=self.students[:2]).order_by('id')
+        self.assertNotEqual(first.sha256, second.sha256)
+        self.assertNotEqual(first.pdf_file.name, second.pdf_file.name)
+        self.assertEqual(content_hash('submissions/old-upload.pdf'), '')
+
+    @override_settings(SUBMISSION_MAX_UPLOAD_SIZE=1024)
+    def test_oversize_upload_is_rejected(self):
+        response = self.submit(self.students[0], b'%PDF-1.4 ' + b'x' * 2048)
+        self.assertRedirects(response, reverse('student_assignments'), fetch_redirect_response=False)
+        self.assertFalse(Submission.objects.filter(student=self.students[0]).exists())
+        self.assertIn('too large', str(list(get_messages(response.wsgi_request))[0]))
+
+        # Small enough still goes through
+        self.assertEqual(self.submit(self.students[0], b'%PDF-1.4 short').status_code, 302)
+        self.assertTrue(Submission.objects.filter(student=self.students[0]).exists())
+
+    def test_size_limit_also_applies_mid_stream(self):
+        # Without a trustworthy Content-Length the limit trips on the chunk that crosses it
+        handler = SizeLimitUploadHandler(None, max_size=10)
+        handler.handle_raw_input(None, {}, 0, b'boundary')
+        self.assertEqual(handler.receive_data_chunk(b'12345', 0), b'12345')
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'678901', 5)
+        self.assertTrue(handler.rejected)
+
+    def test_csrf_is_still_enforced(self):
+        response = self.submit(self.students[0], b'%PDF-1.4 essay', Client(enforce_csrf_checks=True))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Submission.objects.filter(student=self.students[0]).exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=5, days=30)
+        cls.student = cls.data['students'][0]
+
+    def walk(self, url_name, user, limit):
+        self.client.force_login(user)
+        rows, cursor = [], None
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get(reverse(url_name), params).json()
+            self.assertLessEqual(len(body['results']), limit)
+            rows += body['results']
+            cursor = body['next_cursor']
+            if cursor is None:
+                return rows
+
+    def test_attendance_pages_cover_history_once_newest_first(self):
+        rows = self.walk('api_student_attendance', self.student.user, limit=7)
+        expected = Attendance.objects.filter(student=self.student).order_by('-date', '-id')
+        self.assertEqual([row['id'] for row in rows], [record.id for record in expected])
+
+    def test_results_pages_follow_subject_then_marks(self):
+        rows = self.walk('api_teacher_results', self.data['teacher'].user, limit=3)
+        expected = Grade.objects.filter(subject__teacher=self.data['teacher']).order_by('subject', '-marks', '-id')
+        self.assertEqual([row['id'] for row in rows], [grade.id for grade in expected])
+
+    def test_submission_pages(self):
+        rows = self.walk('api_teacher_submissions', self.data['teacher'].user, limit=2)
+        self.assertEqual(len(rows), Submission.objects.count())
+
+    def test_html_view_links_next_page(self):
+        self.client.force_login(self.student.user)
+        with self.settings(HISTORY_PAGE_SIZE=10):
+            first = self.client.get(reverse('student_attendance'))
+            second = self.client.get(reverse('student_attendance'), {'cursor': first.context['attendance_records'].next_cursor})
+        first_ids = {record.id for record in first.context['attendance_records']}
+        second_ids = {record.id for record in second.context['attendance_records']}
+        self.assertEqual(len(first_ids), 10)
+        self.assertFalse(first_ids & second_ids)
+
+    def test_bad_cursor_is_rejected(self):
+        self.client.force_login(self.student.user)
+        response = self.client.get(reverse('api_student_attendance'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class HotLookupIndexTests(TestCase):
+    """The hottest filters must be answered from an index, never a full table scan."""
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn(f'SCAN {queryset.model._meta.db_table}', plan)
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan assertions are written against SQLite EXPLAIN QUERY PLAN output')
+
+    def test_attendance_by_student_and_status(self):
+        self.assertUsesIndex(Attendance.objects.filter(student_id=1, status='P'), 'attendance_student_status_idx')
+
+    def test_attendance_by_subject_and_date(self):
+        queryset = Attendance.objects.filter(subject_id=1, date=datetime.date(2026, 1, 5))
+        self.assertUsesIndex(queryset, 'attendance_subject_date_idx')
+
+    def test_attendance_history_by_student(self):
+        queryset = Attendance.objects.filter(student_id=1).order_by('-date', '-id')
+        self.assertUsesIndex(queryset, 'attendance_student_date_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_grade_by_subject(self):
+        self.assertUsesIndex(Grade.objects.filter(subject_id=1).order_by('-marks'), 'grade_subject_marks_idx')
+
+
+def csv_text(header, rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CsvImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=5, days=2)
+
+    def setUp(self):
+        self.rejects_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.rejects_dir, ignore_errors=True)
+
+    def test_grades_upsert_in_batches_and_refresh_stats(self):
+        student, subject = self.data['students'][0], self.data['subjects'][0]
+        text = csv_text(['roll_number', 'subject_code', 'marks'], [
+            [student.roll_number, subject.code, '12.5'],
+            ['R9999', subject.code, '50'],
+            [student.roll_number, 'NOPE', '50'],
+            [student.roll_number, subject.code, '101'],
+            [student.roll_number, subject.code, '33.25'],  # repeats the first row's pair: the later row wins
+        ])
+        rejects = io.StringIO()
+        grades = Grade.objects.count()
+        written = Grade.objects.get(student=student, subject=subject).updated_at
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_csv('grades', io.StringIO(text), rejects, batch_size=2)
+
+        self.assertEqual((result.rows, result.imported, result.rejected), (5, 2, 3))
+        self.assertEqual(Grade.objects.count(), grades)
+        self.assertEqual(float(Grade.objects.get(student=student, subject=subject).marks), 33.25)
+        # Upserts move updated_at too, so snapshot appends pick the new marks up
+        self.assertGreater(Grade.objects.get(student=student, subject=subject).updated_at, written)
+        self.assertEqual(float(StudentSubjectStats.objects.get(student=student, subject=subject).marks_total), 33.25)
+
+        rejected = list(csv.DictReader(io.StringIO(rejects.getvalue())))
+        self.assertEqual([row['line'] for row in rejected], ['3', '4', '5'])
+        self.assertIn("Unknown roll_number 'R9999'", rejected[0]['error'])
+
+    def test_lookups_are_cached_across_batches(self):
+        students = self.data['students']
+        subject = self.data['subjects'][0]
+        text = csv_text(
+            ['roll_number', 'subject_code', 'date', 'status'],
+            [[s.roll_number, subject.code, f'2026-07-{day:02d}', 'P'] for day in range(1, 11) for s in students],
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = import_csv('attendance', io.StringIO(text), batch_size=len(students))
+
+        self.assertEqual(result.imported, 10 * len(students))
+        # Ten batches, but each student and subject is looked up once
+        lookups = [q['sql'] for q in queries if 'FROM "core_studentprofile"' in q['sql'] or 'FROM "core_subject"' in q['sql']]
+        self.assertEqual(len(lookups), 2)
+
+    def test_missing_column_fails_the_whole_file(self):
+        with self.assertRaises(CsvImportError):
+            import_csv('attendance', io.StringIO(csv_text(['roll_number', 'date'], [['R0000', '2026-07-01']])))
+
+    def test_command_writes_rejects_file(self):
+        path = f'{self.rejects_dir}/attendance.csv'
+        with open(path, 'w', newline='') as f:
+            f.write(csv_text(['roll_number', 'subject_code', 'date', 'status'], [
+                [self.data['students'][0].roll_number, self.data['subjects'][0].code, '2026-07-01', 'p'],
+                [self.data['students'][0].roll_number, self.data['subjects'][0].code, '2026-07-02', 'X'],
+            ]))
+        out = io.StringIO()
+        call_command('import_csv', 'attendance', path, stdout=out)
+        self.assertIn('Imported 1 of 2 rows', out.getvalue())
+        with open(f'{path}.rejected.csv') as f:
+            self.assertIn('status must be P or A', f.read())
+
+    def test_upload_endpoint_reports_and_serves_rejects(self):
+        teacher = self.data['teacher'].user
+        text = csv_text(['roll_number', 'subject_code', 'marks'], [
+            [self.data['students'][1].roll_number, self.data['subjects'][1].code, '77'],
+            ['R9999', self.data['subjects'][1].code, '77'],
+        ])
+        url = reverse('api_import_csv', args=['grades'])
+
+        self.client.force_login(self.data['students'][0].user)
+        self.assertEqual(self.client.post(url).status_code, 403)
+
+        self.client.force_login(teacher)
+        with self.settings(CSV_IMPORT_REJECTS_DIR=self.rejects_dir):
+            report = self.client.post(url, {'file': SimpleUploadedFile('grades.csv', text.encode())}).json()
+            self.assertEqual((report['imported'], report['rejected']), (1, 1))
+            self.assertIn('rows_per_second', report)
+
+            download = self.client.get(report['rejects_url'])
+            self.assertEqual(download.status_code, 200)
+            self.assertIn(b'R9999', b''.join(download.streaming_content))
+
+            self.client.force_login(User.objects.create(username='other-teacher', is_teacher=True))
+            self.assertEqual(self.client.get(report['rejects_url']).status_code, 404)
+
+    def test_upload_cut_short_reports_the_committed_batches(self):
+        student, subjects = self.data['students'][0], self.data['subjects']
+        # Long enough that the bad bytes are decoded after the first batches are written
+        rows = [['R9999', subjects[0].code, '61']] + [[student.roll_number, subjects[0].code, '61']] * 1500
+        text = csv_text(['roll_number', 'subject_code', 'marks'], rows + [[student.roll_number, subjects[1].code, '62']])
+        text = text.encode() + b'R0000,\xff\xfe,63\r\n'
+        self.client.force_login(self.data['teacher'].user)
+
+        with self.settings(CSV_IMPORT_REJECTS_DIR=self.rejects_dir, CSV_IMPORT_BATCH_SIZE=100):
+            response = self.client.post(
+                reverse('api_import_csv', args=['grades']), {'file': SimpleUploadedFile('grades.csv', text)}
+            )
+            self.assertEqual(response.status_code, 400)
+            report = response.json()
+            self.assertIn('Not UTF-8', report['error'])
+            # Whole batches up to the one holding the bad line
+            self.assertGreater(report['rows'], 0)
+            self.assertEqual(report['rows'] % 100, 0)
+            self.assertEqual((report['imported'], report['rejected']), (report['rows'] - 1, 1))
+            self.assertEqual(float(Grade.objects.get(student=student, subject=subjects[0]).marks), 61)
+            self.assertNotEqual(float(Grade.objects.get(student=student, subject=subjects[1]).marks), 62)
+            self.assertEqual(self.client.get(report['rejects_url']).status_code, 200)
+
+    def test_upload_expires_old_rejects(self):
+        old = Path(self.rejects_dir) / f'{self.data["teacher"].user.id}-{"0" * 32}.csv'
+        old.write_text('line,roll_number,subject_code,marks,error\n')
+        stale = time.time() - 8 * 24 * 60 * 60
+        os.utime(old, (stale, stale))
+        text = csv_text(['roll_number', 'subject_code', 'marks'], [['R9999', self.data['subjects'][0].code, '50']])
+        self.client.force_login(self.data['teacher'].user)
+
+        with self.settings(CSV_IMPORT_REJECTS_DIR=self.rejects_dir, CSV_IMPORT_REJECTS_MAX_AGE=7 * 24 * 60 * 60):
+            report = self.client.post(
+                reverse('api_import_csv', args=['grades']), {'file': SimpleUploadedFile('grades.csv', text.encode())}
+            ).json()
+        self.assertFalse(old.exists())
+        self.assertEqual(len(list(Path(self.rejects_dir).iterdir())), 1)
+        self.assertIn(Path(report['rejects_url'].rstrip('/')).name, os.listdir(self.rejects_dir))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class GradeGridTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=6, days=2)
+        cls.subject = cls.data['subjects'][0]
+        user = User.objects.create(username='newcomer', is_student=True)
+        cls.newcomer = StudentProfile.objects.create(user=user, roll_number='R9999', batch_year='2025')
+
+    def setUp(self):
+        self.client.force_login(self.data['teacher'].user)
+        self.url = reverse('grade_grid', args=[self.subject.id])
+        self.grades = {g.student_id: g for g in Grade.objects.filter(subject=self.subject)}
+
+    def current_marks(self):
+        return {student.user_id: str(self.grades[student.user_id].marks) for student in self.data['students']}
+
+    def test_only_changed_rows_are_written(self):
+        first, second = self.data['students'][:2]
+        post = {f'marks_{student_id}': marks for student_id, marks in self.current_marks().items()}
+        post[f'marks_{first.user_id}'] = '99'
+        post[f'marks_{self.newcomer.user_id}'] = '45.25'
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, post)
+        self.assertEqual(response.status_code, 302)
+
+        grade_writes = [
+            q['sql'] for q in queries
+            if q['sql'].startswith(('UPDATE "core_grade"', 'INSERT INTO "core_grade"'))
+        ]
+        # One INSERT for the new mark, one UPDATE touching only the changed row
+        self.assertEqual(len(grade_writes), 2)
+        self.assertIn(f'"core_grade"."id" IN ({self.grades[first.pk].pk})', ' '.join(grade_writes))
+        self.assertGreater(Grade.objects.get(pk=self.grades[first.pk].pk).updated_at, self.grades[first.pk].updated_at)
+        self.assertEqual(Grade.objects.get(student=second.pk, subject=self.subject).marks, self.grades[second.pk].marks)
+        self.assertEqual(float(Grade.objects.get(student=self.newcomer, subject=self.subject).marks), 45.25)
+        self.assertEqual(
+            float(StudentSubjectStats.objects.get(student=first.pk, subject=self.subject).marks_total), 99.0
+        )
+
+    def test_unchanged_form_writes_nothing(self):
+        post = {f'marks_{student_id}': marks for student_id, marks in self.current_marks().items()}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, post)
+        self.assertFalse([q for q in queries if 'core_grade' in q['sql'] and not q['sql'].startswith('SELECT')])
+
+    def test_invalid_cell_saves_nothing(self):
+        first, second = self.data['students'][:2]
+        response = self.client.post(self.url, {f'marks_{first.user_id}': '12', f'marks_{second.user_id}': '140'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['error_count'], 1)
+        self.assertEqual(Grade.objects.get(student=first.pk, subject=self.subject).marks, self.grades[first.pk].marks)
+
+
+class AttendanceBitsTests(TestCase):
+
+    def test_counts_and_streaks(self):
+        bits = AttendanceBits.from_statuses('PPAPAA')
+        self.assertEqual((bits.length, bits.present, bits.absent), (6, 3, 3))
+        self.assertEqual(bits.percentage, 50.0)
+        self.assertEqual(bits.absence_streak(), 2)
+        self.assertEqual(bits.present_streak(), 0)
+        self.assertEqual(bits.absences_in_last(3), 2)
+        self.assertEqual(bits.absences_in_last(50), 3)
+
+        attended = AttendanceBits.from_statuses('APPP')
+        self.assertEqual((attended.present_streak(), attended.absence_streak()), (3, 0))
+
+    def test_empty_and_round_trip(self):
+        empty = AttendanceBits.from_statuses('')
+        self.assertEqual((empty.percentage, empty.absence_streak(), empty.absences_in_last(10)), (100.0, 0, 0))
+
+        bits = AttendanceBits.from_statuses('PA' * 20 + 'AAA')
+        self.assertEqual(len(bits.to_bytes()), 6)
+        self.assertEqual(AttendanceBits.from_bytes(bits.to_bytes(), bits.length), bits)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECENT_CLASSES=3)
+class AttendanceBitmapStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=3, subjects=2, days=0)
+        cls.student, cls.subject = cls.data['students'][0], cls.data['subjects'][0]
+
+    def mark(self, day, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.update_or_create(
+                student=self.student, subject=self.subject,
+                date=datetime.date(2026, 3, day), defaults={'status': status},
+            )
+
+    def stats(self):
+        return StudentSubjectStats.objects.get(student=self.student, subject=self.subject)
+
+    def test_bitmap_follows_attendance_in_date_order(self):
+        for day, status in [(2, 'P'), (5, 'A'), (3, 'P'), (4, 'A'), (6, 'A')]:
+            self.mark(day, status)
+        stats = self.stats()
+        self.assertEqual(stats.attendance, AttendanceBits.from_statuses('PPAAA'))
+        self.assertEqual((stats.absence_streak, stats.recent_absences, stats.absent_classes), (3, 3, 3))
+        self.assertEqual(StudentStats.objects.get(student=self.student).absence_streak, 3)
+
+        # Editing a past day rewrites its bit; a new present day ends the streak
+        self.mark(4, 'P')
+        self.mark(7, 'P')
+        stats = self.stats()
+        self.assertEqual(stats.attendance, AttendanceBits.from_statuses('PPPAAP'))
+        self.assertEqual((stats.absence_streak, stats.recent_absences), (0, 2))
+        self.assertEqual(stats.attendance.present_streak(), 1)
+
+    def test_dashboards_show_the_streak(self):
+        for day in (1, 2, 3):
+            self.mark(day, 'A')
+        self.client.force_login(self.student.user)
+
+        response = self.client.get(reverse('student_dashboard'))
+        self.assertTrue(response.context['streak_alert'])
+        self.assertContains(response, '3 classes missed in a row')
+
+        response = self.client.get(reverse('student_attendance'))
+        [row] = response.context['subject_attendance']
+        self.assertEqual((row['subject'], row['percentage'], row['absence_streak']), (self.subject, 0, 3))
+        self.assertTrue(row['alert'])
+        self.assertEqual(response.context['total_classes'], 3)
+
+
+class StatsRefreshTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(students=2, subjects=2, days=0)
+        cls.student = cls.data['students'][0]
+        cls.low, cls.high = cls.data['subjects']
+        Grade.objects.filter(student=cls.student, subject=cls.low).update(marks=10)
+        Grade.objects.filter(student=cls.student, subject=cls.high).update(marks=90)
+        rebuild_stats()
+
+    def test_deleting_a_pairs_last_row_removes_its_stats(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.get(student=self.student, subject=self.low).delete()
+        self.assertFalse(StudentSubjectStats.objects.filter(student=self.student, subject=self.low).exists())
+        stats = StudentStats.objects.get(student=self.student)
+        self.assertEqual((stats.avg_marks, stats.graded_subjects, stats.failing_subjects), (90, 1, 0))
+
+    def test_deleting_a_subject_refreshes_its_students(self):
+        self.assertEqual(StudentStats.objects.get(student=self.student).avg_marks, 50)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.low.delete()
+        stats = StudentStats.objects.get(student=self.student)
+        self.assertEqual((stats.avg_marks, stats.graded_subjects, stats.failing_subjects), (90, 1, 0))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SeedUniversityTests(TestCase):
+
+    def seeded(self, seed):
+        """What seed_university writes with `seed` at a tiny scale, by natural keys (ids may differ)."""
+        with transaction.atomic():
+            seed_university(students=8, teachers=2, subjects=3, subjects_per_student=2, days=3, seed=seed)
+            rows = (
+                sorted(Attendance.objects.values_list('student__roll_number', 'subject__code', 'date', 'status')),
+                sorted(Grade.objects.values_list('student__roll_number', 'subject__code', 'marks')),
+                sorted(Submission.objects.values_list('student__roll_number', 'assignment__title', 'sha256')),
+                sorted(StudentStats.objects.values_list('student__roll_number', 'present_classes', 'avg_marks')),
+            )
+            transaction.set_rollback(True)
+        return rows
+
+    def test_same_seed_same_data(self):
+        first = self.seeded(seed=3)
+        self.assertTrue(all(first))
+        self.assertEqual(self.seeded(seed=3), first)
+        self.assertNotEqual(self.seeded(seed=4), first)
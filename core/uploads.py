@@ -0,0 +1,28 @@
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    Rejects an upload as soon as it is known to be bigger than `max_size` bytes: at the
+    first chunk when Content-Length already says so, otherwise mid-stream. The rest of the
+    body is drained, never buffered. Install it first in request.upload_handlers; the view
+    then sees no file and `self.rejected` is True.
+    """
+
+    def __init__(self, request, max_size):
+        super().__init__(request)
+        self.max_size = max_size
+        self.rejected = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Raising here is not handled by the multipart parser, so only remember the verdict
+        self.rejected = content_length > self.max_size
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.rejected or start + len(raw_data) > self.max_size:
+            self.rejected = True
+            raise StopUpload()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
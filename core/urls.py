@@ -12,6 +12,7 @@ urlpatterns = [
     path('take-attendance/', views.take_attendance, name='take_attendance'),
     path('mark-attendance/', views.mark_attendance, name='mark_attendance'),
     path('manage-grades/', views.manage_grades, name='manage_grades'),
+    path('manage-grades/<int:subject_id>/', views.grade_grid, name='grade_grid'),
     path('create-assignment/', views.create_assignment, name='create_assignment'),
     path('student-submissions/', views.teacher_submissions, name='teacher_submissions'),
     path('class-results/', views.teacher_results, name='teacher_results'),
@@ -23,6 +24,12 @@ urlpatterns = [
 
     path('submit-work/<int:assignment_id>/', views.submit_work, name='submit_work'),
 
+    path('api/my-attendance/', views.api_student_attendance, name='api_student_attendance'),
+    path('api/class-results/', views.api_teacher_results, name='api_teacher_results'),
+    path('api/student-submissions/', views.api_teacher_submissions, name='api_teacher_submissions'),
+    path('api/import/<slug:kind>/', views.api_import_csv, name='api_import_csv'),
+    path('api/import-rejects/<str:name>/', views.api_import_rejects, name='api_import_rejects'),
+
     path('reset_password/', auth_views.PasswordResetView.as_view(template_name="pass_reset/password_reset.html"), name="password_reset"),
     path('reset_password_sent/', auth_views.PasswordResetDoneView.as_view(template_name="pass_reset/password_reset_done.html"), name="password_reset_done"),
     path('reset/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(template_name="pass_reset/password_reset_confirm.html"), name="password_reset_confirm"),
@@ -0,0 +1,9 @@
+# Keeps every IN (...) list well below SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def chunks(items, size=CHUNK_SIZE):
+    """Consecutive lists of at most `size` of the items, e.g. the ids of one `__in` lookup each."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
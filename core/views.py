@@ -5,9 +5,25 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .forms import StudentSignUpForm
 from django.utils import timezone
-from .models import User, StudentProfile, Attendance, TeacherSubjectHistory, Grade, Subject, Assignment, Submission
+from django.db import transaction
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from . import dashboard_cache
+from .grading import parse_marks
+from .imports import IMPORTERS, CsvImportError, import_csv
+from .pagination import keyset_page, requested_page_size
+from .signals import notify_bulk_changes
+from .uploads import SizeLimitUploadHandler
+from .models import User, StudentProfile, Attendance, TeacherSubjectHistory, Grade, Subject, Assignment, Submission, StudentSubjectStats, StudentStats
 import datetime
-from django.db.models import Avg
+import io
+import re
+import time
+import uuid
+from pathlib import Path
+from django.db.models import Avg, Sum
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 
@@ -73,22 +89,23 @@ def student_dashboard(request):
     if request.user.is_teacher:
         return redirect('teacher_dashboard')
 
-    # 1. Get Total Classes Attended (Count where status is 'P')
-    classes_attended = Attendance.objects.filter(student__user=request.user, status='P').count()
-
-    # 2. Get Overall Average Grade
-    # Assuming your model is named Grade and has a 'marks' field (like we used for teachers)
-    avg_data = Grade.objects.filter(student__user=request.user).aggregate(Avg('marks'))
-    if avg_data['marks__avg']:
-        grade_avg = f"{round(avg_data['marks__avg'])}%"
+    # 1 & 2. Total Classes Attended and Overall Average Grade, both precomputed in StudentStats
+    stats = StudentStats.objects.filter(student_id=request.user.id).first()
+    classes_attended = stats.present_classes if stats else 0
+    if stats and stats.avg_marks:
+        grade_avg = f"{round(stats.avg_marks)}%"
     else:
         grade_avg = "N/A"
 
-    # 3. Get Active/Missing Assignments
+    # 3. Absence streak warning (longest current streak of any subject, see core/attendance_bits.py)
+    absence_streak = stats.absence_streak if stats else 0
+    recent_absences = stats.recent_absences if stats else 0
+
+    # 4. Get Active/Missing Assignments
     # Grabbing all assignments for now. You can filter this later based on submission status!
     missing_assignments = Assignment.objects.count()
 
-    # 4. Get Recent Attendance Timeline (Grab the last 5 records)
+    # 5. Get Recent Attendance Timeline (Grab the last 5 records)
     recent_attendance = Attendance.objects.filter(student__user=request.user).order_by('-date')[:5]
 
     context = {
@@ -96,6 +113,10 @@ def student_dashboard(request):
         'grade_avg': grade_avg,
         'missing_assignments': missing_assignments,
         'attendance_records': recent_attendance,
+        'absence_streak': absence_streak,
+        'streak_alert': absence_streak >= settings.ABSENCE_STREAK_ALERT,
+        'recent_absences': recent_absences,
+        'recent_classes': settings.RECENT_CLASSES,
     }
     
     return render(request, 'student_side/student_dashboard.html', context)
@@ -111,24 +132,37 @@ def teacher_dashboard(request):
         
     teacher = request.user.teacherprofile
     
-    # 1. Get all subject history entries for this teacher
-    all_subject_histories = TeacherSubjectHistory.objects.filter(teacher=teacher).select_related('subject')
+    # 1. Get all subject history entries for this teacher (cached until they change)
+    all_subject_histories = dashboard_cache.teacher_subjects(teacher.pk)
     
-    # 2. Filter for just the ACTIVE ones for calculations
-    active_subject_histories = all_subject_histories.filter(is_active=True)
-    
-    # Get the IDs of active subjects
-    active_subject_ids = active_subject_histories.values_list('subject_id', flat=True)
+    # 2. Everything below only changes with these subjects' grades or the student count
+    tags = [('teacher', teacher.pk), ('students',)] + dashboard_cache.subject_tags(all_subject_histories)
+    context = dashboard_cache.cached(
+        'teacher_dashboard', tags, lambda: _teacher_dashboard_context(all_subject_histories)
+    )
+    return render(request, 'teacher_side/teacher_dashboard.html', context)
+
+
+def _teacher_dashboard_context(all_subject_histories):
+    # Filter for just the ACTIVE ones for calculations
+    active_subject_histories = [history for history in all_subject_histories if history.is_active]
+    active_subject_ids = [history.subject_id for history in active_subject_histories]
     
-    # --- CORRECTED: Use 'marks' instead of 'raw_marks' ---
-    overall_avg_data = Grade.objects.filter(subject_id__in=active_subject_ids).aggregate(Avg('marks'))
-    overall_avg_score = round(overall_avg_data['marks__avg'] or 0)
+    # Per-subject marks totals from the precomputed stats (one grouped query for every subject)
+    marks_by_subject = {
+        row['subject_id']: row
+        for row in StudentSubjectStats.objects.filter(subject_id__in=active_subject_ids)
+        .values('subject_id').annotate(marks=Sum('marks_total'), count=Sum('grade_count')).order_by()
+    }
+
+    all_marks = sum(row['marks'] for row in marks_by_subject.values())
+    all_count = sum(row['count'] for row in marks_by_subject.values())
+    overall_avg_score = round(all_marks / all_count) if all_count else 0
 
-    # --- CORRECTED: Calculate Per-Subject Averages ---
     subject_averages = []
     for history in active_subject_histories:
-        avg_data = Grade.objects.filter(subject=history.subject).aggregate(Avg('marks'))
-        avg_score = round(avg_data['marks__avg'] or 0)
+        row = marks_by_subject.get(history.subject_id)
+        avg_score = round(row['marks'] / row['count']) if row and row['count'] else 0
         subject_averages.append({
             'subject_name': history.subject.name,
             'subject_code': history.subject.code,
@@ -137,16 +171,15 @@ def teacher_dashboard(request):
 
     # --- Existing sidebar data ---
     total_students = StudentProfile.objects.count()
-    active_subjects_count = active_subject_histories.count()
+    active_subjects_count = len(active_subject_histories)
     
-    context = {
+    return {
         'subjects': all_subject_histories, 
         'total_students': total_students,
         'active_subjects_count': active_subjects_count,
         'overall_avg_percentage': overall_avg_score,
         'subject_averages': subject_averages, 
     }
-    return render(request, 'teacher_side/teacher_dashboard.html', context)
 
 
 # Make sure you import Subject, StudentProfile, and Attendance at the top of your views.py!
@@ -163,28 +196,38 @@ def take_attendance(request):
         date = request.POST.get('date')
         
         subject = Subject.objects.get(id=subject_id)
-        students = StudentProfile.objects.all()
+        student_ids = list(StudentProfile.objects.values_list('user_id', flat=True))
         
-        # 2. Loop through every student and save their specific status
-        for student in students:
-            # The HTML form will send variables like 'student_1', 'student_2', etc.
-            # Default to 'A' (Absent) if nothing is found
-            status = request.POST.get(f'student_{student.user_id}', 'A') 
-            
-            # Create or update the attendance record
-            Attendance.objects.update_or_create(
-                student=student,
+        # 2. Build every student's row in memory
+        # The HTML form will send variables like 'student_1', 'student_2', etc.
+        # Default to 'A' (Absent) if nothing is found
+        records = [
+            Attendance(
+                student_id=student_id,
                 subject=subject,
                 date=date,
-                defaults={'status': status}
+                status=request.POST.get(f'student_{student_id}', 'A'),
             )
+            for student_id in student_ids
+        ]
+
+        # 3. Save the whole roster as one batched upsert on (student, subject, date)
+        with transaction.atomic():
+            Attendance.objects.bulk_create(
+                records,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['student', 'subject', 'date'],
+                update_fields=['status', 'updated_at'],
+            )
+            notify_bulk_changes(Attendance, {(student_id, subject.id) for student_id in student_ids})
         
         # Once saved, refresh the page or send them to the dashboard
         return redirect('teacher_dashboard')
 
     # IF GET REQUEST: Load the page with the dropdown options
     subjects = Subject.objects.all()
-    students = StudentProfile.objects.all()
+    students = StudentProfile.objects.select_related('user')
     
     context = {
         'subjects': subjects,
@@ -209,13 +252,12 @@ def mark_attendance(request):
         
         student = get_object_or_404(StudentProfile, user__id=student_id)
         
-        # --- THE CHANGE: Use .create() instead of .get_or_create() ---
-        # This allows multiple entries per day
-        Attendance.objects.create(
+        # One row per student, subject and day: marking again just changes today's status
+        Attendance.objects.update_or_create(
             student=student,
             subject=subject, 
             date=datetime.date.today(),
-            status=status
+            defaults={'status': status}
         )
             
         if status == 'P':
@@ -250,7 +292,7 @@ def manage_grades(request):
 
     # IF GET REQUEST: Load the subjects and students to show in the dropdowns!
     subjects = Subject.objects.all()
-    students = StudentProfile.objects.all()
+    students = StudentProfile.objects.select_related('user')
     
     context = {
         'subjects': subjects,
@@ -258,15 +300,106 @@ def manage_grades(request):
     }
     return render(request, 'teacher_side/teacher_grades.html', context)
 
+@login_required(login_url='login')
+def grade_grid(request, subject_id):
+    """The whole roster's marks in one subject, entered and saved as one form."""
+    if not request.user.is_teacher:
+        return redirect('student_dashboard')
+
+    subject = get_object_or_404(Subject, id=subject_id)
+    students = list(StudentProfile.objects.select_related('user').order_by('roll_number'))
+    grades = {grade.student_id: grade for grade in Grade.objects.filter(subject=subject)}
+
+    posted = {}
+    errors = {}
+    if request.method == 'POST':
+        # 1. Compare every posted mark with the stored one (blank cells are left as they are)
+        created = []
+        changed = []
+        for student in students:
+            value = request.POST.get(f'marks_{student.user_id}', '').strip()
+            if not value:
+                continue
+            posted[student.user_id] = value
+            try:
+                marks = parse_marks(value)
+            except ValueError as error:
+                errors[student.user_id] = str(error)
+                continue
+
+            grade = grades.get(student.user_id)
+            if grade is None:
+                created.append(Grade(student_id=student.user_id, subject=subject, marks=marks))
+            elif grade.marks != marks:
+                grade.marks = marks
+                changed.append(grade)
+
+        # 2. Write only the changed rows, all of them or (on any invalid cell) none
+        if not errors:
+            with transaction.atomic():
+                # Upsert: another teacher may have graded the same student meanwhile
+                Grade.objects.bulk_create(
+                    created,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['student', 'subject'],
+                    update_fields=['marks', 'updated_at'],
+                )
+                # Unlike bulk_create, bulk_update leaves auto_now fields alone
+                now = timezone.now()
+                for grade in changed:
+                    grade.updated_at = now
+                Grade.objects.bulk_update(changed, ['marks', 'updated_at'], batch_size=500)
+                pairs = {(grade.student_id, subject.id) for grade in created + changed}
+                notify_bulk_changes(Grade, pairs)
+
+            messages.success(request, f"Saved {len(pairs)} changed marks for {subject.code}.")
+            return redirect('grade_grid', subject_id=subject.id)
+
+    rows = []
+    for student in students:
+        grade = grades.get(student.user_id)
+        rows.append({
+            'student': student,
+            'value': posted.get(student.user_id, grade.marks if grade else ''),
+            'error': errors.get(student.user_id),
+        })
+
+    context = {
+        'subject': subject,
+        'rows': rows,
+        'error_count': len(errors),
+    }
+    return render(request, 'teacher_side/grade_grid.html', context)
+
 @login_required(login_url='login')
 def student_attendance(request):
     if request.user.is_teacher:
         return redirect('teacher_dashboard')
 
-    attendance_records = Attendance.objects.filter(student__user=request.user).order_by('-date')
+    # Newest first, one page at a time (see core/pagination.py)
+    attendance_records = keyset_page(
+        Attendance.objects.filter(student_id=request.user.id).select_related('subject'),
+        ATTENDANCE_ORDERING, request.GET.get('cursor'),
+    )
     
-    total_classes = attendance_records.count()
-    attended_classes = attendance_records.filter(status='P').count()
+    # Per-subject breakdown from the precomputed bitmaps; the overall totals are their sums
+    subject_stats = StudentSubjectStats.objects.filter(
+        student_id=request.user.id, total_classes__gt=0,
+    ).select_related('subject').order_by('subject__name')
+    subject_attendance = []
+    for row in subject_stats:
+        bits = row.attendance
+        subject_attendance.append({
+            'subject': row.subject,
+            'percentage': int(bits.percentage),
+            'present_streak': bits.present_streak(),
+            'absence_streak': row.absence_streak,
+            'recent_absences': row.recent_absences,
+            'alert': row.absence_streak >= settings.ABSENCE_STREAK_ALERT,
+        })
+    total_classes = sum(row.total_classes for row in subject_stats)
+    attended_classes = sum(row.present_classes for row in subject_stats)
     
     if total_classes > 0:
         health_percentage = int((attended_classes / total_classes) * 100)
@@ -277,7 +410,9 @@ def student_attendance(request):
         'attendance_records': attendance_records,
         'health_percentage': health_percentage,
         'attended_classes': attended_classes,
-        'total_classes': total_classes
+        'total_classes': total_classes,
+        'subject_attendance': subject_attendance,
+        'recent_classes': settings.RECENT_CLASSES,
     }
     return render(request, 'student_side/student_attendance.html', context)
 
@@ -313,7 +448,7 @@ def student_assignments(request):
     if request.user.is_teacher:
         return redirect('teacher_dashboard')
 
-    assignments = Assignment.objects.all().order_by('due_date')
+    assignments = Assignment.objects.select_related('subject').order_by('due_date')
     # Get a list of assignment IDs this student has already submitted
     submitted_ids = Submission.objects.filter(student__user=request.user).values_list('assignment_id', flat=True)
 
@@ -324,8 +459,17 @@ def student_assignments(request):
     return render(request, 'student_side/student_assignments.html', context)
 
 # 2. ADD the new Upload View:
+# csrf_exempt + csrf_protect: the size-limit handler has to be installed before the
+# CSRF middleware reads request.POST (which parses the whole upload)
 @login_required(login_url='login')
+@csrf_exempt
 def submit_work(request, assignment_id):
+    size_limit = SizeLimitUploadHandler(request, settings.SUBMISSION_MAX_UPLOAD_SIZE)
+    request.upload_handlers.insert(0, size_limit)
+    return _submit_work(request, assignment_id, size_limit)
+
+@csrf_protect
+def _submit_work(request, assignment_id, size_limit):
     if request.method == 'POST' and request.FILES.get('pdf_file'):
         assignment = get_object_or_404(Assignment, id=assignment_id)
         student = request.user.studentprofile 
@@ -337,14 +481,19 @@ def submit_work(request, assignment_id):
             pdf_file=request.FILES['pdf_file']
         )      
         return redirect('submission_success', submission_id=submission.id)
+    if size_limit.rejected:
+        max_mb = settings.SUBMISSION_MAX_UPLOAD_SIZE // (1024 * 1024)
+        messages.error(request, f"That file is too large. Submissions are limited to {max_mb} MB.")
     return redirect('student_assignments')
 
 @login_required(login_url='login')
 def submission_success(request, submission_id):
-    submission = get_object_or_404(Submission, id=submission_id, student__user=request.user)
+    submission = get_object_or_404(
+        Submission.objects.select_related('assignment'), id=submission_id, student__user=request.user
+    )
     
     # Check if a grade already exists (unlikely right after submission, but good for the logic)
-    grade = Grade.objects.filter(student=submission.student, subject=submission.assignment.subject).first()
+    grade = Grade.objects.filter(student_id=submission.student_id, subject_id=submission.assignment.subject_id).first()
     
     context = {
         'submission': submission,
@@ -358,9 +507,10 @@ def teacher_submissions(request):
     if not request.user.is_teacher:
         return redirect('student_dashboard')
     
-    current_teacher = request.user.teacherprofile
-    # Get all submissions for assignments in subjects taught by this teacher
-    submissions = Submission.objects.filter(assignment__subject__teachersubjecthistory__teacher=current_teacher).order_by('-submitted_at')
+    # Get the submissions for assignments in subjects taught by this teacher, newest page first
+    submissions = keyset_page(
+        _teacher_submissions(request.user.id), SUBMISSION_ORDERING, request.GET.get('cursor')
+    )
     
     context = {
         'submissions': submissions
@@ -372,9 +522,8 @@ def teacher_results(request):
     if not request.user.is_teacher:
         return redirect('student_dashboard')
     
-    current_teacher = request.user.teacherprofile
-    # Get all grades for subjects taught by this teacher
-    grades = Grade.objects.filter(subject__teacher=current_teacher).order_by('subject', '-marks')
+    # Get the grades for subjects taught by this teacher, one page at a time
+    grades = keyset_page(_teacher_grades(request.user.id), GRADE_ORDERING, request.GET.get('cursor'))
     
     context = {
         'grades': grades
@@ -400,4 +549,164 @@ def student_signup(request):
     else:
         form = UserCreationForm()
         
-    return render(request, 'registration/signup.html', {'form': form})
\ No newline at end of file
+    return render(request, 'registration/signup.html', {'form': form})
+
+# ==========================================
+# --- HISTORY API (JSON, keyset-paginated) ---
+# ==========================================
+
+# Each ordering ends in the primary key, so every row has a unique position for the cursor
+ATTENDANCE_ORDERING = ['-date', '-id']
+SUBMISSION_ORDERING = ['-submitted_at', '-id']
+GRADE_ORDERING = ['subject', '-marks', '-id']
+
+
+def _teacher_submissions(teacher_id):
+    return Submission.objects.filter(
+        assignment__subject__teachersubjecthistory__teacher_id=teacher_id
+    ).select_related('student__user', 'assignment')
+
+
+def _teacher_grades(teacher_id):
+    return Grade.objects.filter(subject__teacher_id=teacher_id).select_related('student__user', 'subject')
+
+
+def _page_response(page, serialize):
+    return JsonResponse({
+        'results': [serialize(item) for item in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
+@login_required(login_url='login')
+def api_student_attendance(request):
+    if request.user.is_teacher:
+        return JsonResponse({'error': 'Students only'}, status=403)
+
+    page = keyset_page(
+        Attendance.objects.filter(student_id=request.user.id).select_related('subject'),
+        ATTENDANCE_ORDERING, request.GET.get('cursor'), requested_page_size(request),
+    )
+    return _page_response(page, lambda record: {
+        'id': record.id,
+        'subject_id': record.subject_id,
+        'subject': record.subject.name,
+        'date': record.date.isoformat(),
+        'time': record.time.isoformat() if record.time else None,
+        'status': record.status,
+    })
+
+
+@login_required(login_url='login')
+def api_teacher_results(request):
+    if not request.user.is_teacher:
+        return JsonResponse({'error': 'Teachers only'}, status=403)
+
+    page = keyset_page(
+        _teacher_grades(request.user.id), GRADE_ORDERING, request.GET.get('cursor'), requested_page_size(request)
+    )
+    return _page_response(page, lambda grade: {
+        'id': grade.id,
+        'student_id': grade.student_id,
+        'student': grade.student.user.username,
+        'subject_id': grade.subject_id,
+        'subject': grade.subject.name,
+        'marks': float(grade.marks),
+    })
+
+
+@login_required(login_url='login')
+def api_teacher_submissions(request):
+    if not request.user.is_teacher:
+        return JsonResponse({'error': 'Teachers only'}, status=403)
+
+    page = keyset_page(
+        _teacher_submissions(request.user.id), SUBMISSION_ORDERING, request.GET.get('cursor'),
+        requested_page_size(request),
+    )
+    return _page_response(page, lambda submission: {
+        'id': submission.id,
+        'student_id': submission.student_id,
+        'student': submission.student.user.username,
+        'assignment_id': submission.assignment_id,
+        'assignment': submission.assignment.title,
+        'submitted_at': submission.submitted_at.isoformat(),
+        'pdf_url': submission.pdf_file.url,
+        'sha256': submission.sha256,
+    })
+
+
+# ==========================================
+# --- BULK CSV IMPORT API ---
+# ==========================================
+
+REJECTS_NAME = re.compile(r'(\d+)-[0-9a-f]{32}\.csv')
+
+
+@login_required(login_url='login')
+def api_import_csv(request, kind):
+    """
+    POST a CSV as `file` to upsert grades or attendance in batches (see core/imports.py).
+    Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to disk and read a line at a time.
+    """
+    if not request.user.is_teacher:
+        return JsonResponse({'error': 'Teachers only'}, status=403)
+    if kind not in IMPORTERS:
+        raise Http404
+    if request.method != 'POST' or 'file' not in request.FILES:
+        return JsonResponse({'error': 'POST the CSV as "file"'}, status=400)
+
+    # 1. Stream the rows in, collecting rejects in a file the teacher can download afterwards
+    rejects_dir = Path(settings.CSV_IMPORT_REJECTS_DIR)
+    rejects_dir.mkdir(parents=True, exist_ok=True)
+    _expire_rejects(rejects_dir)
+    rejects_path = rejects_dir / f'{request.user.id}-{uuid.uuid4().hex}.csv'
+    lines = io.TextIOWrapper(request.FILES['file'].file, encoding='utf-8-sig', newline='')
+    try:
+        with open(rejects_path, 'w', newline='', encoding='utf-8') as rejects:
+            result = import_csv(kind, lines, rejects)
+    except UnicodeDecodeError as error:
+        rejects_path.unlink(missing_ok=True)
+        return JsonResponse({'error': str(error)}, status=400)
+    except CsvImportError as error:
+        if error.result is None:
+            rejects_path.unlink(missing_ok=True)
+            return JsonResponse({'error': str(error)}, status=400)
+        # Stopped part way: still a 400, but with what the earlier batches committed
+        return JsonResponse({'error': str(error), **_import_report(error.result, rejects_path)}, status=400)
+
+    # 2. Report the throughput, and where the rejected rows are
+    return JsonResponse(_import_report(result, rejects_path))
+
+
+def _import_report(result, rejects_path):
+    report = result.as_dict()
+    if result.rejected:
+        report['rejects_url'] = reverse('api_import_rejects', args=[rejects_path.name])
+    else:
+        rejects_path.unlink()
+    return report
+
+
+def _expire_rejects(rejects_dir):
+    """Delete the rejected-rows files older than CSV_IMPORT_REJECTS_MAX_AGE."""
+    cutoff = time.time() - settings.CSV_IMPORT_REJECTS_MAX_AGE
+    for path in rejects_dir.glob('*.csv'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            # Another request expired it first
+            pass
+
+
+@login_required(login_url='login')
+def api_import_rejects(request, name):
+    # Only the teacher who ran the import can download its rejects
+    match = REJECTS_NAME.fullmatch(name)
+    if not request.user.is_teacher or match is None or int(match.group(1)) != request.user.id:
+        raise Http404
+    path = Path(settings.CSV_IMPORT_REJECTS_DIR) / name
+    if not path.exists():
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'rejected-{name}', content_type='text/csv')
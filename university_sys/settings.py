@@ -127,6 +127,70 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
+# Tests get a throwaway cache directory (see university_sys/test_runner.py)
+TEST_RUNNER = 'university_sys.test_runner.TestRunner'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+# Versioned at-risk model artifacts written by `train_risk_model`
+RISK_MODEL_DIR = BASE_DIR / 'ml_models'
+# Memory-mapped Attendance/Grade snapshot written by `export_snapshot` (analytics/snapshot.py)
+ANALYTICS_SNAPSHOT_DIR = BASE_DIR / 'analytics_snapshot'
+
+# Marks below this count as failing in the precomputed StudentSubjectStats.is_failing flags
+PASSING_MARKS = 40
+# Absences among each subject's latest classes feed the risk model and the student dashboard
+RECENT_CLASSES = 10
+# Missing this many classes of a subject in a row raises the student's risk and a dashboard warning
+ABSENCE_STREAK_ALERT = 3
+
+# Cache (per-subject grade maxima for the relative curve, dashboard versions, ...)
+# Shared on disk by every worker process, so an invalidation in one reaches them all
+# (a per-process LocMemCache would keep serving stale entries in the others). Swap in
+# Redis or Memcached the same way when the workers run on more than one machine.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Cached dashboard contexts expire on every relevant change (core/dashboard_cache.py); this is
+# just an upper bound
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+# Rows per page of the keyset-paginated history views; JSON clients may ask for up to the max
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+# Rows validated and upserted per transaction by CSV imports (core/imports.py), and where the
+# upload endpoint keeps the rejected-rows files teachers download afterwards. Each upload
+# deletes the files older than the max age (seconds), so the links work for that long.
+CSV_IMPORT_BATCH_SIZE = 5000
+CSV_IMPORT_REJECTS_DIR = BASE_DIR / 'import_rejects'
+CSV_IMPORT_REJECTS_MAX_AGE = 7 * 24 * 60 * 60
+
+# How often an open live dashboard polls its chart data (unchanged data costs a 304)
+LIVE_DASHBOARD_POLL_SECONDS = 30
+
+# Server-sent dashboard deltas (analytics/events.py; needs an ASGI server such as uvicorn).
+# Each worker process reads new events once per poll interval for all of its open streams.
+DASHBOARD_EVENTS_POLL_SECONDS = 1.0
+DASHBOARD_EVENTS_KEEPALIVE_SECONDS = 15
+DASHBOARD_EVENTS_RETRY_MS = 3000
+DASHBOARD_EVENTS_QUEUE_SIZE = 100
+DASHBOARD_EVENTS_RETENTION_MINUTES = 10
+
+# Submission pairs at or above this TF-IDF cosine similarity (0-100) are stored as PlagiarismReports
+PLAGIARISM_THRESHOLD = 80.0
+
+# PDF text extraction pool (None = one worker per CPU) and per-file timeout in seconds
+PDF_EXTRACT_WORKERS = None
+PDF_EXTRACT_TIMEOUT = 30
+
+# MinHash/LSH candidates below this estimated Jaccard similarity are not scored exactly
+NEAR_DUPLICATE_MIN_JACCARD = 0.2
+
+# Assignment uploads bigger than this are rejected while streaming, before being buffered
+SUBMISSION_MAX_UPLOAD_SIZE = 20 * 1024 * 1024